@@ -0,0 +1,136 @@
+"""
+Validación en un hilo de trabajo, para que la interfaz siga
+respondiendo mientras se analizan programas grandes. No depende
+de tkinter: la interfaz consulta los resultados con after().
+"""
+import queue
+import threading
+
+from execution_exceptions import ValidationCancelled
+
+
+class ValidationJob:
+    """
+    Una validación enviada al hilo de trabajo. function se llama
+    con args y un argumento progress, al que debe reportar su
+    avance; así es como se entera de que fue cancelada.
+    """
+    def __init__(self, generation, function, args):
+        self.generation = generation
+        self.function = function
+        self.args = args
+        self.cancelled = threading.Event()
+        # Fracción completada, entre 0 y 1.
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+
+    def report(self, done, total):
+        if self.cancelled.is_set():
+            raise ValidationCancelled()
+
+        if total:
+            self.progress = min(done / total, 1.0)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            self.result = self.function(*self.args, progress=self.report)
+            self.progress = 1.0
+        except ValidationCancelled:
+            self.cancelled.set()
+        except Exception as e:
+            self.error = e
+
+
+class BackgroundValidator:
+    """
+    Ejecuta validaciones de una en una en un hilo de trabajo. Sólo
+    se conserva el resultado de la validación más reciente: enviar
+    otra descarta la que esperaba turno y, salvo que se indique lo
+    contrario, cancela la que está en curso.
+    """
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.generation = 0
+        self.pending = None
+        self.current = None
+        self.finished = queue.Queue()
+        self.thread = threading.Thread(target=self.work, name="validador", daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args, interrupt=True):
+        """
+        Agrega una validación y regresa su ValidationJob. Con
+        interrupt=False la validación en curso se deja terminar
+        (su resultado se descarta), útil cuando interrumpirla
+        costaría más que esperarla.
+        """
+        with self.lock:
+            self.generation += 1
+            job = ValidationJob(self.generation, function, args)
+            self.pending = job
+
+            if interrupt and self.current is not None:
+                self.current.cancel()
+
+            self.lock.notify()
+
+        return job
+
+    def cancel(self):
+        """
+        Cancela la validación en curso y la que esperaba turno.
+        """
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+
+            if self.current is not None:
+                self.current.cancel()
+
+    def busy(self):
+        """
+        Indica si hay una validación en curso o esperando. Cuando
+        regresa False, el resultado de la última ya está en poll().
+        """
+        with self.lock:
+            return self.pending is not None or self.current is not None
+
+    def poll(self):
+        """
+        Regresa la validación más reciente si ya terminó y no fue
+        cancelada, o None. Las que fueron reemplazadas se ignoran.
+        """
+        latest = None
+
+        while True:
+            try:
+                job = self.finished.get_nowait()
+            except queue.Empty:
+                break
+
+            if job.generation == self.generation and not job.cancelled.is_set():
+                latest = job
+
+        return latest
+
+    def work(self):
+        while True:
+            with self.lock:
+                while self.pending is None:
+                    self.lock.wait()
+
+                job = self.current = self.pending
+                self.pending = None
+
+            job.run()
+
+            # El resultado se publica antes de marcar al hilo como
+            # libre; ver busy().
+            self.finished.put(job)
+
+            with self.lock:
+                self.current = None
@@ -0,0 +1,231 @@
+"""
+Validador por lotes sin interfaz gráfica. Recibe archivos,
+directorios o patrones glob y reparte los archivos entre
+un grupo de procesos.
+
+Uso: python batch.py [-j N] [--pattern PATRON] RUTA [RUTA ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from functools import partial
+
+from instrumentation import ValidationStats
+from lexer import PROGRAM_LEXERS
+from parser_class import EXPR_CACHE_SIZE, EXPR_PARSERS, PROGRAM_PARSERS
+from result_cache import MAX_BYTES, ResultCache
+from validator import FORMAT_SUFFIXES, expression_cache, validate_file
+
+CORRECT = "Programa correcto."
+
+
+def expand_paths(paths, pattern="*.txt"):
+    """
+    Expande las rutas de entrada a una lista ordenada y sin
+    repeticiones de archivos. Los directorios se recorren
+    recursivamente buscando archivos que coincidan con pattern.
+    """
+    files = []
+    seen = set()
+
+    def add(path):
+        path = os.path.normpath(path)
+
+        if path not in seen:
+            seen.add(path)
+            files.append(path)
+
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(glob.escape(path), "**", pattern), recursive=True)
+        elif os.path.isfile(path):
+            matches = [path]
+        else:
+            matches = glob.glob(path, recursive=True)
+
+        for match in sorted(matches):
+            if os.path.isfile(match):
+                add(match)
+
+    return files
+
+
+def validate_counted(path, measure=False, result_cache=None, **options):
+    # Cada proceso mide en su propio ValidationStats y trabaja con
+    # su copia de result_cache, así que regresa las mediciones y los
+    # aciertos y fallos del caché junto con el resultado.
+    stats = ValidationStats() if measure else None
+    hits = misses = 0
+
+    if result_cache is not None:
+        hits, misses = result_cache.hits, result_cache.misses
+
+    path, size, result = validate_file(path, result_cache=result_cache, stats=stats, **options)
+
+    if result_cache is not None:
+        hits, misses = result_cache.hits - hits, result_cache.misses - misses
+
+    return path, size, result, stats, hits, misses
+
+
+def run_batch(files, jobs=None, chunksize=None, lexer="table", expr_parser="iterative",
+              stream=False, cache_size=0, result_cache=None, recover=False, stats=None,
+              output_format="text", program_parser="recursive"):
+    """
+    Valida los archivos y genera los resultados en el mismo
+    orden de entrada conforme van estando disponibles. Con
+    stats (un ValidationStats) se acumulan en él las mediciones
+    de todos los archivos, y en result_cache los aciertos y
+    fallos de todos los procesos.
+    """
+    # Con un solo proceso también se usa una copia, para que los
+    # contadores de result_cache no se sumen dos veces.
+    worker_cache = copy(result_cache) if result_cache is not None else None
+    validate = partial(validate_counted, measure=stats is not None, result_cache=worker_cache,
+                       lexer=lexer, expr_parser=expr_parser, stream=stream, cache_size=cache_size,
+                       recover=recover, output_format=output_format, program_parser=program_parser)
+
+    for path, size, result, file_stats, hits, misses in validate_files(validate, files, jobs, chunksize):
+        if stats is not None:
+            stats.merge(file_stats)
+
+        if result_cache is not None:
+            result_cache.hits += hits
+            result_cache.misses += misses
+
+        yield path, size, result
+
+
+def validate_files(validate, files, jobs, chunksize):
+    if jobs == 1 or len(files) <= 1:
+        yield from map(validate, files)
+        return
+
+    jobs = jobs or os.cpu_count() or 1
+
+    # Repartimos en bloques para no pagar la comunicación
+    # entre procesos por cada archivo pequeño.
+    if chunksize is None:
+        chunksize = max(1, min(64, len(files) // (jobs * 4)))
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(validate, files, chunksize=chunksize)
+
+
+def non_negative_int(text):
+    """
+    Tipo de argparse para tamaños y cuentas que aceptan cero.
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"no es un entero: {text}")
+
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"debe ser mayor o igual que 0: {text}")
+
+    return value
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Valida programas sin interfaz gráfica.")
+    arg_parser.add_argument("paths", nargs="+", help="archivos, directorios o patrones glob")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="número de procesos (por defecto, uno por núcleo)")
+    arg_parser.add_argument("--chunksize", type=int, default=None,
+                            help="archivos que se envían a cada proceso a la vez")
+    arg_parser.add_argument("--pattern", default="*.txt",
+                            help="patrón de archivos al recorrer directorios")
+    arg_parser.add_argument("--lexer", choices=sorted(PROGRAM_LEXERS), default="table",
+                            help="analizador léxico a utilizar")
+    arg_parser.add_argument("--expr-parser", choices=sorted(EXPR_PARSERS), default="iterative",
+                            help="analizador de expresiones aritméticas a utilizar")
+    arg_parser.add_argument("--program-parser", choices=sorted(PROGRAM_PARSERS), default="recursive",
+                            help="analizador de sentencias a utilizar")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="leer los archivos por bloques en lugar de cargarlos completos")
+    arg_parser.add_argument("--cache-size", type=non_negative_int, default=EXPR_CACHE_SIZE,
+                            help="expresiones distintas que recuerda cada proceso (0 lo desactiva)")
+    arg_parser.add_argument("--result-cache", metavar="DIR", default=None,
+                            help="directorio con resultados de ejecuciones anteriores")
+    arg_parser.add_argument("--result-cache-size", type=int, default=MAX_BYTES,
+                            help="bytes máximos del directorio de resultados")
+    arg_parser.add_argument("--recover", action="store_true",
+                            help="reportar todos los errores de cada archivo, no sólo el primero")
+    arg_parser.add_argument("--stats", action="store_true",
+                            help="mostrar el tiempo de cada fase y los contadores del análisis")
+    arg_parser.add_argument("--format", choices=sorted(FORMAT_SUFFIXES), default="text",
+                            help="texto o una línea de JSON por diagnóstico (jsonl)")
+    arg_parser.add_argument("-q", "--quiet", action="store_true",
+                            help="sólo mostrar los archivos con errores")
+    args = arg_parser.parse_args(argv)
+
+    files = expand_paths(args.paths, args.pattern)
+
+    if not files:
+        print("No se encontraron archivos de entrada.", file=sys.stderr)
+        return 2
+
+    result_cache = None
+
+    if args.result_cache:
+        result_cache = ResultCache(args.result_cache, args.result_cache_size)
+
+    stats = ValidationStats() if args.stats else None
+    failures = 0
+    total_bytes = 0
+    start = time.perf_counter()
+
+    for path, size, result in run_batch(files, args.jobs, args.chunksize, args.lexer, args.expr_parser,
+                                        args.stream, args.cache_size, result_cache, args.recover,
+                                        stats, args.format, args.program_parser):
+        total_bytes += size
+
+        if args.format == "jsonl":
+            # Sin encabezados: la ruta va en cada línea.
+            failures += bool(result)
+            sys.stdout.write(result)
+            continue
+
+        correct = result == CORRECT
+
+        if not correct:
+            failures += 1
+
+        if not (args.quiet and correct):
+            print(f"== {path}")
+            print(result.rstrip("\n"))
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    print(f"{len(files)} archivos ({failures} con errores), {total_bytes} bytes "
+          f"en {elapsed:.3f} s: {len(files) / elapsed:.1f} archivos/s, "
+          f"{total_bytes / elapsed:.0f} bytes/s", file=sys.stderr)
+
+    if stats is not None:
+        print(f"Fases: {stats.summary()}", file=sys.stderr)
+
+    # Con varios procesos cada uno tiene su caché y aquí no se ve.
+    expr_cache = expression_cache(args.expr_parser, args.cache_size)
+
+    if expr_cache is not None and expr_cache.misses:
+        stats = expr_cache.stats()
+        print(f"Caché de expresiones: {stats['hits']} aciertos, {stats['misses']} fallos, "
+              f"{stats['evictions']} desalojos", file=sys.stderr)
+
+    if result_cache is not None:
+        result_cache.prune()
+
+        if result_cache.hits or result_cache.misses:
+            print(f"Caché de resultados: {result_cache.hits} aciertos, {result_cache.misses} fallos",
+                  file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
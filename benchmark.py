@@ -0,0 +1,293 @@
+"""
+Mide por separado el analizador léxico de programas, el de
+expresiones, los analizadores de programas (el escrito a mano y el
+guiado por la tabla LL(1)) y el de expresiones sobre
+programas sintéticos (ver generator.py). Los resultados se pueden
+guardar como línea base en JSON y comparar contra ella en una
+ejecución posterior para detectar regresiones.
+
+Uso: python benchmark.py [--save base.json] [--compare base.json]
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+
+from execution_exceptions import *
+from generator import ProgramGenerator
+from lexer import PROGRAM_LEXERS, ArithmeticLexer, RecoveringProgramLexer, collect, replay
+from parser_class import EXPR_PARSERS, ProgramParser, RecoveringProgramParser, TableProgramParser
+from tokens import TokenType
+
+# Programas de cada caso: parámetros de ProgramGenerator, número
+# de sentencias y si se analizan con recuperación de errores. Sin
+# recuperación un programa con errores sólo se analiza hasta el
+# primero, y el caso mediría dónde cae en lugar de cuánto cuesta
+# manejarlos.
+CASES = {
+    "corto": {"statements": 200},
+    "largo": {"statements": 20000},
+    "variables": {"statements": 5000, "variables": 500},
+    "profundo": {"statements": 2000, "depth": 8},
+    "parentesis": {"statements": 2000, "depth": 4, "paren_depth": 6},
+    "errores": {"statements": 5000, "error_rate": 0.01, "recover": True},
+}
+
+COMPONENTS = ("program_lexer", "arithmetic_lexer", "program_parser", "table_parser", "arithmetic_parser")
+
+# Fracción que puede empeorar un tiempo antes de contar como regresión.
+TOLERANCE = 0.10
+# Con mediciones ruidosas la tolerancia crece: a lo menos estas veces
+# la dispersión relativa (mediana contra mejor tiempo) de la medición
+# base o de la actual, la que sea mayor.
+NOISE_FACTOR = 2.0
+# Duración mínima de cada muestra de una medición, en segundos.
+MIN_SAMPLE_SECONDS = 0.02
+# Una posible regresión se vuelve a medir con estas veces más
+# repeticiones antes de reportarla.
+CONFIRM_REPEAT = 4
+
+
+class StatementParser(ProgramParser):
+    """
+    ProgramParser sin el análisis de las expresiones, para medir
+    sólo las sentencias.
+    """
+    def parse_expr(self, expr):
+        pass
+
+    def parse_inline_expr(self, expr):
+        try:
+            for _ in self.inline_expr_tokens():
+                pass
+        except LexerError:
+            pass
+
+
+class TableStatementParser(StatementParser, TableProgramParser):
+    """
+    TableProgramParser sin el análisis de las expresiones.
+    """
+
+
+class RecoveringStatementParser(StatementParser, RecoveringProgramParser):
+    """
+    RecoveringProgramParser sin el análisis de las expresiones.
+    """
+
+
+class Workload:
+    """
+    Un programa generado y los tokens ya calculados de cada etapa,
+    para que cada medición incluya sólo la suya. Con recover se
+    usan RecoveringProgramLexer y RecoveringProgramParser, como en
+    validate, y no hay analizador por tabla que medir.
+    """
+    def __init__(self, text, lexer, expr_parser, recover=False):
+        self.text = text
+        self.recover = recover
+        self.lexer = RecoveringProgramLexer if recover else PROGRAM_LEXERS[lexer]
+        self.expr_parser = EXPR_PARSERS[expr_parser]
+        self.program_tokens = collect(self.lexer(text).generate_tokens())
+        self.expressions = [str(token.value) for token in self.program_tokens[0]
+                            if token.type in (TokenType.EXPR, TokenType.EXPR_BEGIN) and token.value]
+        self.expression_tokens = [collect(ArithmeticLexer(expr).generate_tokens())
+                                  for expr in self.expressions]
+        self.symbol_table = sorted({token.value for token in self.program_tokens[0]
+                                    if token.type == TokenType.ID})
+
+    def program_lexer(self):
+        collect(self.lexer(self.text).generate_tokens())
+
+    def arithmetic_lexer(self):
+        for expr in self.expressions:
+            collect(ArithmeticLexer(expr).generate_tokens())
+
+    def program_parser(self, parser_class=None):
+        parser_class = parser_class or (RecoveringStatementParser if self.recover else StatementParser)
+        parser = parser_class(replay(*self.program_tokens), self.expr_parser)
+
+        try:
+            parser.parse()
+        except InvalidSyntax:
+            pass
+
+    def table_parser(self):
+        self.program_parser(TableStatementParser)
+
+    def arithmetic_parser(self):
+        for expr, (tokens, error) in zip(self.expressions, self.expression_tokens):
+            parser = self.expr_parser(expr, self.symbol_table, replay(tokens, error))
+
+            try:
+                parser.parse()
+            except InvalidSyntax:
+                pass
+
+    def components(self):
+        return [component for component in COMPONENTS if not (self.recover and component == "table_parser")]
+
+
+def measure(function, repeat):
+    # Una primera ejecución, que no cuenta, calienta y calibra: las
+    # funciones rápidas se repiten varias veces en cada muestra para
+    # que ninguna dure menos de MIN_SAMPLE_SECONDS.
+    start = time.perf_counter()
+    function()
+    number = max(1, math.ceil(MIN_SAMPLE_SECONDS / max(time.perf_counter() - start, 1e-9)))
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for _ in range(number):
+            function()
+
+        times.append((time.perf_counter() - start) / number)
+
+    best = min(times)
+    median = statistics.median(times)
+
+    return {"best": best, "median": median, "spread": median / best - 1 if best else 0.0}
+
+
+def case_workload(name, seed=0, lexer="table", expr_parser="iterative"):
+    parameters = dict(CASES[name])
+    statements = parameters.pop("statements")
+    recover = parameters.pop("recover", False)
+    text = ProgramGenerator(seed, **parameters).program(statements)
+
+    return Workload(text, lexer, expr_parser, recover)
+
+
+def run_benchmarks(cases, repeat=5, seed=0, lexer="table", expr_parser="iterative"):
+    results = {}
+
+    for name in cases:
+        workload = case_workload(name, seed, lexer, expr_parser)
+        results[name] = {"bytes": len(workload.text.encode("utf-8"))}
+
+        for component in workload.components():
+            results[name][component] = measure(getattr(workload, component), repeat)
+
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Regresa una lista de (caso, componente, tiempo base, tiempo
+    actual) de las mediciones que empeoraron más que lo permitido:
+    tolerance, o NOISE_FACTOR veces la dispersión de cualquiera de
+    las dos mediciones si es mayor. Se comparan los mejores tiempos,
+    que son los más estables.
+    """
+    regressions = []
+
+    for name, components in results.items():
+        for component in COMPONENTS:
+            if component not in components:
+                continue
+
+            try:
+                before = baseline["results"][name][component]
+            except KeyError:
+                continue
+
+            after = components[component]
+            # Las líneas base anteriores no guardan la dispersión.
+            spread = max(before.get("spread", 0.0), after["spread"])
+            allowed = max(tolerance, NOISE_FACTOR * spread)
+
+            if after["best"] > before["best"] * (1 + allowed):
+                regressions.append((name, component, before["best"], after["best"]))
+
+    return regressions
+
+
+def confirm(results, regressions, repeat, seed=0, lexer="table", expr_parser="iterative"):
+    """
+    Vuelve a medir con CONFIRM_REPEAT veces más repeticiones los
+    componentes de regressions y actualiza results con el mejor
+    tiempo de las dos mediciones.
+    """
+    for name in dict.fromkeys(name for name, _, _, _ in regressions):
+        workload = case_workload(name, seed, lexer, expr_parser)
+
+        for component in [component for case, component, _, _ in regressions if case == name]:
+            timing = measure(getattr(workload, component), repeat * CONFIRM_REPEAT)
+            timing["best"] = min(timing["best"], results[name][component]["best"])
+            results[name][component] = timing
+
+
+# Opciones que deben coincidir para que dos mediciones sean comparables.
+def document_settings(args):
+    return {"seed": args.seed, "lexer": args.lexer, "expr_parser": args.expr_parser}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Mide el rendimiento de los analizadores.")
+    arg_parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES),
+                            help="casos a medir")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="repeticiones por medición")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--lexer", choices=sorted(PROGRAM_LEXERS), default="table")
+    arg_parser.add_argument("--expr-parser", choices=sorted(EXPR_PARSERS), default="iterative")
+    arg_parser.add_argument("--save", metavar="ARCHIVO", help="guardar los resultados como línea base")
+    arg_parser.add_argument("--compare", metavar="ARCHIVO", help="comparar contra una línea base")
+    arg_parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                            help="fracción de empeoramiento permitida (crece con la dispersión)")
+    args = arg_parser.parse_args(argv)
+
+    results = run_benchmarks(args.cases, args.repeat, args.seed, args.lexer, args.expr_parser)
+
+    for name, components in results.items():
+        print(f"{name} ({components['bytes']} bytes)")
+
+        for component in COMPONENTS:
+            if component not in components:
+                continue
+
+            timing = components[component]
+            print(f"  {component:<18} {timing['best'] * 1000:10.3f} ms "
+                  f"(mediana {timing['median'] * 1000:.3f} ms)")
+
+    if args.save:
+        document = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "settings": document_settings(args),
+            "results": results,
+        }
+
+        with open(args.save, "w", encoding="utf-8") as output_file:
+            json.dump(document, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as input_file:
+            baseline = json.load(input_file)
+
+        if baseline.get("settings") != document_settings(args):
+            print("Aviso: la línea base se midió con otra configuración.", file=sys.stderr)
+
+        regressions = compare(results, baseline, args.tolerance)
+
+        if regressions:
+            confirm(results, regressions, args.repeat, args.seed, args.lexer, args.expr_parser)
+            regressions = compare(results, baseline, args.tolerance)
+
+        for name, component, before, after in regressions:
+            print(f"Regresión en {name}/{component}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms "
+                  f"({after / before - 1:+.0%})", file=sys.stderr)
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Evaluación exacta de programas con límites de recursos. Los
+números son enteros de Python y fracciones, así que no se pierde
+precisión, pero una expresión como a^(reloj*5) puede pedir un entero
+de millones de dígitos. Para que un programa así no se quede con el
+proceso, cada ejecución tiene un presupuesto:
+
+- pasos: nodos de las expresiones evaluados,
+- segundos,
+- bits de cada entero (del numerador y del denominador de una fracción).
+
+El tamaño de una potencia se estima antes de calcularla. Un resultado
+que rebasaría el límite de bits, o que no es exacto (una división
+entre cero, una raíz), se calcula con la aritmética de respaldo:
+float64 como en interpreter.py, o decimal con precisión fija. Sin
+respaldo se detiene la ejecución. Rebasar los pasos o el tiempo la
+detiene siempre.
+
+Uso: python bounded.py [--data DATOS.csv] [--fallback F] [-j N] PROGRAMA [PROGRAMA ...]
+"""
+import argparse
+import csv
+import decimal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import partial
+
+import numpy as np
+
+from execution_exceptions import *
+from interpreter import OPERATIONS, parse_program, read_names
+from ir import Assign, Negate, Number, Print, Read, Variable, children
+from optimizer import exact_number, exact_operation
+from tokens import TokenType
+
+# Límites por omisión de cada ejecución.
+MAX_STEPS = 1_000_000
+MAX_SECONDS = 5.0
+# Con más de 4300 dígitos (unos 14000 bits) Python ya no convierte
+# un entero a texto.
+MAX_BITS = 1 << 13
+# Tope de max_bits: con enteros así una sola operación entre
+# fracciones (que calcula máximos comunes divisores) ya toma décimas
+# de segundo, y el tiempo sólo se revisa entre operaciones.
+MAX_BITS_CEILING = 1 << 18
+# Dígitos significativos del respaldo decimal y de las fracciones
+# al escribirlas.
+DECIMAL_PRECISION = 34
+OUTPUT_PRECISION = 17
+FALLBACKS = ("float", "decimal", "none")
+
+
+class Limits:
+    """
+    Presupuesto de una ejecución. fallback es la aritmética de
+    respaldo: "float", "decimal" o None para detenerse. Lanza
+    ValueError si max_bits rebasa MAX_BITS_CEILING.
+    """
+    __slots__ = ("max_steps", "max_seconds", "max_bits", "fallback", "precision")
+
+    def __init__(self, max_steps=MAX_STEPS, max_seconds=MAX_SECONDS, max_bits=MAX_BITS,
+                 fallback="float", precision=DECIMAL_PRECISION):
+        if max_bits > MAX_BITS_CEILING:
+            raise ValueError(f"max_bits no puede pasar de {MAX_BITS_CEILING}")
+
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_bits = max_bits
+        self.fallback = fallback
+        self.precision = precision
+
+
+class BoundedEvaluator:
+    """
+    Ejecuta un Program con la aritmética exacta y los límites de
+    limits. Los pasos y el tiempo se cuentan para todas las filas
+    que se ejecuten con el mismo evaluador.
+    """
+    def __init__(self, program, limits=None):
+        self.program = program
+        self.limits = limits or Limits()
+        self.steps = 0
+        self.deadline = time.monotonic() + self.limits.max_seconds
+        self.context = decimal.Context(prec=self.limits.precision, traps=[])
+        # Valor exacto de cada constante.
+        self.constants = {}
+
+    def charge(self):
+        self.steps += 1
+
+        if self.steps > self.limits.max_steps:
+            raise ResourceLimitExceeded(f"Se excedió el límite de {self.limits.max_steps} pasos.")
+
+        # Cada operación cabe en el límite de bits, así que revisar
+        # el reloj en cada paso basta para no pasarse mucho.
+        if time.monotonic() > self.deadline:
+            raise ResourceLimitExceeded(f"Se excedió el límite de {self.limits.max_seconds} s.")
+
+    def inexact(self, operator, left, right):
+        fallback = self.limits.fallback
+
+        if fallback == "float":
+            return OPERATIONS[operator](self.to_float(left), self.to_float(right))
+
+        if fallback == "decimal":
+            return DECIMAL_OPERATIONS[operator](self.context, self.to_decimal(left),
+                                                self.to_decimal(right))
+
+        if operator == TokenType.DIVIDE and right == 0:
+            raise ExecutionError("División entre cero.")
+
+        if operator == TokenType.POWER and (not isinstance(right, int) or left == 0):
+            raise ExecutionError("La potencia no tiene un resultado exacto.")
+
+        raise ResourceLimitExceeded(f"El resultado tendría más de {self.limits.max_bits} bits.")
+
+    def to_float(self, value):
+        if isinstance(value, np.float64):
+            return value
+
+        try:
+            return np.float64(value)
+        except OverflowError:
+            return np.float64(np.inf if value > 0 else -np.inf)
+
+    def to_decimal(self, value):
+        if isinstance(value, decimal.Decimal):
+            return value
+
+        if isinstance(value, Fraction):
+            return self.context.divide(decimal.Decimal(value.numerator), decimal.Decimal(value.denominator))
+
+        return self.context.plus(decimal.Decimal(value))
+
+    def operate(self, operator, left, right):
+        if isinstance(left, (int, Fraction)) and isinstance(right, (int, Fraction)):
+            result = exact_operation(operator, left, right, self.limits.max_bits)
+
+            if result is not None:
+                return result
+
+        return self.inexact(operator, left, right)
+
+    def negate(self, value):
+        if isinstance(value, decimal.Decimal):
+            return self.context.minus(value)
+
+        return -value
+
+    def evaluate(self, expr, env):
+        values = []
+        stack = [(expr, False)]
+
+        while stack:
+            node, expanded = stack.pop()
+            self.charge()
+
+            if isinstance(node, Number):
+                if node.value not in self.constants:
+                    self.constants[node.value] = exact_number(node.value)
+
+                values.append(self.constants[node.value])
+            elif isinstance(node, Variable):
+                values.append(env[node.name])
+            elif not expanded:
+                stack.append((node, True))
+
+                for child in reversed(children(node)):
+                    stack.append((child, False))
+            elif isinstance(node, Negate):
+                values.append(self.negate(values.pop()))
+            else:
+                right = values.pop()
+                values.append(self.operate(node.operator, values.pop(), right))
+
+        return values[0]
+
+    def run(self, inputs=()):
+        """
+        Ejecuta el programa una vez. inputs tiene un valor por cada
+        'leer', en orden. Regresa una lista con el valor de cada
+        'imprimir'.
+        """
+        inputs = iter(inputs)
+        env = {}
+        outputs = []
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for statement in self.program.statements:
+                if isinstance(statement, Read):
+                    try:
+                        env[statement.name] = exact_number(next(inputs))
+                    except StopIteration:
+                        raise ExecutionError(f"No hay datos para la variable: {statement.name}.")
+                    except (ValueError, ZeroDivisionError):
+                        raise ExecutionError(f"Dato inválido para la variable: {statement.name}.")
+                elif isinstance(statement, Assign):
+                    env[statement.name] = self.evaluate(statement.expr, env)
+                elif isinstance(statement, Print):
+                    outputs.append(env[statement.name])
+
+        return outputs
+
+
+DECIMAL_OPERATIONS = {
+    TokenType.SUM: decimal.Context.add,
+    TokenType.SUBSTRACTION: decimal.Context.subtract,
+    TokenType.MULTIPLY: decimal.Context.multiply,
+    TokenType.DIVIDE: decimal.Context.divide,
+    TokenType.POWER: decimal.Context.power,
+}
+
+
+def format_value(value):
+    """
+    Texto de un valor para la salida: los enteros completos, las
+    fracciones y los float64 con 17 dígitos significativos.
+    """
+    if isinstance(value, int):
+        try:
+            return str(value)
+        except ValueError:
+            # Demasiados dígitos; sólo con un límite de bits mayor
+            # al de omisión.
+            pass
+
+    if isinstance(value, (int, Fraction)):
+        context = decimal.Context(prec=OUTPUT_PRECISION)
+        return str(context.divide(decimal.Decimal(value.numerator), decimal.Decimal(value.denominator)))
+
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+
+    return f"{value:.17g}"
+
+
+def read_rows(path):
+    """
+    Lee un CSV cuya primera fila nombra las columnas y regresa los
+    nombres y las filas como texto, para no perder exactitud.
+    """
+    with open(path, encoding="utf-8", newline="") as input_file:
+        reader = csv.reader(input_file)
+        names = [name.strip() for name in next(reader, [])]
+        rows = [[cell.strip() for cell in row] for row in reader if row]
+
+    if any(len(row) != len(names) for row in rows):
+        raise ExecutionError("El número de columnas no coincide con el encabezado.")
+
+    return names, rows
+
+
+def run_file(path, data=None, limits=None):
+    """
+    Ejecuta el programa de path con cada fila de data (los nombres
+    y filas de read_rows; sin datos, una sola vez) y regresa la
+    ruta, la salida como CSV (o el error que la detuvo) y si terminó.
+    Los límites valen para todas las filas juntas.
+    """
+    try:
+        with open(path, encoding="utf-8") as input_file:
+            program = parse_program(input_file.read())
+
+        evaluator = BoundedEvaluator(program, limits)
+        reads = read_names(program)
+        prints = [statement.name for statement in program.statements if isinstance(statement, Print)]
+
+        if data is None:
+            rows = [[]]
+        else:
+            names, rows = data
+            missing = [name for name in reads if name not in names]
+
+            if missing:
+                raise ExecutionError(f"No hay datos para la variable: {missing[0]}.")
+
+            columns = [names.index(name) for name in reads]
+            rows = [[row[column] for column in columns] for row in rows]
+
+        lines = [",".join(prints)]
+
+        for row in rows:
+            lines.append(",".join(format_value(value) for value in evaluator.run(row)))
+    except ExecutionError as e:
+        return path, e.message, False
+    except OSError as e:
+        return path, f"Error: {e}\n", False
+
+    return path, "\n".join(lines) + "\n", True
+
+
+def print_results(results, headers):
+    failures = 0
+
+    for path, output, finished in results:
+        if headers:
+            print(f"== {path}")
+
+        sys.stdout.write(output)
+        failures += not finished
+
+    return failures
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Ejecuta programas con aritmética exacta y límites.")
+    arg_parser.add_argument("paths", nargs="+", metavar="PROGRAMA")
+    arg_parser.add_argument("--data", metavar="DATOS.csv", default=None,
+                            help="CSV con una columna por variable de 'leer'")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="número de procesos (por defecto, uno por núcleo)")
+    arg_parser.add_argument("--max-steps", type=int, default=MAX_STEPS,
+                            help="nodos de expresión que puede evaluar cada programa")
+    arg_parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS,
+                            help="segundos que puede tomar cada programa")
+    arg_parser.add_argument("--max-bits", type=int, default=MAX_BITS,
+                            help=f"bits máximos de cada entero (a lo más {MAX_BITS_CEILING})")
+    arg_parser.add_argument("--fallback", choices=FALLBACKS, default="float",
+                            help="aritmética para los resultados inexactos o demasiado grandes")
+    arg_parser.add_argument("--precision", type=int, default=DECIMAL_PRECISION,
+                            help="dígitos significativos con --fallback decimal")
+    args = arg_parser.parse_args(argv)
+
+    if args.max_bits > MAX_BITS_CEILING:
+        arg_parser.error(f"--max-bits no puede pasar de {MAX_BITS_CEILING}")
+
+    limits = Limits(args.max_steps, args.max_seconds, args.max_bits,
+                    None if args.fallback == "none" else args.fallback, args.precision)
+
+    try:
+        data = read_rows(args.data) if args.data else None
+    except (ExecutionError, OSError) as e:
+        print(getattr(e, "message", f"Error: {e}\n"), end="", file=sys.stderr)
+        return 2
+
+    run = partial(run_file, data=data, limits=limits)
+    headers = len(args.paths) > 1
+
+    # Cada programa tiene sus límites, así que ninguno puede dejar
+    # a un proceso ocupado indefinidamente.
+    if args.jobs == 1 or not headers:
+        failures = print_results(map(run, args.paths), headers)
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            failures = print_results(executor.map(run, args.paths), headers)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Compila programas validados a código de Python. El programa se
+convierte en una función cuyos parámetros son las variables de
+'leer', cada ':=' es una asignación a una variable local y cada
+'imprimir' agrega el valor a la lista que regresa la función. El
+código fuente se compila con compile() y el objeto de código se
+guarda en disco con marshal, indexado por el texto del programa, así
+que en las siguientes ejecuciones no se analiza nada: se carga el
+código y se llama a la función.
+
+La aritmética es la del intérprete: las constantes son float64 de
+NumPy y cada operación llama a la misma función de NumPy que
+interpreter.evaluate, así que el resultado es idéntico al de
+interpreter.run. Los operadores de Python no sirven: entre dos
+escalares de NumPy no pasan por esas funciones, y x ** 0.5 sobre un
+arreglo se calcula con np.sqrt, que puede diferir en el signo de NaN.
+
+Uso: python compiler.py [--cache DIR] [--source] PROGRAMA [DATOS.csv]
+"""
+import argparse
+import hashlib
+import importlib.util
+import marshal
+import sys
+
+import numpy as np
+
+from execution_exceptions import *
+from interpreter import OPERATIONS, input_columns, parse_program, read_columns, shared_nodes, write_outputs
+from ir import Assign, Negate, Number, Print, Read, Variable, children
+from optimizer import optimize_program
+from result_cache import MAX_BYTES, VERSIONED_MODULES, ResultCache, code_version
+
+# Además de los analizadores, el código generado depende de estos.
+COMPILER_MODULES = VERSIONED_MODULES + ("interpreter.py", "result_cache.py", "compiler.py")
+
+# Nombre de la función generada.
+ENTRY_POINT = "programa"
+
+
+class SourceWriter:
+    """
+    Genera el código de Python de un Program ya optimizado. Las
+    variables del programa se renombran a v0, v1, ... para que
+    ninguna choque con una palabra reservada de Python; las
+    constantes se definen una vez fuera de la función.
+
+    Cada expresión se escribe como código de tres direcciones: un
+    nodo por asignación, así que no hay límite de anidamiento. Los
+    resultados intermedios ocupan los registros t0, t1, ... según su
+    profundidad y se reutilizan entre sentencias; los nodos que el
+    optimizador compartió entre expresiones quedan en su propia
+    variable s0, s1, ... y se calculan una sola vez, igual que en
+    interpreter.evaluate.
+    """
+    def __init__(self, program):
+        self.program = program
+        self.shared = shared_nodes(program)
+        self.locals = {}
+        self.constants = {}
+        self.computed = {}
+        self.body = []
+
+    def local(self, name):
+        return self.locals.setdefault(name, f"v{len(self.locals)}")
+
+    def constant(self, value):
+        return self.constants.setdefault(value.hex(), f"c{len(self.constants)}")
+
+    def expression(self, expr):
+        values = []
+        stack = [(expr, 0, False)]
+
+        while stack:
+            node, depth, expanded = stack.pop()
+
+            if id(node) in self.computed:
+                values.append(self.computed[id(node)])
+                continue
+
+            if isinstance(node, Number):
+                values.append(self.constant(node.value))
+                continue
+
+            if isinstance(node, Variable):
+                values.append(self.local(node.name))
+                continue
+
+            if not expanded:
+                stack.append((node, depth, True))
+
+                for offset, child in reversed(list(enumerate(children(node)))):
+                    stack.append((child, depth + offset, False))
+
+                continue
+
+            if isinstance(node, Negate):
+                code = f"negative({values.pop()})"
+            else:
+                right = values.pop()
+                code = f"{OPERATIONS[node.operator].__name__}({values.pop()}, {right})"
+
+            if id(node) in self.shared:
+                target = self.computed[id(node)] = f"s{len(self.computed)}"
+            else:
+                target = f"t{depth}"
+
+            self.body.append(f"    {target} = {code}")
+            values.append(target)
+
+        return values[0]
+
+    def source(self):
+        parameters = []
+        reads = []
+        prints = []
+
+        for statement in self.program.statements:
+            if isinstance(statement, Read):
+                parameters.append(f"p{len(parameters)}")
+                reads.append(statement.name)
+                self.body.append(f"    {self.local(statement.name)} = {parameters[-1]}")
+            elif isinstance(statement, Assign):
+                value = self.expression(statement.expr)
+                self.body.append(f"    {self.local(statement.name)} = {value}")
+            elif isinstance(statement, Print):
+                prints.append(statement.name)
+                self.body.append(f"    salida.append({self.local(statement.name)})")
+
+        lines = [
+            f"NOMBRE = {self.program.name!r}",
+            f"LEER = {tuple(reads)!r}",
+            f"IMPRIMIR = {tuple(prints)!r}",
+        ]
+        lines.extend(f"{name} = float64(fromhex({value!r}))" for value, name in self.constants.items())
+        lines.append("")
+        lines.append(f"def {ENTRY_POINT}({', '.join(parameters)}):")
+        lines.append("    salida = []")
+        lines.extend(self.body)
+        lines.append("    return salida")
+
+        return "\n".join(lines) + "\n"
+
+
+def generate_source(text):
+    """
+    Valida el programa y regresa el código de Python que lo ejecuta.
+    Lanza ExecutionError si el programa no se puede ejecutar.
+    """
+    return SourceWriter(optimize_program(parse_program(text))).source()
+
+
+class CodeCache(ResultCache):
+    """
+    Objetos de código compilados, como bytes de marshal. La clave
+    incluye la versión del compilador y la de los objetos de código
+    de este intérprete de Python.
+    """
+    binary = True
+
+    def __init__(self, directory, max_bytes=MAX_BYTES, version=None):
+        super().__init__(directory, max_bytes, version or code_version(COMPILER_MODULES))
+
+    def source_key(self, text):
+        digest = hashlib.sha256(f"{self.version}\0".encode() + importlib.util.MAGIC_NUMBER + b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+
+        return digest.hexdigest()
+
+
+class CompiledProgram:
+    """
+    Un programa listo para ejecutarse: el resultado de ejecutar el
+    objeto de código generado.
+    """
+    def __init__(self, code):
+        namespace = {"float64": np.float64, "fromhex": float.fromhex, "negative": np.negative}
+        namespace.update((operation.__name__, operation) for operation in OPERATIONS.values())
+        exec(code, namespace)
+        self.name = namespace["NOMBRE"]
+        self.reads = namespace["LEER"]
+        self.prints = namespace["IMPRIMIR"]
+        self.function = namespace[ENTRY_POINT]
+
+    def run(self, inputs=(), size=None):
+        """
+        Igual que interpreter.run: regresa una lista con un arreglo
+        por cada 'imprimir'.
+        """
+        columns = input_columns(self.reads, inputs)
+
+        if columns:
+            size = len(columns[0])
+        elif size is None:
+            size = 1
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = self.function(*columns)
+
+        return [np.broadcast_to(value, (size,)).copy() for value in values]
+
+
+def compile_program(text, cache=None):
+    """
+    Regresa el CompiledProgram del texto. Con cache (un CodeCache) el
+    código compilado se toma de ahí si existe y si no se guarda.
+    """
+    key = None
+
+    if cache is not None:
+        key = cache.source_key(text)
+        data = cache.get(key)
+
+        if data is not None:
+            try:
+                return CompiledProgram(marshal.loads(data))
+            except (EOFError, ValueError, TypeError):
+                # Una entrada dañada se vuelve a compilar.
+                pass
+
+    source = generate_source(text)
+    code = compile(source, f"<{ENTRY_POINT}>", "exec")
+
+    if cache is not None:
+        # Si no se puede guardar, el código sigue sirviendo.
+        try:
+            cache.put(key, marshal.dumps(code))
+        except OSError:
+            pass
+
+    return CompiledProgram(code)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compila un programa a Python y lo ejecuta.")
+    arg_parser.add_argument("program", help="archivo con el programa")
+    arg_parser.add_argument("data", nargs="?", help="CSV con una columna por variable de 'leer'")
+    arg_parser.add_argument("--cache", metavar="DIR", default=None,
+                            help="directorio donde guardar el código compilado")
+    arg_parser.add_argument("--source", action="store_true",
+                            help="imprimir el código de Python generado en lugar de ejecutarlo")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        with open(args.program, encoding="utf-8") as input_file:
+            text = input_file.read()
+
+        if args.source:
+            sys.stdout.write(generate_source(text))
+            return 0
+
+        program = compile_program(text, CodeCache(args.cache) if args.cache else None)
+        outputs = program.run(read_columns(args.data) if args.data else ())
+    except ExecutionError as e:
+        print(e.message, end="", file=sys.stderr)
+        return 1
+
+    write_outputs(program.prints, outputs)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
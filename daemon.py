@@ -0,0 +1,334 @@
+"""
+Servidor de validación residente: evita pagar el arranque del
+intérprete y la importación de los analizadores por cada archivo.
+Escucha en un socket Unix o en la entrada y salida estándar y habla
+JSON por líneas: cada línea es una petición y cada respuesta otra
+línea con el mismo "id".
+
+Peticiones:
+    {"id": 1, "text": "programa p;\\n..."}
+    {"id": 2, "path": "Ejemplos/a.txt", "recover": true, "stats": true}
+    {"id": 3, "command": "metrics"}
+
+Opcionalmente llevan "lexer" y "expr_parser" (ver PROGRAM_LEXERS y
+EXPR_PARSERS). Las respuestas son {"id": ..., "result": ...,
+"elapsed_ms": ...} o {"id": ..., "error": ...}. Pueden llegar en un
+orden distinto al de las peticiones.
+
+Uso: python daemon.py [--socket RUTA] [-j N] [--max-pending N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import non_negative_int
+from lexer import PROGRAM_LEXERS
+from parser_class import EXPR_CACHE_SIZE, EXPR_PARSERS
+from instrumentation import ValidationStats
+from validator import expression_cache, validate, validate_file
+
+# Peticiones que se aceptan a la vez entre todas las conexiones, por
+# cada proceso de trabajo; al llegar al límite se deja de leer de
+# las conexiones hasta que alguna termine.
+PENDING_PER_WORKER = 4
+# Tamaño máximo de una línea de petición, en bytes.
+MAX_REQUEST_BYTES = 64 << 20
+# Latencias recientes con las que se calculan los percentiles.
+LATENCY_WINDOW = 4096
+
+
+def handle_request(request, cache_size=EXPR_CACHE_SIZE):
+    """
+    Atiende una petición de validación en un proceso de trabajo y
+    regresa el contenido de la respuesta.
+    """
+    lexer = request.get("lexer", "table")
+    expr_parser = request.get("expr_parser", "iterative")
+    recover = bool(request.get("recover", False))
+
+    if lexer not in PROGRAM_LEXERS or expr_parser not in EXPR_PARSERS:
+        return {"error": f"Analizador desconocido: {lexer}, {expr_parser}"}
+
+    stats = ValidationStats() if request.get("stats") else None
+    expr_cache = expression_cache(expr_parser, cache_size)
+
+    if "path" in request:
+        _, _, result = validate_file(request["path"], lexer, expr_parser, cache_size=cache_size,
+                                     recover=recover, stats=stats)
+    elif isinstance(request.get("text"), str):
+        try:
+            result = validate(request["text"], lexer, expr_parser, expr_cache=expr_cache,
+                              recover=recover, stats=stats)
+        except Exception as e:
+            result = f"Error interno: {type(e).__name__}: {e}\n"
+    else:
+        return {"error": "La petición debe tener \"text\" o \"path\"."}
+
+    response = {"result": result}
+
+    if stats is not None:
+        response["stats"] = stats.as_dict()
+
+    return response
+
+
+class Metrics:
+    """
+    Contadores del servidor y latencias recientes de las peticiones,
+    desde que se leen hasta que se escribe su respuesta.
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.connections = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latency, error):
+        self.requests += 1
+        self.errors += error
+        self.latencies.append(latency)
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+
+            return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000
+
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "connections": self.connections,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99),
+                           "max": latencies[-1] * 1000 if latencies else 0.0},
+        }
+
+
+class ValidationServer:
+    """
+    Atiende conexiones con asyncio y manda el análisis, que ocupa
+    el procesador, a un grupo de procesos. max_pending limita las
+    peticiones aceptadas y sin responder; mientras esté lleno no se
+    leen más líneas, así que la presión llega hasta los clientes.
+    """
+    def __init__(self, workers=None, max_pending=None, cache_size=EXPR_CACHE_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * PENDING_PER_WORKER
+        self.cache_size = cache_size
+        self.executor = None
+        self.pending = None
+        self.metrics = Metrics()
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.pending = asyncio.Semaphore(self.max_pending)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        self.metrics.connections += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # La línea rebasó MAX_REQUEST_BYTES; ya no se
+                    # puede saber dónde empieza la siguiente.
+                    await self.respond(writer, write_lock, {"id": None, "error": "Petición demasiado grande."})
+                    break
+
+                if not line:
+                    break
+
+                # Una conexión abierta sin peticiones no ocupa lugar;
+                # el lugar se toma con la línea completa y mientras
+                # no haya uno libre no se lee la siguiente.
+                await self.pending.acquire()
+                task = asyncio.create_task(self.serve(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            self.metrics.connections -= 1
+            writer.close()
+
+    async def serve(self, line, writer, write_lock):
+        start = time.perf_counter()
+        self.metrics.in_flight += 1
+        request_id = None
+
+        try:
+            try:
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                except (ValueError, AttributeError):
+                    response = {"error": "JSON inválido."}
+                else:
+                    response = await self.dispatch(request)
+            finally:
+                self.metrics.in_flight -= 1
+
+            response = {"id": request_id, **response}
+
+            if "result" in response:
+                response["elapsed_ms"] = (time.perf_counter() - start) * 1000
+
+            await self.respond(writer, write_lock, response)
+        finally:
+            # La petición cuenta hasta que su respuesta está escrita.
+            self.pending.release()
+
+        self.metrics.record(time.perf_counter() - start, "error" in response)
+
+    async def dispatch(self, request):
+        command = request.get("command")
+
+        if command == "metrics":
+            return {"result": self.metrics.snapshot()}
+
+        if command is not None:
+            return {"error": f"Comando desconocido: {command}"}
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(self.executor, handle_request, request, self.cache_size)
+        except Exception as e:
+            return {"error": f"Error interno: {type(e).__name__}: {e}"}
+
+    async def respond(self, writer, write_lock, response):
+        data = json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n"
+
+        async with write_lock:
+            try:
+                writer.write(data)
+                await writer.drain()
+            except ConnectionError:
+                # El cliente se fue; su respuesta ya no le importa.
+                pass
+
+
+class StandardStreams:
+    """
+    La entrada y salida estándar con la interfaz de StreamReader y
+    StreamWriter que usa handle_connection. Pueden ser archivos
+    normales, que asyncio no sabe vigilar, así que las lecturas se
+    hacen en un hilo y las escrituras se bloquean hasta terminar.
+    """
+    def __init__(self, input_file=None, output_file=None):
+        self.input_file = input_file or sys.stdin.buffer
+        self.output_file = output_file or sys.stdout.buffer
+
+    async def readline(self):
+        loop = asyncio.get_running_loop()
+        line = await loop.run_in_executor(None, self.input_file.readline, MAX_REQUEST_BYTES + 1)
+
+        if len(line) > MAX_REQUEST_BYTES:
+            raise ValueError("Línea demasiado larga.")
+
+        return line
+
+    def write(self, data):
+        self.output_file.write(data)
+
+    async def drain(self):
+        self.output_file.flush()
+
+    def close(self):
+        self.output_file.flush()
+
+
+def socket_in_use(path):
+    """
+    Indica si otro servidor escucha en el socket. start_unix_server
+    reemplaza cualquier socket que exista en la ruta, así que sin
+    esta revisión le quitaríamos el suyo.
+    """
+    probe = socket.socket(socket.AF_UNIX)
+
+    try:
+        probe.connect(path)
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+    return True
+
+
+async def serve(args):
+    server = ValidationServer(args.jobs, args.max_pending, args.cache_size)
+    await server.start()
+
+    try:
+        if args.socket is None:
+            streams = StandardStreams()
+            await server.handle_connection(streams, streams)
+            return
+
+        if socket_in_use(args.socket):
+            print(f"Ya hay un servidor escuchando en {args.socket}", file=sys.stderr)
+            return
+
+        unix_server = await asyncio.start_unix_server(server.handle_connection, args.socket,
+                                                      limit=MAX_REQUEST_BYTES)
+        print(f"Escuchando en {args.socket}", file=sys.stderr)
+
+        # Con SIGTERM se termina igual que con Ctrl+C, borrando el socket.
+        serving = asyncio.ensure_future(unix_server.serve_forever())
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+
+        try:
+            async with unix_server:
+                await serving
+        except asyncio.CancelledError:
+            pass
+        finally:
+            os.unlink(args.socket)
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Servidor de validación residente.")
+    arg_parser.add_argument("--socket", metavar="RUTA", default=None,
+                            help="socket Unix en el que escuchar (por defecto, entrada y salida estándar)")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="procesos de trabajo (por defecto, uno por núcleo)")
+    arg_parser.add_argument("--max-pending", type=int, default=None,
+                            help="peticiones aceptadas sin responder antes de dejar de leer")
+    arg_parser.add_argument("--cache-size", type=non_negative_int, default=EXPR_CACHE_SIZE,
+                            help="expresiones distintas que recuerda cada proceso (0 lo desactiva)")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
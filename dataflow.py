@@ -0,0 +1,246 @@
+"""
+Análisis de flujo de datos de un programa. Los programas no tienen
+saltos, así que basta una pasada hacia adelante para saber qué
+variables están definitivamente inicializadas en cada uso y una hacia
+atrás para saber qué variables siguen vivas (su valor se usará) después
+de cada sentencia. Se reportan:
+
+- usos de variables que no se han inicializado,
+- asignaciones cuyo valor nunca se usa ni se imprime,
+- variables leídas con 'leer' que nunca se usan.
+
+Los identificadores se convierten en enteros conforme el analizador
+léxico los produce y los conjuntos son arreglos de bits, así que cada
+sentencia cuesta lo mismo sin importar cuántas variables haya.
+
+Uso: python dataflow.py ARCHIVO [ARCHIVO ...]
+"""
+import argparse
+import sys
+
+from execution_exceptions import *
+from lexer import ArithmeticLexer, RecoveringProgramLexer
+from tokens import TokenType
+
+# Tipos de sentencia.
+READ, PRINT, ASSIGN = range(3)
+
+# Tipos de diagnóstico.
+UNINITIALIZED, DEAD_ASSIGNMENT, UNUSED_READ = range(3)
+
+MESSAGES = {
+    UNINITIALIZED: "Aviso: uso de variable sin inicializar: {}.",
+    DEAD_ASSIGNMENT: "Aviso: el valor asignado a {} nunca se usa.",
+    UNUSED_READ: "Aviso: la variable {} se lee y nunca se usa.",
+}
+
+
+class BitSet:
+    """
+    Conjunto de enteros no negativos, un bit por elemento. Agregar,
+    quitar y consultar toman tiempo constante.
+    """
+    __slots__ = ("bits",)
+
+    def __init__(self, size):
+        self.bits = bytearray((size + 7) >> 3)
+
+    def add(self, element):
+        self.bits[element >> 3] |= 1 << (element & 7)
+
+    def discard(self, element):
+        self.bits[element >> 3] &= ~(1 << (element & 7))
+
+    def __contains__(self, element):
+        return self.bits[element >> 3] >> (element & 7) & 1
+
+
+class Symbols:
+    """
+    Asigna a cada identificador un entero, en orden de aparición.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        try:
+            return self.ids[name]
+        except KeyError:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            return self.ids[name]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def interned_ids(tokens, symbols):
+    """
+    Sustituye el valor de los tokens ID por su entero en symbols
+    conforme llegan. Regresa (tipo, valor) en lugar de Token.
+    """
+    intern = symbols.intern
+
+    for token in tokens:
+        if token.type == TokenType.ID:
+            yield TokenType.ID, intern(token.value)
+        else:
+            yield token.type, token.value
+
+
+class Statement:
+    __slots__ = ("kind", "line", "target", "uses")
+
+    def __init__(self, kind, line, target, uses=()):
+        self.kind = kind
+        self.line = line
+        self.target = target
+        self.uses = uses
+
+
+class DataflowAnalysis:
+    """
+    Analiza el texto de un programa. Las sentencias mal formadas se
+    omiten: los errores de sintaxis los reporta validator.validate.
+    """
+    def __init__(self, text):
+        self.symbols = Symbols()
+        # Variables de cada expresión, por texto.
+        self.expression_uses = {}
+        self.statements = self.collect(text)
+        self.diagnostics = []
+
+    def collect(self, text):
+        statements = []
+        line = 1
+        pending = None
+        target = None
+
+        for kind, value in interned_ids(RecoveringProgramLexer(text).generate_tokens(), self.symbols):
+            if kind == TokenType.EOL:
+                line = value
+                pending = None
+            elif kind == TokenType.END:
+                break
+            elif pending is None:
+                if kind in (TokenType.READ, TokenType.PRINT):
+                    pending = kind
+                elif kind == TokenType.ID:
+                    pending, target = TokenType.ID, value
+            elif pending == TokenType.READ and kind == TokenType.ID:
+                statements.append(Statement(READ, line, value))
+                pending = None
+            elif pending == TokenType.PRINT and kind == TokenType.ID:
+                statements.append(Statement(PRINT, line, None, (value,)))
+                pending = None
+            elif pending == TokenType.ID and kind == TokenType.EQUALS:
+                pending = TokenType.EQUALS
+            elif pending == TokenType.EQUALS and kind == TokenType.EXPR:
+                statements.append(Statement(ASSIGN, line, target, self.uses(value)))
+                pending = None
+            else:
+                pending = None
+
+        return statements
+
+    def uses(self, expr):
+        expr = str(expr)
+
+        try:
+            return self.expression_uses[expr]
+        except KeyError:
+            pass
+
+        found = []
+
+        try:
+            for kind, value in interned_ids(ArithmeticLexer(expr).generate_tokens(), self.symbols):
+                if kind == TokenType.ID:
+                    found.append(value)
+        except LexerError:
+            # Una expresión inválida no aporta usos; el error lo
+            # reporta validator.validate.
+            found = []
+
+        uses = self.expression_uses[expr] = tuple(found)
+
+        return uses
+
+    def run(self):
+        """
+        Hace las dos pasadas y regresa los diagnósticos como
+        (línea, tipo, nombre), ordenados por línea.
+        """
+        names = self.symbols.names
+        diagnostics = []
+        defined = BitSet(len(names))
+
+        for statement in self.statements:
+            for variable in statement.uses:
+                if variable not in defined:
+                    diagnostics.append((statement.line, UNINITIALIZED, names[variable]))
+
+            if statement.target is not None:
+                defined.add(statement.target)
+
+        live = BitSet(len(names))
+        unused = []
+
+        for statement in reversed(self.statements):
+            if statement.target is not None:
+                if statement.target not in live:
+                    kind = UNUSED_READ if statement.kind == READ else DEAD_ASSIGNMENT
+                    unused.append((statement.line, kind, names[statement.target]))
+
+                live.discard(statement.target)
+
+            for variable in statement.uses:
+                live.add(variable)
+
+        # La pasada hacia atrás los encuentra al revés. sort es
+        # estable: en cada línea los usos quedan antes que la
+        # asignación que no se usa.
+        unused.reverse()
+        diagnostics += unused
+        diagnostics.sort(key=lambda diagnostic: diagnostic[0])
+        self.diagnostics = diagnostics
+
+        return diagnostics
+
+    def render(self):
+        if not self.diagnostics:
+            return "Sin avisos.\n"
+
+        return "".join(f"Línea {line}: {MESSAGES[kind].format(name)}\n"
+                       for line, kind, name in self.diagnostics)
+
+
+def analyze(text):
+    analysis = DataflowAnalysis(text)
+    analysis.run()
+
+    return analysis
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Análisis de flujo de datos de programas.")
+    arg_parser.add_argument("paths", nargs="+", metavar="ARCHIVO")
+    args = arg_parser.parse_args(argv)
+    found = False
+
+    for path in args.paths:
+        with open(path, encoding="utf-8") as input_file:
+            analysis = analyze(input_file.read())
+
+        if len(args.paths) > 1:
+            print(f"== {path}")
+
+        sys.stdout.write(analysis.render())
+        found = found or bool(analysis.diagnostics)
+
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Diagnósticos del análisis como registros: tipo, gravedad, mensaje,
+línea, columna y texto causante. Los analizadores los acumulan en un
+DiagnosticLog, que agrega cada uno en tiempo constante y sólo arma el
+texto de la salida cuando se lo piden. El mismo registro se puede
+mostrar como el texto de siempre o escribir como JSON Lines.
+"""
+import json
+
+ERROR, WARNING = "error", "warning"
+
+# Tipos de los avisos; los de los errores están en cada excepción
+# de execution_exceptions.
+UNINITIALIZED = "uninitialized"
+DIVISION_BY_ZERO = "division_by_zero"
+EMPTY_EXPRESSION = "empty_expression"
+INVALID_EXPRESSION = "invalid_expression"
+
+
+class Diagnostic:
+    """
+    Un aviso o error. message es el texto tal como aparece en la
+    salida, con su salto de línea; line y column se cuentan desde 1
+    y son None si el analizador no los conoce.
+    """
+    __slots__ = ("kind", "severity", "message", "line", "column", "text")
+
+    def __init__(self, kind, severity, message, line=None, column=None, text=None):
+        self.kind = kind
+        self.severity = severity
+        self.message = message
+        self.line = line
+        self.column = column
+        self.text = text
+
+    @classmethod
+    def from_error(cls, error, line=None):
+        """
+        Diagnóstico de una excepción del análisis (ver
+        execution_exceptions.AnalysisError).
+        """
+        return cls(error.kind, ERROR, error.message, getattr(error, "line", line),
+                   getattr(error, "column", None), error.text)
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "severity": self.severity,
+            "message": self.message.rstrip("\n"),
+            "line": self.line,
+            "column": self.column,
+            "text": self.text,
+        }
+
+    def __repr__(self):
+        return f"Diagnostic({self.kind!r}, {self.severity!r}, {self.message!r}, line={self.line!r})"
+
+
+def uninitialized(name):
+    return Diagnostic(UNINITIALIZED, WARNING, f"Aviso: uso de variable sin inicializar: {name}.\n", text=name)
+
+
+def division_by_zero():
+    return Diagnostic(DIVISION_BY_ZERO, WARNING, "Aviso: División entre cero.\n")
+
+
+def empty_expression():
+    return Diagnostic(EMPTY_EXPRESSION, ERROR, "Error: expresión vacía.\n")
+
+
+class DiagnosticLog:
+    """
+    Diagnósticos en el orden en que se reportan. Lleva la longitud
+    del texto que forman para no tener que armarlo para medirlo.
+    cleared indica si alguna vez se descartó lo acumulado.
+    """
+    __slots__ = ("records", "length", "cleared", "cache")
+
+    def __init__(self):
+        self.records = []
+        self.length = 0
+        self.cleared = False
+        # (número de registros, texto) del último text().
+        self.cache = (0, "")
+
+    def add(self, diagnostic):
+        self.records.append(diagnostic)
+        self.length += len(diagnostic.message)
+
+    def add_error(self, error):
+        self.add(self.caught(error))
+
+    def caught(self, error):
+        """
+        Diagnóstico de una excepción que el analizador atrapó.
+        """
+        return Diagnostic.from_error(error)
+
+    def count_caught(self, count=1):
+        """
+        Excepciones atrapadas que no pasan por caught: las que el
+        analizador descarta y las de una expresión que se toma de
+        ExpressionCache. Sólo las cuentan los registros instrumentados.
+        """
+
+    def extend(self, other):
+        for diagnostic in other.records:
+            self.add(diagnostic)
+
+    def clear(self):
+        self.records = []
+        self.length = 0
+        self.cleared = True
+        self.cache = (0, "")
+
+    def text(self):
+        count, text = self.cache
+
+        if count != len(self.records):
+            text += "".join(diagnostic.message for diagnostic in self.records[count:])
+            self.cache = (len(self.records), text)
+
+        return text
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+def render_json_lines(diagnostics, **fields):
+    """
+    Una línea de JSON por diagnóstico, con fields agregados a cada una.
+    """
+    return "".join(json.dumps({**fields, **diagnostic.as_dict()}, ensure_ascii=False) + "\n"
+                   for diagnostic in diagnostics)
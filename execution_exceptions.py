@@ -1,10 +1,25 @@
 # Mensajes de error.
 
-class LexerError(Exception):
+
+class AnalysisError(Exception):
+    """
+    Base de los errores del análisis. Además del mensaje, cada uno
+    lleva su tipo (kind) y el texto que lo causó (text, None si no
+    hay), con los que se arma su diagnostics.Diagnostic.
+    """
+    kind = "error"
+    text = None
+
+
+class LexerError(AnalysisError):
     pass
 
 class InvalidTokenError(LexerError):
+    kind = "invalid_token"
+
     def __init__(self, char):
+        self.text = char
+
         if char != ' ' and char != '\n':
             self.char = char
         elif char == ' ':
@@ -15,28 +30,53 @@ class InvalidTokenError(LexerError):
         self.message = "Símbolo inválido: " + self.char + "\n"
 
 class EOFScanning(LexerError):
+    kind = "unexpected_eof"
+
     def __init__(self):
         self.message = "Se llegó al final del archivo durante escaneo.\n"
 
 class FileNameError(LexerError):
+    kind = "invalid_program_name"
+
     def __init__(self, filename):
-        self.filename = filename
+        self.filename = self.text = filename
         self.message = "Nombre de programa inválido: " + self.filename + "\n"
 
 class NewlineError(LexerError):
+    kind = "missing_newline"
+
     def __init__(self):
         self.message = "Se esperaba un ';' y un salto de línea.\n"
 
 
-class ParserException(Exception):
+class ParserException(AnalysisError):
     pass
 
 class InvalidSyntax(ParserException):
+    kind = "invalid_syntax"
+
     def __init__(self, sentence):
-        self.sentence = sentence
+        self.sentence = self.text = sentence
         self.message = "Sintaxis incorrecta: " + self.sentence + "\n"
 
 class ParenthesisError(ParserException):
+    kind = "unbalanced_parenthesis"
+
     def __init__(self, sentence):
-        self.sentence = sentence
+        self.sentence = self.text = sentence
         self.message = "Error en paréntesis de la expresión.\n"
+
+
+class ExecutionError(Exception):
+    def __init__(self, message):
+        self.message = message + "\n"
+
+# Una evaluación que rebasó sus límites de pasos, tiempo o tamaño
+# de los enteros (ver bounded.py).
+class ResourceLimitExceeded(ExecutionError):
+    pass
+
+
+class ValidationCancelled(Exception):
+    def __init__(self):
+        self.message = "Validación cancelada.\n"
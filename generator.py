@@ -0,0 +1,134 @@
+"""
+Generador de programas sintéticos a partir de la gramática, para
+medir el rendimiento de los analizadores con entradas de cualquier
+tamaño. Los programas son correctos salvo por los errores que se
+inyectan con error_rate.
+
+Uso: python generator.py [--statements N] [--seed S] ... > programa.txt
+"""
+import argparse
+import random
+import sys
+
+# Operadores binarios que se eligen al generar expresiones.
+BINARY_OPERATORS = "+-*/^"
+
+
+class ProgramGenerator:
+    """
+    Genera programas con statements sentencias. variables es el
+    número de variables distintas, depth la profundidad máxima de
+    los árboles de las expresiones, paren_depth cuántos paréntesis
+    anidados puede tener una subexpresión y error_rate la fracción
+    de sentencias que se corrompen con algún error léxico, sintáctico
+    o de los que sólo producen avisos.
+    """
+    def __init__(self, seed=0, variables=8, depth=3, paren_depth=1, error_rate=0.0):
+        self.random = random.Random(seed)
+        self.variables = [f"v{index}" for index in range(max(1, variables))]
+        self.depth = depth
+        self.paren_depth = paren_depth
+        self.error_rate = error_rate
+        self.corruptions = [self.drop_newline, self.invalid_symbol, self.dangling_operator,
+                            self.open_parenthesis, self.bad_keyword, self.zero_division,
+                            self.undefined_variable]
+
+    def program(self, statements=100, name="generado"):
+        lines = [f"programa {name};", "iniciar"]
+        defined = []
+
+        # Las primeras sentencias leen variables para que las
+        # expresiones tengan qué usar.
+        for index in range(statements):
+            if not defined or (index < len(self.variables) and self.random.random() < 0.5):
+                variable = self.random.choice(self.variables)
+                line = f"leer {variable};"
+            elif self.random.random() < 0.2:
+                line = f"imprimir {self.random.choice(defined)};"
+            else:
+                variable = self.random.choice(self.variables)
+                line = f"{variable} := {self.expression(defined, self.depth)};"
+
+            if line.startswith("leer ") or " := " in line:
+                if variable not in defined:
+                    defined.append(variable)
+
+            if self.random.random() < self.error_rate:
+                line = self.random.choice(self.corruptions)(line)
+
+            lines.append(line)
+
+        lines.append("terminar.")
+
+        return "\n".join(lines)
+
+    def operand(self, defined):
+        if self.random.random() < 0.6:
+            return self.random.choice(defined)
+
+        return str(self.random.randint(1, 999))
+
+    def expression(self, defined, depth):
+        if depth <= 0 or self.random.random() < 0.25:
+            return self.operand(defined)
+
+        operator = self.random.choice(BINARY_OPERATORS)
+        left = self.expression(defined, depth - 1)
+        right = self.expression(defined, depth - 1)
+        expression = left + operator + right
+
+        if self.random.random() < 0.1:
+            # F --> -E niega todo lo que sigue, así que va entre
+            # paréntesis para no cambiar el resto de la expresión.
+            expression = f"(-{expression})"
+
+        if self.paren_depth and self.random.random() < 0.5:
+            levels = self.random.randint(1, self.paren_depth)
+            expression = "(" * levels + expression + ")" * levels
+
+        return expression
+
+    # Errores que se pueden inyectar en una sentencia.
+    def drop_newline(self, line):
+        return line[:-1]
+
+    def invalid_symbol(self, line):
+        position = self.random.randrange(len(line) - 1)
+        return line[:position] + self.random.choice("A#$?") + line[position:]
+
+    def dangling_operator(self, line):
+        return line[:-1] + self.random.choice(BINARY_OPERATORS) + ";"
+
+    def open_parenthesis(self, line):
+        return line[:-1] + "+(1;"
+
+    def bad_keyword(self, line):
+        return self.random.choice(["lee ", "imprime ", "Leer "]) + line.split(" ")[-1]
+
+    def zero_division(self, line):
+        return line[:-1] + "/0;" if " := " in line else line
+
+    def undefined_variable(self, line):
+        return f"x := {self.random.choice(self.variables)}nueva;"
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Genera un programa sintético.")
+    arg_parser.add_argument("--statements", type=int, default=100, help="número de sentencias")
+    arg_parser.add_argument("--variables", type=int, default=8, help="variables distintas")
+    arg_parser.add_argument("--depth", type=int, default=3, help="profundidad de las expresiones")
+    arg_parser.add_argument("--paren-depth", type=int, default=1, help="paréntesis anidados")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0,
+                            help="fracción de sentencias con errores")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args(argv)
+
+    generator = ProgramGenerator(args.seed, args.variables, args.depth, args.paren_depth,
+                                 args.error_rate)
+    sys.stdout.write(generator.program(args.statements))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Gramáticas LL(1) escritas como texto y la tabla de análisis que se
+calcula a partir de ellas. Cada regla ocupa una línea y las
+alternativas se separan con '|', también al inicio de las líneas
+siguientes; una alternativa vacía es la cadena vacía:
+
+    lista -> elemento lista
+           |
+
+Los nombres en minúsculas son no terminales y los que están en
+mayúsculas son terminales, que se buscan en el diccionario que se
+le da a Grammar. Un terminal puede llevar una acción, 'ID:declare',
+que el analizador ejecuta al reconocerlo. El primer no terminal es
+el inicial.
+"""
+# Marcas de los conjuntos FIRST y FOLLOW: la cadena vacía y el fin
+# de la entrada (el analizador no tiene token actual).
+EMPTY = ""
+END_OF_INPUT = None
+
+
+class Grammar:
+    """
+    Una gramática LL(1). productions tiene las alternativas de cada
+    no terminal como tuplas de (símbolo, acción); first y follow, sus
+    conjuntos; table, la alternativa que toca a cada no terminal con
+    cada terminal. Lanza ValueError si la gramática no es LL(1).
+    """
+    def __init__(self, spec, terminals):
+        self.terminals = terminals
+        self.productions = {}
+        self.start = None
+        self.read_spec(spec)
+        self.first = self.first_sets()
+        self.follow = self.follow_sets()
+        self.table = self.parse_table()
+
+    def read_spec(self, spec):
+        rules = {}
+        nonterminal = None
+
+        for line in spec.splitlines():
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            if "->" in line:
+                nonterminal, line = (part.strip() for part in line.split("->", 1))
+
+                if nonterminal in rules:
+                    raise ValueError(f"Regla repetida: {nonterminal}")
+
+                rules[nonterminal] = line
+                self.start = self.start or nonterminal
+            elif line.startswith("|") and nonterminal is not None:
+                rules[nonterminal] += " " + line
+            else:
+                raise ValueError(f"Línea inválida en la gramática: {line}")
+
+        for nonterminal, text in rules.items():
+            self.productions[nonterminal] = [self.read_symbols(alternative)
+                                             for alternative in text.split("|")]
+
+        for alternatives in self.productions.values():
+            for alternative in alternatives:
+                for symbol, _ in alternative:
+                    if isinstance(symbol, str) and symbol not in self.productions:
+                        raise ValueError(f"No terminal sin reglas: {symbol}")
+
+    def read_symbols(self, text):
+        symbols = []
+
+        for item in text.split():
+            name, _, action = item.partition(":")
+
+            if name.islower():
+                symbols.append((name, None))
+            elif name in self.terminals:
+                symbols.append((self.terminals[name], action or None))
+            else:
+                raise ValueError(f"Terminal desconocido: {name}")
+
+        return tuple(symbols)
+
+    def sequence_first(self, symbols, first):
+        """
+        FIRST de una secuencia de símbolos; incluye EMPTY si todos
+        pueden derivar la cadena vacía.
+        """
+        result = set()
+
+        for symbol, _ in symbols:
+            if symbol not in self.productions:
+                result.add(symbol)
+                return result
+
+            result |= first[symbol] - {EMPTY}
+
+            if EMPTY not in first[symbol]:
+                return result
+
+        result.add(EMPTY)
+
+        return result
+
+    def first_sets(self):
+        first = {nonterminal: set() for nonterminal in self.productions}
+        changed = True
+
+        while changed:
+            changed = False
+
+            for nonterminal, alternatives in self.productions.items():
+                for alternative in alternatives:
+                    found = self.sequence_first(alternative, first)
+
+                    if not found <= first[nonterminal]:
+                        first[nonterminal] |= found
+                        changed = True
+
+        return first
+
+    def follow_sets(self):
+        follow = {nonterminal: set() for nonterminal in self.productions}
+        follow[self.start].add(END_OF_INPUT)
+        changed = True
+
+        while changed:
+            changed = False
+
+            for nonterminal, alternatives in self.productions.items():
+                for alternative in alternatives:
+                    for position, (symbol, _) in enumerate(alternative):
+                        if symbol not in self.productions:
+                            continue
+
+                        found = self.sequence_first(alternative[position + 1:], self.first)
+
+                        if EMPTY in found:
+                            found = (found - {EMPTY}) | follow[nonterminal]
+
+                        if not found <= follow[symbol]:
+                            follow[symbol] |= found
+                            changed = True
+
+        return follow
+
+    def parse_table(self):
+        table = {}
+
+        for nonterminal, alternatives in self.productions.items():
+            for alternative in alternatives:
+                lookahead = self.sequence_first(alternative, self.first)
+
+                if EMPTY in lookahead:
+                    lookahead = (lookahead - {EMPTY}) | self.follow[nonterminal]
+
+                for terminal in lookahead:
+                    if (nonterminal, terminal) in table:
+                        raise ValueError(f"La gramática no es LL(1): {nonterminal} con {terminal}")
+
+                    table[nonterminal, terminal] = alternative
+
+        return table
+
+    def expansions(self):
+        """
+        La tabla en la forma que usa el analizador: para cada no
+        terminal, un diccionario de terminal a los símbolos de la
+        alternativa en orden inverso, listos para la pila.
+        """
+        expansions = {nonterminal: {} for nonterminal in self.productions}
+
+        for (nonterminal, terminal), alternative in self.table.items():
+            expansions[nonterminal][terminal] = alternative[::-1]
+
+        return expansions
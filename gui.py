@@ -2,9 +2,92 @@ import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter.filedialog import askopenfile
 from tkinter import messagebox
-from parser_class import ArithmeticParser, ProgramParser
-from lexer import ProgramLexer
-from execution_exceptions import *
+from background import BackgroundValidator
+from incremental import IncrementalValidator
+from instrumentation import ValidationStats
+from validator import validate
+from execution_exceptions import ValidationCancelled
+
+# Milisegundos sin cambios que esperamos antes de validar lo escrito.
+DEBOUNCE_MS = 300
+# Cada cuántos milisegundos revisamos el avance de la validación.
+POLL_MS = 50
+# Caracteres que se insertan de una vez al cargar un archivo; entre
+# un bloque y otro la ventana atiende sus eventos.
+LOAD_CHUNK = 1 << 16
+
+
+class OutputView:
+    """
+    Muestra un resultado de cualquier tamaño en un tk.Text de sólo
+    lectura. Las líneas se guardan aparte y en el widget sólo están
+    las que caben en él, así que mostrar o recorrer el resultado
+    no depende de su longitud. Al hacer clic en una línea se llama
+    a on_select con su número, contado desde 0.
+    """
+    def __init__(self, text, scrollbar, on_select=None):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.on_select = on_select
+        self.lines = []
+        self.top = 0
+        self.rows = int(text.cget('height'))
+
+        self.scrollbar.configure(command=self.yview)
+        self.text.configure(state='disabled', wrap='none')
+        self.text.bind('<Button-1>', self.select)
+        self.text.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1, 'units'))
+        self.text.bind('<Button-4>', lambda event: self.scroll(-1, 'units'))
+        self.text.bind('<Button-5>', lambda event: self.scroll(1, 'units'))
+        self.text.bind('<Up>', lambda event: self.scroll(-1, 'units'))
+        self.text.bind('<Down>', lambda event: self.scroll(1, 'units'))
+        self.text.bind('<Prior>', lambda event: self.scroll(-1, 'pages'))
+        self.text.bind('<Next>', lambda event: self.scroll(1, 'pages'))
+
+    def set_text(self, text):
+        self.lines = text.split('\n')
+
+        if len(self.lines) > 1 and not self.lines[-1]:
+            self.lines.pop()
+
+        self.top = 0
+        self.render()
+
+    def render(self):
+        self.text.configure(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', '\n'.join(self.lines[self.top:self.top + self.rows]))
+        self.text.configure(state='disabled')
+
+        total = max(len(self.lines), 1)
+        self.scrollbar.set(self.top / total, min((self.top + self.rows) / total, 1.0))
+
+    # Recibe los comandos de la barra de desplazamiento, igual
+    # que yview de tk.Text.
+    def yview(self, command, *args):
+        if command == 'moveto':
+            self.move(round(float(args[0]) * len(self.lines)))
+        else:
+            self.scroll(int(args[0]), args[1])
+
+    def scroll(self, amount, what):
+        self.move(self.top + amount * (self.rows if what == 'pages' else 1))
+
+        return 'break'
+
+    def move(self, top):
+        top = max(min(top, len(self.lines) - self.rows), 0)
+
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def select(self, event):
+        row = int(self.text.index(f'@{event.x},{event.y}').split('.')[0]) - 1 + self.top
+
+        if self.on_select is not None and row < len(self.lines):
+            self.on_select(row)
+
 
 
 class App:
@@ -12,12 +95,16 @@ class App:
         # build ui
         self.mainframe = ttk.Frame(master)
         self.program_text = tk.Text(self.mainframe)
-        self.program_text.configure(cursor='arrow', font='{Source Code Pro} 12 {}', height='20', insertunfocussed='none')
+        self.program_text.configure(cursor='xterm', font='{Source Code Pro} 12 {}', height='20', insertunfocussed='none')
         self.program_text.configure(relief='flat', setgrid='false', takefocus=False, width='50')
         self.program_text.grid(column='0', row='1')
+        self.program_text.bind('<<Modified>>', self.schedule_validation)
         self.output_text = tk.Text(self.mainframe)
         self.output_text.configure(font='{Source Code Pro} 12 {}', height='20', width='50')
         self.output_text.grid(column='3', row='1')
+        self.output_scroll = ttk.Scrollbar(self.mainframe)
+        self.output_scroll.configure(orient='vertical')
+        self.output_scroll.grid(column='4', row='1', sticky='ns')
         self.text_separator = ttk.Separator(self.mainframe)
         self.text_separator.configure(orient='horizontal')
         self.text_separator.grid(column='1', row='1')
@@ -46,19 +133,73 @@ class App:
         self.validate.configure(text='validar')
         self.validate.grid(column='3', row='2', sticky='w')
         self.validate.configure(command=self.run_parser)
+        self.progress = ttk.Progressbar(self.mainframe)
+        self.progress.configure(length='300', maximum='1', mode='determinate', orient='horizontal')
+        self.progress.grid(column='3', row='3', sticky='w')
+        self.cancel = ttk.Button(self.mainframe)
+        self.cancel.configure(state='disabled', text='cancelar')
+        self.cancel.grid(column='3', row='3', sticky='e')
+        self.cancel.configure(command=self.cancel_parser)
+        self.measure = tk.BooleanVar(value=False)
+        self.measure_check = ttk.Checkbutton(self.mainframe)
+        self.measure_check.configure(text='estadísticas', variable=self.measure)
+        self.measure_check.grid(column='0', row='3', sticky='w')
+        self.status = ttk.Label(self.mainframe)
+        self.status.configure(font='TkDefaultFont', text='')
+        self.status.grid(column='0', columnspan='5', row='4', sticky='w')
         self.mainframe.configure(height='800', width='800')
         self.mainframe.grid(column='0', row='0')
 
         # Main widget
         self.mainwindow = self.mainframe
 
+        # El resultado puede tener miles de avisos; sólo se dibujan
+        # las líneas visibles y un clic lleva a la del programa.
+        self.output = OutputView(self.output_text, self.output_scroll, self.show_line)
+        self.program_text.tag_configure('diagnostic', background='#ffe08a')
+        # Carga de un archivo en curso (ver load_text).
+        self.loading = None
+        # Si el resultado mostrado viene de self.validator, que es
+        # el único que sabe ubicar cada línea en el programa.
+        self.located = False
+
+        # Conserva los tokens y el análisis de cada línea entre
+        # validaciones, así que sólo se repite lo que cambió.
+        self.validator = IncrementalValidator()
+        self.pending_validation = None
+        # El análisis corre en otro hilo para no congelar la ventana.
+        self.background = BackgroundValidator()
+        self.job = None
+
     def upload_file(self):
         with askopenfile() as input_file:
             self.text = input_file.read()
             self.write_text(input_file.name, self.filename)
 
-        self.write_text(self.text, self.program_text)
-        self.output_text.delete('0.0', tk.END)
+        self.load_text(self.text)
+        self.output.set_text('')
+        self.located = False
+
+    # Inserta el texto por bloques de LOAD_CHUNK caracteres para
+    # que la ventana no se congele con archivos grandes. Mientras
+    # tanto no se puede editar ni se valida lo que va cargado.
+    def load_text(self, text, start=0):
+        if start == 0 and self.loading is not None:
+            self.mainframe.after_cancel(self.loading)
+
+        self.program_text.configure(state='normal')
+
+        if start == 0:
+            self.program_text.delete('1.0', tk.END)
+
+        self.program_text.insert(tk.END, text[start:start + LOAD_CHUNK])
+
+        if start + LOAD_CHUNK < len(text):
+            self.program_text.configure(state='disabled')
+            self.loading = self.mainframe.after(1, self.load_text, text, start + LOAD_CHUNK)
+        else:
+            self.loading = None
+            self.schedule_validation()
 
     def show_team(self):
         messagebox.showinfo("Integrantes", "Alicia Velez Alvarado\nDiego Rangel Pardo\nLuis Sebastián Martínez Vega")
@@ -73,16 +214,103 @@ class App:
 
         # Si el archivo de entrada está vacío...
         if not self.text:
-            self.write_text("Archivo inválido", self.output_text)
+            self.output.set_text("Archivo inválido")
 
-        lexer = ProgramLexer(self.text)
-        parser = ProgramParser(lexer.generate_tokens())
-        try:
-            result = parser.parse()
-        except InvalidSyntax as e:
-            result = e.message
+        self.start_validation()
+
+    # Valida el programa mientras se escribe, una vez que el
+    # usuario deja de teclear por DEBOUNCE_MS milisegundos.
+    def schedule_validation(self, event=None):
+        # Al terminar de cargar se vuelve a llamar; hasta entonces
+        # la marca de modificado se queda puesta.
+        if self.loading is not None or not self.program_text.edit_modified():
+            return
+
+        self.program_text.edit_modified(False)
+
+        if self.pending_validation is not None:
+            self.mainframe.after_cancel(self.pending_validation)
+
+        self.pending_validation = self.mainframe.after(DEBOUNCE_MS, self.validate_edit)
+
+    def validate_edit(self):
+        self.pending_validation = None
+        self.text = self.program_text.get('1.0', 'end-1c')
+        # Interrumpir una validación incremental descarta lo que
+        # lleva; mientras se escribe conviene dejarla terminar.
+        self.start_validation(interrupt=False)
+
+    # Cualquier validación nueva reemplaza a la que está en curso.
+    def start_validation(self, interrupt=True):
+        polling = self.job is not None
+
+        if self.measure.get():
+            self.job = self.background.submit(self.measured_validation, self.text, ValidationStats(),
+                                              interrupt=interrupt)
+        else:
+            self.job = self.background.submit(self.validator.update, self.text, interrupt=interrupt)
+
+        self.progress.configure(value=0)
+        self.cancel.configure(state='normal')
+
+        if not polling:
+            self.mainframe.after(POLL_MS, self.poll_validation)
+
+    def poll_validation(self):
+        # Revisamos si sigue ocupado antes de tomar el resultado,
+        # para no perder uno que termine entre las dos consultas.
+        busy = self.background.busy()
+        job = self.background.poll()
+
+        if job is not None:
+            if job.error is None:
+                self.output.set_text(job.result)
+                self.located = job.function == self.validator.update
+
+                if job.function == self.measured_validation:
+                    self.status.configure(text=job.args[1].summary())
+            else:
+                self.output.set_text(f"Error interno: {type(job.error).__name__}: {job.error}\n")
+                self.located = False
+
+        if busy:
+            self.progress.configure(value=self.job.progress)
+            self.mainframe.after(POLL_MS, self.poll_validation)
+        else:
+            self.finish_validation()
+
+    # Para medir se analiza el texto completo, no sólo lo que
+    # cambió; el resultado es el mismo que el incremental.
+    def measured_validation(self, text, stats, progress=None):
+        return validate(text, progress=progress, expr_cache=self.validator.expressions, stats=stats)
+
+    def cancel_parser(self):
+        self.background.cancel()
+        self.output.set_text(ValidationCancelled().message)
+        self.located = False
+
+    # Lleva el programa a la línea que produjo la del resultado.
+    # Mientras se valida, el análisis ya no corresponde a lo que
+    # se muestra, así que no se ubica nada.
+    def show_line(self, output_line):
+        if not self.located or self.job is not None:
+            return
+
+        line = self.validator.locate(output_line)
+
+        if line is None:
+            return
+
+        self.program_text.tag_remove('diagnostic', '1.0', tk.END)
+        self.program_text.tag_add('diagnostic', f'{line + 1}.0', f'{line + 1}.0 lineend')
+        self.program_text.mark_set(tk.INSERT, f'{line + 1}.0')
+        self.program_text.see(f'{line + 1}.0')
+        self.program_text.focus_set()
 
-        self.write_text(result, self.output_text)
+    def finish_validation(self):
+        self.job = None
+        self.progress.configure(value=0)
+        self.cancel.configure(state='disabled')
 
     def write_text(self, text, text_box):
         text_box.delete('0.0', tk.END)
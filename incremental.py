@@ -0,0 +1,575 @@
+import re
+
+from execution_exceptions import *
+from lexer import TableProgramLexer
+from diagnostics import Diagnostic
+from parser_class import (EXPR_CACHE_SIZE, DIAGNOSTIC, USE, ExpressionCache, IterativeArithmeticParser,
+                          describe_token, uninitialized_warning)
+from tokens import TokenType
+
+# Estados del analizador de programas entre un token y otro.
+# INACTIVE marca las líneas posteriores al final del análisis.
+(HEADER, NAME, START, SENTENCE, READ, PRINT, ASSIGN, EXPR,
+ AFTER_END, INACTIVE) = range(10)
+
+# Acciones con las que se genera la salida de una línea: las de
+# ExpressionCache más la asignación de una variable.
+DEFINE = USE + 1
+
+# Formas en las que termina el análisis.
+RETURN_OUTPUT, RETURN_FINAL, RETURN_TEXT, RAISE = range(4)
+
+# Líneas entre cada reporte de avance.
+PROGRESS_INTERVAL = 1024
+
+LINE_PATTERN = re.compile(r"[^\n]*\n|[^\n]+")
+
+# Errores del analizador léxico que ProgramParser reporta en su salida.
+REPORTED_ERRORS = (EOFScanning, FileNameError, NewlineError, InvalidTokenError)
+
+
+def split_lines(text):
+    """
+    Separa el texto en líneas que conservan su salto de
+    línea. Sólo se corta en '\n', que es lo único que
+    reconoce el analizador léxico. El nombre del programa
+    puede empezar con el salto de línea que sigue a
+    'programa ', así que esa línea se une con la siguiente.
+    """
+    lines = LINE_PATTERN.findall(text)
+
+    if "programa \n" not in text:
+        return lines
+
+    joined = []
+    pending = ""
+
+    for line in lines:
+        line = pending + line
+
+        if line.endswith("programa \n"):
+            pending = line
+        else:
+            pending = ""
+            joined.append(line)
+
+    if pending:
+        joined.append(pending)
+
+    return joined
+
+
+def common_prefix(a, b, block=256):
+    """
+    Número de elementos iniciales iguales en dos listas. Compara
+    por bloques para que el grueso del trabajo se haga en C.
+    """
+    limit = min(len(a), len(b))
+    start = 0
+
+    while start + block <= limit and a[start:start + block] == b[start:start + block]:
+        start += block
+
+    while start < limit and a[start] == b[start]:
+        start += 1
+
+    return start
+
+
+def lex_line(previous, line):
+    """
+    Analiza léxicamente una sola línea. previous es el carácter
+    que el analizador vería antes de ella en el texto completo.
+    Regresa los tokens de la línea y la excepción en la que se
+    detuvo el análisis, si la hubo.
+    """
+    lexer = TableProgramLexer(previous + line)
+    lexer.next_char()
+    tokens = []
+
+    try:
+        for token in lexer.generate_tokens():
+            tokens.append(token)
+    except Exception as e:
+        return tuple(tokens), e
+
+    return tuple(tokens), None
+
+
+class LineRecord:
+    """
+    Una línea del programa con sus tokens y, según el estado en
+    el que la encuentra el analizador, las acciones que produce
+    y el estado en el que lo deja.
+    """
+    __slots__ = ("text", "tokens", "error", "index", "phase_in", "phase_out",
+                 "actions", "terminal", "defines", "uses")
+
+    def __init__(self, text, tokens, error, index):
+        self.text = text
+        self.tokens = tokens
+        self.error = error
+        self.index = index
+        self.phase_in = None
+        self.phase_out = None
+        self.actions = ()
+        self.terminal = None
+        self.defines = ()
+        self.uses = ()
+
+
+class LineAnalysis:
+    """
+    Análisis de un texto que se conserva por línea entre cambios. Al
+    cambiar el texto sólo se analizan léxicamente las líneas
+    modificadas; el análisis de sentencias se repite desde ahí hasta
+    que el estado del analizador vuelve a coincidir con el anterior,
+    y de las demás líneas sólo se recalculan los avisos de variables
+    sin inicializar cuya primera definición cambió.
+
+    Las subclases dan el análisis de sentencias como una máquina de
+    estados que se puede retomar en cualquier línea (scan, a partir
+    de initial_phase) y la forma de la salida de cada línea (render).
+    """
+    initial_phase = HEADER
+
+    def __init__(self, expr_parser, cache_size=EXPR_CACHE_SIZE):
+        self.expr_parser = expr_parser
+        # Análisis de las expresiones por texto; no depende del
+        # resto del programa, así que sobrevive a reset().
+        self.expressions = ExpressionCache(expr_parser, cache_size)
+        self.reset()
+
+    def reset(self):
+        """
+        Descarta todo el análisis conservado.
+        """
+        self.records = []
+        self.lines = []
+        # Salida de cada línea, en el mismo orden que records.
+        self.rendered = []
+        # Carácter previo a la primera línea: el último del texto.
+        self.first_previous = ""
+        # Líneas que definen y que usan cada variable, y la
+        # primera que la define.
+        self.definers = {}
+        self.users = {}
+        self.first_definer = {}
+
+    def apply(self, text, progress=None):
+        """
+        Actualiza el análisis con la nueva versión del texto. Si se
+        da progress, se llama periódicamente con las líneas
+        procesadas y un estimado del total.
+        """
+        lines = split_lines(text)
+        first_previous = text[-1] if text else ""
+        records = self.records
+
+        # Buscamos el bloque de líneas que cambió. La primera línea
+        # se analiza con el último carácter del texto antes que ella,
+        # así que si cambia de contenido o de contexto, la línea que
+        # la ocupaba antes tampoco se puede reutilizar.
+        start = 0
+
+        if first_previous == self.first_previous:
+            start = common_prefix(lines, self.lines)
+
+        limit = min(len(lines), len(records)) - (start or 1)
+
+        end = min(common_prefix(lines[::-1], self.lines[::-1]), max(limit, 0))
+
+        old_end = len(records) - end
+        new_end = len(lines) - end
+        self.first_previous = first_previous
+        self.lines = lines
+
+        if start == old_end and start == new_end:
+            return
+
+        self.replace(start, old_end, new_end, progress)
+
+    def splice(self, start, old_end, new_lines, first_previous):
+        """
+        Reemplaza las líneas start a old_end (separadas como en
+        split_lines) por new_lines y actualiza el análisis, sin
+        comparar el texto completo como apply. first_previous es el
+        último carácter del texto nuevo. Quien llama garantiza que
+        las demás líneas no cambiaron y que el texto nuevo no une
+        líneas de otra forma.
+        """
+        relex_first = first_previous != self.first_previous
+        self.first_previous = first_previous
+        self.lines[start:old_end] = new_lines
+
+        if start != old_end or new_lines:
+            self.replace(start, old_end, start + len(new_lines))
+
+        # La primera línea se analiza con el último carácter del
+        # texto; si cambió y no se volvió a analizar, se repite.
+        if relex_first and self.lines and (start > 0 or not new_lines):
+            self.replace(0, 1, 1)
+
+    def replace(self, start, old_end, new_end, progress=None):
+        """
+        Analiza de nuevo las líneas start a new_end de self.lines,
+        que ocupan el lugar de los registros start a old_end.
+        """
+        records = self.records
+        lines = self.lines
+        first_previous = self.first_previous
+        changed = set()
+
+        for record in records[start:old_end]:
+            self.unregister(record, changed)
+
+        new_records = []
+        # Las líneas por analizar léxicamente más las que, a lo
+        # sumo, habrá que volver a recorrer.
+        total = (new_end - start) + (len(records) - old_end + new_end - start)
+
+        for index in range(start, new_end):
+            if progress is not None and (index - start) % PROGRESS_INTERVAL == 0:
+                progress(index - start, total)
+
+            tokens, error = lex_line("\n" if index else first_previous, lines[index])
+            new_records.append(LineRecord(lines[index], tokens, error, index))
+
+        records[start:old_end] = new_records
+        self.rendered[start:old_end] = [None] * len(new_records)
+
+        if old_end != new_end:
+            for index in range(new_end, len(records)):
+                records[index].index = index
+
+        self.resume(start, new_end, changed, progress, new_end - start, total)
+
+    def resume(self, start, new_end, changed, progress=None, done=0, total=0):
+        """
+        Repite el análisis de sentencias desde la línea start hasta
+        que el estado coincide con el de la ejecución anterior, y
+        vuelve a generar la salida de las líneas afectadas.
+        """
+        records = self.records
+        phase = records[start - 1].phase_out if start else self.initial_phase
+        dirty = []
+
+        for record in records[start:]:
+            if record.index >= new_end and record.phase_in == phase:
+                break
+
+            if progress is not None and (record.index - start) % PROGRESS_INTERVAL == 0:
+                progress(done + record.index - start, total)
+
+            self.unregister(record, changed)
+            self.run_line(record, phase)
+            self.register(record, changed)
+            dirty.append(record)
+            phase = record.phase_out
+
+        # Recalculamos la primera definición de las variables cuyas
+        # definiciones cambiaron. Sólo cambia el aviso de los usos
+        # que quedan entre la definición anterior y la nueva.
+        for name in changed:
+            definers = self.definers.get(name)
+            first = min(definers, key=lambda record: record.index) if definers else None
+            previous = self.first_definer.get(name)
+
+            if previous is not first:
+                if first is None:
+                    del self.first_definer[name]
+                else:
+                    self.first_definer[name] = first
+
+                low, high = sorted((self.position(previous, start), self.position(first, start)))
+                dirty.extend(record for record in self.users.get(name, ()) if low <= record.index <= high)
+
+        for record in dirty:
+            self.rendered[record.index] = self.render(record)
+
+    def position(self, record, start):
+        """
+        Posición de una línea para comparar con las de sus usos: las
+        que ya no están en el texto ocupaban la región editada, que
+        empieza en start, y sin definición cuenta como el final.
+        """
+        if record is None:
+            return len(self.records)
+
+        if record.index < len(self.records) and self.records[record.index] is record:
+            return record.index
+
+        return start
+
+    def register(self, record, changed):
+        for name in record.defines:
+            self.definers.setdefault(name, set()).add(record)
+            changed.add(name)
+
+        for name in record.uses:
+            self.users.setdefault(name, set()).add(record)
+
+    def unregister(self, record, changed):
+        for name in record.defines:
+            self.definers[name].discard(record)
+            changed.add(name)
+
+        for name in record.uses:
+            self.users[name].discard(record)
+
+        record.defines = record.uses = ()
+
+    def run_line(self, record, phase):
+        record.phase_in = phase
+        actions = []
+        record.phase_out = self.scan(record, phase, actions)
+        record.actions = tuple(actions)
+        record.defines = tuple({value for kind, value in actions if kind == DEFINE})
+        record.uses = tuple({value for kind, value in actions if kind == USE})
+
+    def scan(self, record, phase, actions):
+        """
+        Analiza los tokens de la línea desde el estado phase. Agrega
+        a actions lo que produce y regresa el estado final.
+        """
+        raise NotImplementedError
+
+    def outputs(self, record):
+        """
+        Salida de la línea en orden: (DIAGNOSTIC, diagnóstico) y (USE, nombre)
+        para cada variable que se usa sin inicializar.
+        """
+        defined = set()
+
+        for kind, value in record.actions:
+            if kind == DIAGNOSTIC:
+                yield kind, value
+            elif kind == DEFINE:
+                defined.add(value)
+            elif value not in defined:
+                first = self.first_definer.get(value)
+
+                if first is None or first.index >= record.index:
+                    yield kind, value
+
+    def render(self, record):
+        raise NotImplementedError
+
+
+class IncrementalValidator(LineAnalysis):
+    """
+    Validador que conserva el análisis de cada línea entre
+    ejecuciones (ver LineAnalysis). El resultado es idéntico al de
+    validator.validate.
+
+    El analizador de sentencias es ProgramParser expresado como una
+    máquina de estados, para poder retomarlo en cualquier línea.
+    """
+    def __init__(self, expr_parser=IterativeArithmeticParser, cache_size=EXPR_CACHE_SIZE):
+        super().__init__(expr_parser, cache_size)
+
+    def reset(self):
+        super().reset()
+        # Línea en la que terminó el análisis, o None si fue al
+        # acabarse los tokens (ver end_actions y end_terminal).
+        self.terminal_record = None
+        self.end_actions = ()
+        self.end_terminal = (RETURN_OUTPUT, None)
+
+    def update(self, text, progress=None):
+        """
+        Valida la nueva versión del texto y regresa el resultado.
+
+        Si se da progress, se llama periódicamente con las líneas
+        procesadas y un estimado del total; puede lanzar
+        ValidationCancelled para detener el análisis, y en ese caso
+        se descarta el análisis conservado.
+        """
+        try:
+            self.apply(text, progress)
+        except ValidationCancelled:
+            self.reset()
+            raise
+
+        return self.result()
+
+    def resume(self, start, new_end, changed, progress=None, done=0, total=0):
+        super().resume(start, new_end, changed, progress, done, total)
+
+        if self.terminal_record is None:
+            actions = []
+            last_phase = self.records[-1].phase_out if self.records else HEADER
+            self.end_terminal = self.feed(last_phase, None, actions)[1]
+            self.end_actions = tuple(actions)
+
+    def unregister(self, record, changed):
+        super().unregister(record, changed)
+
+        if record is self.terminal_record:
+            self.terminal_record = None
+
+    def scan(self, record, phase, actions):
+        record.terminal = None
+
+        if phase == INACTIVE:
+            return phase
+
+        terminal = None
+
+        for token in record.tokens:
+            phase, terminal = self.feed(phase, token, actions)
+
+            if terminal is not None:
+                break
+        else:
+            if record.error is not None:
+                if isinstance(record.error, REPORTED_ERRORS):
+                    actions.append((DIAGNOSTIC, Diagnostic.from_error(record.error)))
+                    phase, terminal = self.feed(phase, None, actions)
+                else:
+                    terminal = (RAISE, record.error)
+
+        if terminal is not None:
+            record.terminal = terminal
+            self.terminal_record = record
+            phase = INACTIVE
+
+        return phase
+
+    def feed(self, phase, token, actions):
+        """
+        Avanza ProgramParser un token (None al acabarse) desde el
+        estado phase. Agrega a actions lo que produce y regresa el
+        nuevo estado y, si el análisis terminó, cómo terminó.
+        """
+        # Al acabarse los tokens dentro de las sentencias se
+        # reporta el fin de archivo; después de 'terminar.' el
+        # programa es correcto si no hubo mensajes.
+        if token is None:
+            if phase == SENTENCE:
+                actions.append((DIAGNOSTIC, Diagnostic.from_error(EOFScanning())))
+            elif phase == AFTER_END:
+                return INACTIVE, (RETURN_FINAL, None)
+
+            return INACTIVE, (RETURN_OUTPUT, None)
+
+        token_type = token.type
+
+        try:
+            if phase == HEADER:
+                if token_type == TokenType.NAME_FIELD:
+                    return NAME, None
+
+                return INACTIVE, (RETURN_TEXT, f"Sintaxis inválida: {describe_token(token)}\n")
+            elif phase == NAME:
+                if token_type == TokenType.NAME:
+                    return START, None
+
+                return INACTIVE, (RETURN_TEXT, InvalidSyntax(describe_token(token)).message)
+            elif phase == START:
+                if token_type == TokenType.START:
+                    return SENTENCE, None
+
+                return INACTIVE, (RETURN_TEXT, InvalidSyntax(describe_token(token)).message)
+            elif phase == SENTENCE:
+                if token_type == TokenType.END:
+                    return AFTER_END, None
+                elif token_type == TokenType.READ:
+                    return READ, None
+                elif token_type == TokenType.PRINT:
+                    return PRINT, None
+                elif token_type == TokenType.ID:
+                    actions.append((DEFINE, token.value))
+                    return ASSIGN, None
+
+                error = InvalidSyntax(describe_token(token))
+            elif phase == READ or phase == PRINT:
+                if token_type == TokenType.ID:
+                    actions.append((DEFINE if phase == READ else USE, token.value))
+                    return SENTENCE, None
+
+                error = InvalidSyntax(describe_token(token))
+            elif phase == ASSIGN:
+                if token_type == TokenType.EQUALS:
+                    return EXPR, None
+
+                error = InvalidSyntax(describe_token(token))
+            elif phase == EXPR:
+                if token_type == TokenType.EXPR:
+                    actions.extend(self.expressions.actions(token.value))
+                    return SENTENCE, None
+
+                error = InvalidSyntax(token.value)
+            else:
+                return INACTIVE, (RETURN_TEXT, f"Sintaxis inválida: {describe_token(token)}\n")
+        except Exception as e:
+            # Mensajes que ni siquiera se pueden construir, como
+            # con el token EQUALS, detienen el análisis completo.
+            return INACTIVE, (RAISE, e)
+
+        # Los errores de sintaxis dentro de las sentencias se
+        # agregan a la salida y terminan el análisis.
+        actions.append((DIAGNOSTIC, Diagnostic.from_error(error)))
+
+        return INACTIVE, (RETURN_OUTPUT, None)
+
+    def render(self, record):
+        return "".join(value.message if kind == DIAGNOSTIC else uninitialized_warning(value)
+                       for kind, value in self.outputs(record))
+
+    def locate(self, output_line):
+        """
+        Línea del texto, contada desde 0, que produjo la línea
+        output_line (también desde 0) del último resultado, o None
+        si no corresponde a ninguna. Los errores del final del
+        archivo se ubican en la última línea.
+        """
+        if self.terminal_record is not None and self.terminal_record.terminal[0] == RETURN_TEXT:
+            target = self.terminal_record
+        else:
+            target = None
+
+        line = 0
+
+        for record, rendered in zip(self.records, self.rendered):
+            if record is target:
+                return line
+
+            count = rendered.count("\n")
+
+            if output_line < count:
+                return line
+
+            output_line -= count
+            line += record.text.count("\n")
+
+        end_lines = sum(value.message.count("\n") for _, value in self.end_actions)
+
+        if self.terminal_record is None and output_line < end_lines:
+            return max(line - 1, 0) if self.lines and self.lines[-1].endswith("\n") else line
+
+        return None
+
+    def result(self):
+        """
+        Resultado del análisis con el mismo formato de validate.
+        """
+        if self.terminal_record is None:
+            kind, value = self.end_terminal
+            end = "".join(value.message for action, value in self.end_actions)
+        else:
+            kind, value = self.terminal_record.terminal
+            end = ""
+
+        if kind == RAISE:
+            raise value.with_traceback(None)
+
+        if kind == RETURN_TEXT:
+            return value
+
+        output = "".join(self.rendered) + end
+
+        if kind == RETURN_FINAL and not output.strip("\n"):
+            return "Programa correcto."
+
+        return output
@@ -0,0 +1,230 @@
+"""
+Mediciones opcionales de una validación: tiempo en el análisis
+léxico, en las sentencias y en las expresiones, y contadores de
+tokens, expresiones, anidamiento, consultas a la tabla de símbolos
+y excepciones. Sin un ValidationStats no se instrumenta nada, así
+que desactivadas no cuestan.
+"""
+import re
+import time
+from contextlib import contextmanager
+
+from diagnostics import DiagnosticLog
+from execution_exceptions import AnalysisError
+from parser_class import ArithmeticParser, SymbolTable
+
+PARENTHESIS_PATTERN = re.compile(r"[()]")
+
+# Contadores que se reportan, en orden.
+COUNTERS = ("tokens", "expressions", "max_depth", "lookups", "exceptions")
+
+# Subclases instrumentadas de cada analizador.
+INSTRUMENTED_PARSERS = {}
+
+
+class ValidationStats:
+    """
+    Tiempos (en segundos) y contadores acumulados de una o varias
+    validaciones. statement_parsing es lo que queda del total al
+    quitar el análisis léxico y el de las expresiones.
+    """
+    def __init__(self):
+        self.total = 0.0
+        self.lexing = 0.0
+        self.expression_parsing = 0.0
+        self.validations = 0
+        self.tokens = 0
+        self.expressions = 0
+        self.max_depth = 0
+        self.lookups = 0
+        self.exceptions = 0
+
+    @property
+    def statement_parsing(self):
+        return max(self.total - self.lexing - self.expression_parsing, 0.0)
+
+    @contextmanager
+    def measure(self):
+        """
+        Mide una validación.
+        """
+        start = time.perf_counter()
+
+        try:
+            yield self
+        finally:
+            self.total += time.perf_counter() - start
+            self.validations += 1
+
+    def merge(self, other):
+        self.total += other.total
+        self.lexing += other.lexing
+        self.expression_parsing += other.expression_parsing
+        self.validations += other.validations
+        self.tokens += other.tokens
+        self.expressions += other.expressions
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.lookups += other.lookups
+        self.exceptions += other.exceptions
+
+        return self
+
+    def as_dict(self):
+        stats = {"total": self.total, "lexing": self.lexing,
+                 "statement_parsing": self.statement_parsing,
+                 "expression_parsing": self.expression_parsing,
+                 "validations": self.validations}
+
+        for name in COUNTERS:
+            stats[name] = getattr(self, name)
+
+        return stats
+
+    def summary(self):
+        return (f"léxico {self.lexing * 1000:.1f} ms, sentencias {self.statement_parsing * 1000:.1f} ms, "
+                f"expresiones {self.expression_parsing * 1000:.1f} ms | {self.tokens} tokens, "
+                f"{self.expressions} expresiones (anidamiento {self.max_depth}), "
+                f"{self.lookups} consultas de símbolos, {self.exceptions} excepciones")
+
+
+class CountingSymbols(SymbolTable):
+    """
+    Tabla de símbolos que cuenta sus consultas.
+    """
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def __contains__(self, name):
+        self.stats.lookups += 1
+        return super().__contains__(name)
+
+
+class CountingLog(DiagnosticLog):
+    """
+    Registro de diagnósticos que cuenta las excepciones atrapadas
+    que se le reportan.
+    """
+    __slots__ = ("stats",)
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def caught(self, error):
+        self.stats.exceptions += 1
+        return super().caught(error)
+
+    def count_caught(self, count=1):
+        self.stats.exceptions += count
+
+
+def timed_tokens(tokens, stats):
+    """
+    Entrega los tokens de un generador sumando a stats el tiempo
+    que tarda cada uno en producirse.
+    """
+    tokens = iter(tokens)
+    clock = time.perf_counter
+
+    while True:
+        start = clock()
+
+        try:
+            token = next(tokens)
+        except StopIteration:
+            stats.lexing += clock() - start
+            return
+        except BaseException:
+            stats.lexing += clock() - start
+            raise
+
+        stats.lexing += clock() - start
+        stats.tokens += 1
+
+        yield token
+
+
+def nesting_depth(expr):
+    depth = deepest = 0
+
+    for parenthesis in PARENTHESIS_PATTERN.findall(str(expr)):
+        if parenthesis == "(":
+            depth += 1
+            deepest = max(deepest, depth)
+        else:
+            depth -= 1
+
+    return deepest
+
+
+class InstrumentedParser:
+    """
+    Se combina con un analizador de programas para medirlo: los
+    tokens pasan por timed_tokens, la tabla de símbolos cuenta sus
+    consultas, el registro de diagnósticos cuenta las excepciones
+    que el analizador atrapa (también las que deja salir de parse)
+    y las expresiones se cronometran sin incluir los tokens del
+    flujo principal que consumen.
+    """
+    def __init__(self, tokens, expr_parser=None, expr_cache=None, stats=None):
+        self.stats = stats
+        expr_parser = instrumented(expr_parser or ArithmeticParser, InstrumentedExpressionParser)
+        super().__init__(timed_tokens(tokens, stats), expr_parser, expr_cache)
+        self.symbol_table = CountingSymbols(stats)
+
+    def make_log(self):
+        return CountingLog(self.stats)
+
+    def parse(self):
+        try:
+            return super().parse()
+        except AnalysisError:
+            self.stats.exceptions += 1
+            raise
+
+    def parse_expr(self, expr):
+        return self.timed_expression(super().parse_expr, expr)
+
+    def parse_inline_expr(self, expr):
+        return self.timed_expression(super().parse_inline_expr, expr)
+
+    def timed_expression(self, parse, expr):
+        stats = self.stats
+        stats.expressions += 1
+        stats.max_depth = max(stats.max_depth, nesting_depth(expr))
+        lexing = stats.lexing
+        start = time.perf_counter()
+
+        try:
+            return parse(expr)
+        finally:
+            stats.expression_parsing += time.perf_counter() - start - (stats.lexing - lexing)
+
+
+class InstrumentedExpressionParser:
+    """
+    Se combina con un analizador de expresiones para contar las
+    excepciones que atrapa. Toma el ValidationStats de la tabla de
+    símbolos, la CountingSymbols del analizador de programas.
+    """
+    def __init__(self, expr, symbol_table, tokens):
+        self.stats = symbol_table.stats
+        super().__init__(expr, symbol_table, tokens)
+
+    def make_log(self):
+        return CountingLog(self.stats)
+
+
+def instrumented(parser_class, mixin=InstrumentedParser):
+    """
+    Regresa la subclase instrumentada de parser_class. Con el mixin
+    por omisión, parser_class es un analizador de programas y la
+    subclase recibe además el ValidationStats en el que acumula.
+    """
+    key = (parser_class, mixin)
+
+    if key not in INSTRUMENTED_PARSERS:
+        INSTRUMENTED_PARSERS[key] = type("Instrumented" + parser_class.__name__, (mixin, parser_class), {})
+
+    return INSTRUMENTED_PARSERS[key]
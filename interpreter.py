@@ -0,0 +1,292 @@
+"""
+Ejecuta programas validados sobre lotes de datos. Cada variable
+de 'leer' recibe un arreglo de NumPy con un valor por ejecución
+y las expresiones se evalúan sobre los arreglos completos, así
+que el lote entero corre en una sola pasada por el programa.
+
+Uso: python interpreter.py PROGRAMA DATOS.csv
+
+La primera fila del CSV nombra las columnas; cada 'leer x' toma
+la columna x. La salida es un CSV con una columna por 'imprimir'.
+"""
+import argparse
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+from execution_exceptions import *
+from ir import Assign, Negate, Number, Print, Program, Read, Variable, children, parse_expression, variables
+from lexer import TableProgramLexer
+from optimizer import optimize_program
+from tokens import TokenType
+from validator import validate
+
+OPERATIONS = {
+    TokenType.SUM: np.add,
+    TokenType.SUBSTRACTION: np.subtract,
+    TokenType.MULTIPLY: np.multiply,
+    TokenType.DIVIDE: np.true_divide,
+    TokenType.POWER: np.power,
+}
+
+
+def parse_program(text):
+    """
+    Valida el texto y construye su Program. Sólo se aceptan
+    programas cuya validación no reporta más que avisos; además,
+    como no hay saltos, usar una variable antes de asignarla es
+    un error y no un aviso.
+    """
+    result = validate(text)
+
+    if result != "Programa correcto.":
+        errors = [line for line in result.splitlines() if line and not line.startswith("Aviso:")]
+
+        if errors:
+            raise ExecutionError(errors[0])
+
+    tokens = TableProgramLexer(text).generate_tokens()
+    # programa, nombre e iniciar.
+    next(tokens)
+    name = next(tokens).value
+    next(tokens)
+
+    statements = []
+    defined = set()
+
+    def check(names):
+        for variable in names:
+            if variable not in defined:
+                raise ExecutionError(f"Uso de variable sin inicializar: {variable}.")
+
+    for token in tokens:
+        if token.type == TokenType.END:
+            break
+        elif token.type == TokenType.READ:
+            statements.append(Read(next(tokens).value))
+            defined.add(statements[-1].name)
+        elif token.type == TokenType.PRINT:
+            statements.append(Print(next(tokens).value))
+            check([statements[-1].name])
+        else:
+            # Asignación: id, := y la expresión.
+            next(tokens)
+
+            try:
+                expr = parse_expression(next(tokens).value)
+            except LexerError as e:
+                raise ExecutionError(e.message.rstrip("\n"))
+
+            check(variables(expr))
+            statements.append(Assign(token.value, expr))
+            defined.add(token.value)
+
+    return Program(name, tuple(statements))
+
+
+def evaluate(expr, env, cache=None, shared=()):
+    """
+    Evalúa el árbol de una expresión. Las constantes quedan como
+    escalares y NumPy las extiende al tamaño del lote. Los valores
+    de los nodos cuyo id está en shared se guardan en cache, así
+    que una subexpresión compartida (ver optimizer.Optimizer) se
+    calcula una sola vez.
+    """
+    if cache is None:
+        cache = {}
+
+    values = []
+    stack = [(expr, False)]
+
+    while stack:
+        node, expanded = stack.pop()
+        key = id(node)
+
+        if key in cache:
+            values.append(cache[key])
+            continue
+
+        if isinstance(node, Number):
+            value = np.float64(node.value)
+        elif isinstance(node, Variable):
+            value = env[node.name]
+        elif not expanded:
+            stack.append((node, True))
+
+            for child in reversed(children(node)):
+                stack.append((child, False))
+
+            continue
+        elif isinstance(node, Negate):
+            value = np.negative(values.pop())
+        else:
+            right = values.pop()
+            value = OPERATIONS[node.operator](values.pop(), right)
+
+        if key in shared:
+            cache[key] = value
+
+        values.append(value)
+
+    return values[0]
+
+
+def shared_nodes(program):
+    """
+    Ids de los nodos internos que aparecen más de una vez en las
+    expresiones del programa.
+    """
+    seen = set()
+    shared = set()
+
+    for statement in program.statements:
+        if not isinstance(statement, Assign):
+            continue
+
+        stack = [statement.expr]
+
+        while stack:
+            node = stack.pop()
+            nodes = children(node)
+
+            if not nodes:
+                continue
+
+            if id(node) in seen:
+                shared.add(id(node))
+                continue
+
+            seen.add(id(node))
+            stack.extend(nodes)
+
+    return shared
+
+
+def read_names(program):
+    return [statement.name for statement in program.statements if isinstance(statement, Read)]
+
+
+def input_columns(reads, inputs):
+    """
+    Regresa los arreglos que recibe cada 'leer', en orden; reads
+    son los nombres de sus variables. inputs puede ser un
+    diccionario de nombre de variable a columna o una secuencia
+    con una columna por 'leer'.
+    """
+    if isinstance(inputs, Mapping):
+        missing = [name for name in reads if name not in inputs]
+
+        if missing:
+            raise ExecutionError(f"No hay datos para la variable: {missing[0]}.")
+
+        columns = [inputs[name] for name in reads]
+    else:
+        columns = list(inputs)
+
+        if len(columns) < len(reads):
+            raise ExecutionError(f"Se esperaban {len(reads)} columnas de datos y hay {len(columns)}.")
+
+    columns = [np.asarray(column, dtype=np.float64) for column in columns[:len(reads)]]
+
+    if any(column.ndim != 1 for column in columns):
+        raise ExecutionError("Cada columna de datos debe ser un vector.")
+
+    if len({len(column) for column in columns}) > 1:
+        raise ExecutionError("Las columnas de datos tienen tamaños distintos.")
+
+    return columns
+
+
+def run(program, inputs=(), size=None, optimize=True):
+    """
+    Ejecuta el programa (un Program o su texto) sobre un lote y
+    regresa una lista con un arreglo por cada 'imprimir'. size es
+    el tamaño del lote cuando el programa no lee datos. Con
+    optimize se aplica antes optimizer.optimize_program.
+
+    Como en la aritmética de punto flotante, dividir entre cero
+    da infinito o NaN en lugar de detener la ejecución.
+    """
+    if isinstance(program, str):
+        program = parse_program(program)
+
+    if optimize:
+        program = optimize_program(program)
+
+    columns = input_columns(read_names(program), inputs)
+
+    if columns:
+        size = len(columns[0])
+    elif size is None:
+        size = 1
+
+    columns = iter(columns)
+    env = {}
+    outputs = []
+    cache = {}
+    shared = shared_nodes(program)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for statement in program.statements:
+            if isinstance(statement, Read):
+                env[statement.name] = next(columns)
+            elif isinstance(statement, Assign):
+                env[statement.name] = evaluate(statement.expr, env, cache, shared)
+            elif isinstance(statement, Print):
+                # Una variable constante se imprime para todo el lote.
+                outputs.append(np.broadcast_to(env[statement.name], (size,)).copy())
+
+    return outputs
+
+
+def read_columns(path):
+    """
+    Lee un CSV cuya primera fila tiene los nombres de las columnas
+    y regresa un diccionario de nombre a arreglo.
+    """
+    with open(path, encoding="utf-8") as input_file:
+        names = [name.strip() for name in input_file.readline().rstrip("\n").split(",")]
+        data = np.loadtxt(input_file, delimiter=",", dtype=np.float64, ndmin=2)
+
+    if data.size and data.shape[1] != len(names):
+        raise ExecutionError("El número de columnas no coincide con el encabezado.")
+
+    data = data.reshape(-1, len(names))
+
+    return {name: data[:, index] for index, name in enumerate(names)}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Ejecuta un programa sobre un lote de datos.")
+    arg_parser.add_argument("program", help="archivo con el programa")
+    arg_parser.add_argument("data", help="CSV con una columna por variable de 'leer'")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        with open(args.program, encoding="utf-8") as input_file:
+            program = parse_program(input_file.read())
+
+        outputs = run(program, read_columns(args.data))
+    except ExecutionError as e:
+        print(e.message, end="", file=sys.stderr)
+        return 1
+
+    write_outputs([statement.name for statement in program.statements if isinstance(statement, Print)],
+                  outputs)
+
+    return 0
+
+
+def write_outputs(names, outputs, output_file=None):
+    """
+    Escribe como CSV los arreglos de cada 'imprimir', con los
+    nombres de sus variables como encabezado.
+    """
+    if outputs:
+        np.savetxt(output_file or sys.stdout, np.column_stack(outputs), delimiter=",",
+                   header=",".join(names), comments="", fmt="%.17g")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Representación intermedia de un programa ya validado: un árbol
+de sintaxis para cada expresión y la lista de sentencias. Ver
+interpreter.parse_program.
+"""
+from dataclasses import dataclass
+
+from execution_exceptions import *
+from lexer import ArithmeticLexer
+from tokens import TokenType
+
+# Operadores binarios con su precedencia. La potencia es
+# asociativa por la derecha y los demás por la izquierda.
+PRECEDENCE = {
+    TokenType.SUM: 1,
+    TokenType.SUBSTRACTION: 1,
+    TokenType.MULTIPLY: 2,
+    TokenType.DIVIDE: 2,
+    TokenType.POWER: 3,
+}
+RIGHT_ASSOCIATIVE = {TokenType.POWER}
+
+# Marca del menos unario en la pila de operadores.
+NEGATE = object()
+
+
+@dataclass(frozen=True)
+class Number:
+    value: float
+
+
+@dataclass(frozen=True)
+class Variable:
+    name: str
+    # Número de asignación de la variable que se lee; sólo lo
+    # distingue el optimizador (ver optimizer.Optimizer).
+    version: int = 0
+
+
+@dataclass(frozen=True)
+class Negate:
+    operand: object
+
+
+@dataclass(frozen=True)
+class BinaryOp:
+    operator: TokenType
+    left: object
+    right: object
+
+
+@dataclass(frozen=True)
+class Read:
+    name: str
+
+
+@dataclass(frozen=True)
+class Assign:
+    name: str
+    expr: object
+
+
+@dataclass(frozen=True)
+class Print:
+    name: str
+
+
+@dataclass(frozen=True)
+class Program:
+    name: str
+    statements: tuple
+
+
+def children(node):
+    if isinstance(node, BinaryOp):
+        return node.left, node.right
+
+    if isinstance(node, Negate):
+        return (node.operand,)
+
+    return ()
+
+
+def postorder(root):
+    """
+    Recorre el árbol de una expresión visitando los hijos antes
+    que el padre, de izquierda a derecha. No usa recursión, así
+    que acepta expresiones con cualquier anidamiento.
+    """
+    stack = [(root, False)]
+
+    while stack:
+        node, expanded = stack.pop()
+
+        if expanded:
+            yield node
+            continue
+
+        stack.append((node, True))
+
+        for child in reversed(children(node)):
+            stack.append((child, False))
+
+
+def inorder(root):
+    """
+    Recorre el árbol de una expresión visitando cada operación
+    binaria entre sus dos operandos, es decir, en el orden en que
+    aparecen en el texto. Tampoco usa recursión.
+    """
+    stack = [(root, False)]
+
+    while stack:
+        node, expanded = stack.pop()
+
+        if expanded:
+            yield node
+        elif isinstance(node, BinaryOp):
+            stack.append((node.right, False))
+            stack.append((node, True))
+            stack.append((node.left, False))
+        else:
+            # El menos unario va antes de su operando.
+            yield node
+            stack.extend((child, False) for child in children(node))
+
+
+def variables(expr):
+    return [node.name for node in postorder(expr) if isinstance(node, Variable)]
+
+
+def number_value(text):
+    # El analizador léxico acepta cualquier carácter numérico,
+    # pero sólo los dígitos decimales tienen un valor posicional.
+    try:
+        return float(text)
+    except ValueError:
+        raise InvalidTokenError(text)
+
+
+def reduce_top(operators, operands):
+    operator = operators.pop()
+
+    if operator is NEGATE:
+        operands.append(Negate(operands.pop()))
+    else:
+        right = operands.pop()
+        operands.append(BinaryOp(operator, operands.pop(), right))
+
+
+def parse_expression(expr):
+    """
+    Construye el árbol de una expresión ya validada. Sigue la
+    gramática de ArithmeticParser: en F --> -E el menos unario
+    niega todo el resto de la expresión hasta el paréntesis que
+    la cierra, así que -a+b es -(a+b) y a*-b+c es a*(-(b+c)).
+    """
+    return parse_tokens(ArithmeticLexer(expr).generate_tokens(), expr)
+
+
+def parse_tokens(tokens, expr):
+    """
+    Igual que parse_expression, pero con los tokens ya generados;
+    expr, que puede ser un Span, sólo se usa en los errores.
+    """
+    operands = []
+    operators = []
+    expect_operand = True
+
+    for token in tokens:
+        token_type = token.type
+
+        if expect_operand:
+            if token_type == TokenType.SUBSTRACTION:
+                operators.append(NEGATE)
+            elif token_type == TokenType.LEF_PARENS:
+                operators.append(TokenType.LEF_PARENS)
+            elif token_type == TokenType.ID:
+                operands.append(Variable(token.value))
+                expect_operand = False
+            elif token_type == TokenType.NUMBER:
+                operands.append(Number(number_value(token.value)))
+                expect_operand = False
+            else:
+                raise InvalidSyntax(str(expr))
+        elif token_type == TokenType.RIGHT_PARENS:
+            # El paréntesis también cierra los menos unarios
+            # que se abrieron dentro de él.
+            while operators and operators[-1] is not TokenType.LEF_PARENS:
+                reduce_top(operators, operands)
+
+            if not operators:
+                raise InvalidSyntax(str(expr))
+
+            operators.pop()
+        elif token_type in PRECEDENCE:
+            precedence = PRECEDENCE[token_type]
+
+            while operators and operators[-1] in PRECEDENCE:
+                top = PRECEDENCE[operators[-1]]
+
+                if top < precedence or (top == precedence and token_type in RIGHT_ASSOCIATIVE):
+                    break
+
+                reduce_top(operators, operands)
+
+            operators.append(token_type)
+            expect_operand = True
+        else:
+            raise InvalidSyntax(str(expr))
+
+    if expect_operand:
+        raise InvalidSyntax(str(expr))
+
+    while operators:
+        if operators[-1] is TokenType.LEF_PARENS:
+            raise ParenthesisError(str(expr))
+
+        reduce_top(operators, operands)
+
+    return operands.pop()
+
@@ -1,9 +1,42 @@
-from tokens import TokenType, Token
+import re
+import sys
+
+from source import StreamText, CHUNK_SIZE
+from tokens import TokenType, Token, Span, TokenBuffer
 from execution_exceptions import *
 
 NEWLINE = ";\n"
 WHITESPACE = " \t"
 
+# Tabla de transiciones del analizador por tablas: cada palabra
+# reservada (y la asignación) con el token que produce.
+KEYWORDS = {
+    "programa ": TokenType.NAME_FIELD,
+    "iniciar": TokenType.START,
+    "leer ": TokenType.READ,
+    "imprimir ": TokenType.PRINT,
+    "terminar.": TokenType.END,
+    " := ": TokenType.EQUALS,
+}
+KEYWORD_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in KEYWORDS))
+# Sólo reconocemos de un golpe los casos comunes; cualquier otra
+# cosa se delega al analizador original para conservar sus errores.
+ID_PATTERN = re.compile(r"[a-z0-9]*(?=[ ;\n])")
+NAME_PATTERN = re.compile(r"[a-z][a-z0-9]*(?=[;\n])")
+NEWLINE_PATTERN = re.compile(r"[;\n]")
+LINE_BREAK_PATTERN = re.compile(r"\n")
+# Tabla del analizador unificado para los operadores aritméticos.
+OPERATORS = {
+    '+': TokenType.SUM,
+    '-': TokenType.SUBSTRACTION,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '^': TokenType.POWER,
+    '(': TokenType.LEF_PARENS,
+    ')': TokenType.RIGHT_PARENS,
+}
+ARITHMETIC_ID_PATTERN = re.compile(r"[^-+*/^()]*")
+
 
 class Lexer:
     def __init__(self, text):
@@ -13,8 +46,22 @@ class Lexer:
         """
         self.text = text
         self.pointer = -1
+
+        # Un archivo leído por bloques hace sus propias búsquedas.
+        if isinstance(text, StreamText):
+            self.match = text.match
+            self.search = text.search
+
         self.next_char()
 
+    @classmethod
+    def from_file(cls, source, chunk_size=CHUNK_SIZE):
+        """
+        Crea el analizador sobre un archivo, dado por su ruta
+        o como flujo binario, que se lee por bloques.
+        """
+        return cls(StreamText(source, chunk_size))
+
     def next_char(self, advance=1):
         self.pointer += advance
 
@@ -26,6 +73,13 @@ class Lexer:
     def generate_tokens(self):
         pass
 
+    # Búsquedas con expresiones regulares compiladas sobre el texto.
+    def match(self, pattern, pos, endpos=sys.maxsize):
+        return pattern.match(self.text, pos, endpos)
+
+    def search(self, pattern, pos):
+        return pattern.search(self.text, pos)
+
 
 class ProgramLexer(Lexer):
     """
@@ -109,21 +163,370 @@ class ProgramLexer(Lexer):
             id += self.current
             self.next_char()
 
+        return self.finish_id(id)
+
+    # Revisión común del carácter que sigue a un identificador.
+    def finish_id(self, id):
+        self.check_id_end(not id)
+
+        return Token(TokenType.ID, id)
+
+    def check_id_end(self, empty):
         if self.current == ' ':
-            if (next_c := self.text[self.pointer + 1]) == ' ' or next_c in NEWLINE or not id:
+            if (next_c := self.text[self.pointer + 1]) == ' ' or next_c in NEWLINE or empty:
                 raise InvalidTokenError(self.current)
 
         if self.current in NEWLINE:
             self.check_newline()
 
-        return Token(TokenType.ID, id)
-
 
     def check_newline(self):
         if self.text[self.pointer:self.pointer + 2] != ";\n":
             raise NewlineError()
 
 
+class TableProgramLexer(ProgramLexer):
+    """
+    Analizador léxico del código fuente guiado por tablas.
+    Las palabras reservadas se reconocen con una sola expresión
+    regular compilada y los nombres, identificadores y expresiones
+    se extraen como rebanadas del texto en lugar de construirse
+    carácter por carácter. Produce exactamente los mismos tokens
+    y excepciones que ProgramLexer.
+    """
+    def __init__(self, text):
+        super().__init__(text)
+
+    def generate_tokens(self):
+        text = self.text
+
+        while self.current is not None:
+            if self.current in NEWLINE and text[self.pointer - 1] != '\n':
+                # Un ';\n' completo se salta de una vez.
+                self.next_char(advance=2 if text.startswith(NEWLINE, self.pointer) else 1)
+            elif self.current.islower() or self.current == ' ':
+                match = self.match(KEYWORD_PATTERN, self.pointer)
+
+                if match is None:
+                    # Entonces es un identificador.
+                    yield self.generate_id()
+                    continue
+
+                keyword = match.group()
+                token_type = KEYWORDS[keyword]
+                self.next_char(advance=len(keyword))
+                yield Token(token_type)
+
+                if token_type == TokenType.NAME_FIELD:
+                    yield self.generate_name()
+                    self.check_newline()
+                elif token_type == TokenType.EQUALS:
+                    yield from self.generate_rhs()
+                    self.check_newline()
+            else:
+                raise InvalidTokenError(self.current)
+
+    # Lado derecho de una asignación.
+    def generate_rhs(self):
+        yield self.generate_expr()
+
+    def generate_expr(self):
+        match = self.search(NEWLINE_PATTERN, self.pointer)
+
+        if match is None:
+            return super().generate_expr()
+
+        expression = self.text[self.pointer:match.start()]
+        self.next_char(advance=len(expression))
+
+        return Token(TokenType.EXPR, expression)
+
+    def generate_name(self):
+        match = self.match(NAME_PATTERN, self.pointer)
+
+        if match is None:
+            return super().generate_name()
+
+        name = match.group()
+        self.next_char(advance=len(name))
+
+        return Token(TokenType.NAME, name)
+
+    def generate_id(self):
+        match = self.match(ID_PATTERN, self.pointer)
+
+        if match is None:
+            return super().generate_id()
+
+        id = match.group()
+        self.next_char(advance=len(id))
+
+        return self.finish_id(id)
+
+
+class CompactProgramLexer(TableProgramLexer):
+    """
+    Analizador léxico por tablas que guarda los tokens en un
+    TokenBuffer: tipo e índices en el texto, sin crear un Token
+    ni copiar una subcadena por cada uno. generate_tokens entrega
+    vistas con la interfaz de Token, así que los analizadores
+    sintácticos lo usan sin cambios. Un archivo leído por bloques
+    descarta el texto ya leído, así que en ese caso se comporta
+    como TableProgramLexer.
+    """
+    def __init__(self, text):
+        super().__init__(text)
+
+    def generate_tokens(self):
+        if not isinstance(self.text, str):
+            yield from super().generate_tokens()
+            return
+
+        yield from self.tokenize().stream()
+
+    def tokenize(self):
+        buffer = TokenBuffer(self.text)
+
+        # El error se guarda para lanzarlo después del último token,
+        # en el mismo punto en que lo lanzaría el generador.
+        try:
+            self.fill(buffer)
+        except Exception as e:
+            buffer.error = e
+
+        return buffer
+
+    def fill(self, buffer):
+        text = self.text
+        append = buffer.append
+
+        while self.current is not None:
+            if self.current in NEWLINE and text[self.pointer - 1] != '\n':
+                self.next_char(advance=2 if text.startswith(NEWLINE, self.pointer) else 1)
+            elif self.current.islower() or self.current == ' ':
+                match = self.match(KEYWORD_PATTERN, self.pointer)
+
+                if match is None:
+                    self.append_id(append)
+                    continue
+
+                token_type = KEYWORDS[match.group()]
+                self.next_char(advance=match.end() - self.pointer)
+                append(token_type)
+
+                if token_type == TokenType.NAME_FIELD:
+                    self.append_name(append)
+                    self.check_newline()
+                elif token_type == TokenType.EQUALS:
+                    self.append_expr(append)
+                    self.check_newline()
+            else:
+                raise InvalidTokenError(self.current)
+
+    def append_id(self, append):
+        start = self.pointer
+        match = self.match(ID_PATTERN, start)
+
+        if match is None:
+            # generate_id lanza el error o regresa el mismo texto.
+            self.generate_id()
+            append(TokenType.ID, start, self.pointer)
+            return
+
+        self.next_char(advance=match.end() - start)
+        self.check_id_end(match.end() == start)
+        append(TokenType.ID, start, match.end())
+
+    def append_name(self, append):
+        start = self.pointer
+        match = self.match(NAME_PATTERN, start)
+
+        if match is None:
+            ProgramLexer.generate_name(self)
+        else:
+            self.next_char(advance=match.end() - start)
+
+        append(TokenType.NAME, start, self.pointer)
+
+    def append_expr(self, append):
+        start = self.pointer
+        match = self.search(NEWLINE_PATTERN, start)
+
+        # Sin ';' ni salto de línea la expresión llega al final
+        # del archivo y generate_expr lanza el error.
+        if match is None:
+            self.generate_expr()
+
+        self.next_char(advance=match.start() - start)
+        append(TokenType.EXPR, start, match.start())
+
+
+class RecoveringProgramLexer(TableProgramLexer):
+    """
+    Analizador léxico por tablas que no se detiene en el primer
+    error: lo entrega como un token ERROR (con la línea y la columna
+    en los atributos line y column de la excepción) y continúa en la línea
+    siguiente. Cada salto de línea que termina una línea produce
+    un token EOL con el número de la línea que empieza, para que
+    RecoveringProgramParser sepa dónde sincronizarse.
+    """
+    def __init__(self, text):
+        super().__init__(text)
+        self.line = 1
+        # Posición en el texto donde empieza la línea actual.
+        self.line_start = 0
+
+    def generate_tokens(self):
+        while self.current is not None:
+            try:
+                yield from self.generate_line()
+                continue
+            except LexerError as e:
+                error = e
+            except (AttributeError, IndexError, TypeError):
+                # Así falla el analizador original cuando el texto
+                # se acaba a media sentencia.
+                if not self.at_end():
+                    raise
+
+                error = EOFScanning()
+
+            error.line = self.line
+            error.column = max(self.pointer - self.line_start, 0) + 1
+            yield Token(TokenType.ERROR, error)
+
+            match = self.search(LINE_BREAK_PATTERN, self.pointer)
+
+            if match is None:
+                return
+
+            self.next_char(advance=match.end() - self.pointer)
+            self.line += 1
+            self.line_start = self.pointer
+            yield Token(TokenType.EOL, self.line)
+
+    def generate_name(self):
+        # El nombre puede empezar con el salto de línea que sigue
+        # a 'programa ', que entonces no produce un EOL.
+        if self.current == '\n':
+            self.line += 1
+            self.line_start = self.pointer + 1
+
+        return super().generate_name()
+
+    def at_end(self):
+        try:
+            self.text[self.pointer + 1]
+        except IndexError:
+            return True
+
+        return False
+
+    # Tokens de una línea, hasta su EOL inclusive.
+    def generate_line(self):
+        text = self.text
+
+        while self.current is not None:
+            if self.current in NEWLINE and text[self.pointer - 1] != '\n':
+                advance = 2 if text.startswith(NEWLINE, self.pointer) else 1
+                self.next_char(advance=advance)
+
+                if text[self.pointer - 1] == '\n':
+                    self.line += 1
+                    self.line_start = self.pointer
+                    yield Token(TokenType.EOL, self.line)
+                    return
+            elif self.current.islower() or self.current == ' ':
+                match = self.match(KEYWORD_PATTERN, self.pointer)
+
+                if match is None:
+                    yield self.generate_id()
+                    continue
+
+                token_type = KEYWORDS[match.group()]
+                self.next_char(advance=match.end() - self.pointer)
+                yield Token(token_type)
+
+                if token_type == TokenType.NAME_FIELD:
+                    yield self.generate_name()
+                    self.check_newline()
+                elif token_type == TokenType.EQUALS:
+                    yield from self.generate_rhs()
+                    self.check_newline()
+            else:
+                raise InvalidTokenError(self.current)
+
+
+class UnifiedProgramLexer(TableProgramLexer):
+    """
+    Analizador léxico que, en lugar de un token EXPR con la
+    copia del lado derecho de cada asignación, intercala los
+    tokens aritméticos en el flujo principal entre EXPR_BEGIN
+    y EXPR_END. El valor de EXPR_BEGIN es un Span con el texto
+    de la expresión para los mensajes de error y la llave del
+    caché de expresiones. Si se llama a su skip() antes de pedir
+    el siguiente token, los tokens aritméticos no se generan y
+    sigue directamente EXPR_END. Los errores léxicos de la
+    expresión se entregan como un token ERROR para no terminar
+    el generador principal.
+    """
+    def __init__(self, text):
+        super().__init__(text)
+
+    def generate_rhs(self):
+        match = self.search(NEWLINE_PATTERN, self.pointer)
+
+        if match is None:
+            yield self.generate_expr()
+            return
+
+        start, end = self.pointer, match.start()
+        span = Span(self.text, start, end)
+        yield Token(TokenType.EXPR_BEGIN, span)
+
+        if not span.skipped:
+            yield from self.generate_arithmetic(start, end)
+
+        self.next_char(advance=end - start)
+        yield Token(TokenType.EXPR_END)
+
+    # Mismas reglas que ArithmeticLexer, pero sobre el texto original.
+    def generate_arithmetic(self, start, end):
+        text = self.text
+        pos = start
+
+        while pos < end:
+            char = text[pos]
+
+            if char.isalpha():
+                if char.isupper():
+                    yield Token(TokenType.ERROR, InvalidTokenError(char))
+                    return
+
+                match = self.match(ARITHMETIC_ID_PATTERN, pos, end)
+                pos = match.end()
+                yield Token(TokenType.ID, match.group())
+            elif char.isnumeric():
+                number_end = pos + 1
+
+                # Checamos que no haya números de la forma 012, 003, etc.
+                if char == '0' and number_end < end and text[number_end].isnumeric():
+                    yield Token(TokenType.ERROR, InvalidTokenError(char + text[number_end]))
+                    return
+
+                while number_end < end and text[number_end].isnumeric():
+                    number_end += 1
+
+                yield Token(TokenType.NUMBER, text[pos:number_end])
+                pos = number_end
+            elif char in OPERATORS:
+                pos += 1
+                yield Token(OPERATORS[char])
+            else:
+                yield Token(TokenType.ERROR, InvalidTokenError(char))
+                return
+
+
 class ArithmeticLexer(Lexer):
     """
     Analizador léxico de expresiones
@@ -190,3 +593,42 @@ class ArithmeticLexer(Lexer):
             self.next_char()
 
         return Token(TokenType.ID, identifier)
+
+
+# Analizadores léxicos de programas disponibles, para poder
+# comparar sus resultados y su rendimiento.
+PROGRAM_LEXERS = {
+    "classic": ProgramLexer,
+    "table": TableProgramLexer,
+    "compact": CompactProgramLexer,
+    "unified": UnifiedProgramLexer,
+}
+
+
+def collect(tokens):
+    """
+    Consume un generador de tokens y regresa los tokens y la
+    excepción con la que se detuvo, si hubo. Se conserva
+    cualquier excepción, no sólo LexerError, porque el análisis
+    la dejaría salir en el mismo punto.
+    """
+    collected = []
+
+    try:
+        for token in tokens:
+            collected.append(token)
+    except Exception as e:
+        return collected, e
+
+    return collected, None
+
+
+def replay(tokens, error):
+    """
+    Vuelve a entregar los tokens de collect y al final lanza la
+    excepción con la que se detuvo.
+    """
+    yield from tokens
+
+    if error is not None:
+        raise error
@@ -0,0 +1,461 @@
+"""
+Servidor del Language Server Protocol por la entrada y salida
+estándar, para validar los programas desde cualquier editor. Acepta
+cambios incrementales del documento, vuelve a analizar sólo las
+líneas afectadas y publica como diagnósticos los errores léxicos y
+sintácticos, las variables sin inicializar y las divisiones entre
+cero.
+
+Uso: python lsp.py
+"""
+import json
+import re
+import sys
+from itertools import accumulate, compress
+
+import diagnostics
+from diagnostics import Diagnostic
+from execution_exceptions import *
+from incremental import DEFINE, LineAnalysis
+from parser_class import (EXPR_CACHE_SIZE, DIAGNOSTIC, USE, OptimizingArithmeticParser, describe_token,
+                          uninitialized_warning)
+from tokens import TokenType
+
+# Estados del análisis entre un token y otro. Como en
+# RecoveringProgramParser, un error descarta el resto de la línea y
+# el análisis sigue en la siguiente; DONE marca lo que sigue al
+# primer error después de 'terminar.'.
+(HEADER, NAME, START, SENTENCE, READ, PRINT, ASSIGN, EXPR, AFTER_END, DONE) = range(10)
+
+# Estado en el que se retoma el análisis tras un error en cada estado.
+RESYNC = {HEADER: START, NAME: START, START: SENTENCE, SENTENCE: SENTENCE, READ: SENTENCE,
+          PRINT: SENTENCE, ASSIGN: SENTENCE, EXPR: SENTENCE, AFTER_END: DONE, DONE: DONE}
+
+# Severidades de los diagnósticos del protocolo, y la que toca a
+# cada diagnostics.Diagnostic.
+ERROR, WARNING = 1, 2
+SEVERITIES = {diagnostics.ERROR: ERROR, diagnostics.WARNING: WARNING}
+
+# Errores de JSON-RPC.
+METHOD_NOT_FOUND = -32601
+INVALID_REQUEST = -32600
+INTERNAL_ERROR = -32603
+
+# Sincronización incremental del documento (TextDocumentSyncKind).
+INCREMENTAL_SYNC = 2
+
+SOURCE = "pia_automatas"
+
+
+def split_document(text):
+    """
+    Líneas del documento como las cuenta el protocolo: cada una con
+    su salto de línea salvo la última, que puede quedar vacía.
+    """
+    parts = text.split("\n")
+
+    return [part + "\n" for part in parts[:-1]] + [parts[-1]]
+
+
+def utf16_length(text):
+    # El protocolo cuenta las columnas en unidades de UTF-16.
+    return len(text) + sum(1 for char in text if ord(char) > 0xFFFF)
+
+
+def utf16_index(text, column):
+    """
+    Índice en text de la columna column medida en UTF-16.
+    """
+    if text.isascii():
+        return min(column, len(text))
+
+    units = 0
+
+    for index, char in enumerate(text):
+        if units >= column:
+            return index
+
+        units += 2 if ord(char) > 0xFFFF else 1
+
+    return len(text)
+
+
+def describe(token):
+    # ':=' es el único token sin valor que no tiene descripción.
+    if token.type == TokenType.EQUALS:
+        return ":="
+
+    return describe_token(token)
+
+
+class DocumentAnalysis(LineAnalysis):
+    """
+    Análisis de un documento que se conserva por línea entre cambios
+    (ver LineAnalysis). La máquina de estados es la de
+    RecoveringProgramParser: tras un error sigue en la línea siguiente.
+    """
+    def __init__(self, text="", expr_parser=OptimizingArithmeticParser, cache_size=EXPR_CACHE_SIZE):
+        super().__init__(expr_parser, cache_size)
+        # Líneas del documento como las cuenta el protocolo; las de
+        # records son las de split_lines.
+        self.document = split_document(text)
+        self.apply(text)
+
+    @property
+    def text(self):
+        return "".join(self.document)
+
+    def apply_changes(self, changes):
+        """
+        Aplica los cambios de didChange, en orden: los que tienen
+        "range" reemplazan ese fragmento y los demás el documento
+        completo. El análisis se actualiza una sola vez al final, y
+        si sólo cambiaron algunas líneas se reemplazan ésas sin
+        volver a armar el texto completo.
+        """
+        document = self.document
+        # Si split_lines unió líneas, no coinciden con las del documento.
+        joined = len(self.records) != len(document) - (document[-1] == "")
+        # Las líneas low a high del documento ocupan ahora el lugar
+        # de las low a old_high de antes de los cambios.
+        dirty = None
+
+        for change in changes:
+            edited = self.edit(change)
+
+            if edited is None:
+                joined = True
+            elif dirty is None:
+                start, end, count = edited
+                dirty = (start, start + count, end)
+            else:
+                start, end, count = edited
+                low, high, old_high = dirty
+                # Las líneas después de high sólo se recorrieron.
+                dirty = (min(low, start), max(high, end) + count - (end - start),
+                         max(old_high, end - (high - old_high)))
+
+        if dirty is None and not joined:
+            return
+
+        document = self.document
+
+        # Una línea que termina en 'programa \n' se une con la que le
+        # sigue, también con la primera de las cambiadas.
+        if joined or any(line.endswith("programa \n") for line in document[max(dirty[0] - 1, 0):dirty[1]]):
+            self.apply(self.text)
+            return
+
+        low, high, old_high = dirty
+        last = document[-1] or (document[-2] if len(document) > 1 else "")
+        self.splice(low, min(old_high, len(self.records)), [line for line in document[low:high] if line],
+                    last[-1:])
+
+    def edit(self, change):
+        """
+        Aplica un cambio al documento. Regresa la primera línea que
+        reemplazó, la siguiente a la última y cuántas quedaron en su
+        lugar, o None si reemplazó el documento completo.
+        """
+        if "range" not in change:
+            self.document = split_document(change["text"])
+            return None
+
+        lines = self.document
+        start = change["range"]["start"]
+        end = change["range"]["end"]
+        start_line = min(start["line"], len(lines) - 1)
+        end_line = min(end["line"], len(lines) - 1)
+        prefix = lines[start_line][:utf16_index(lines[start_line], start["character"])]
+        suffix = lines[end_line][utf16_index(lines[end_line], end["character"]):]
+        new_lines = split_document(prefix + change["text"] + suffix)
+
+        # Salvo en la última línea, el fragmento termina con el salto
+        # de línea de end_line y la línea vacía que queda no existe.
+        if end_line < len(lines) - 1:
+            new_lines.pop()
+
+        lines[start_line:end_line + 1] = new_lines
+
+        return start_line, end_line + 1, len(new_lines)
+
+    def scan(self, record, phase, actions):
+        for token in record.tokens:
+            previous = phase
+            phase, error = self.step(phase, token, actions)
+
+            if error is not None:
+                actions.append((DIAGNOSTIC, Diagnostic.from_error(error)))
+                return RESYNC[previous]
+
+        error = record.error
+
+        if error is not None and phase != DONE:
+            # Así falla el analizador léxico cuando la línea se
+            # acaba a media sentencia (ver RecoveringProgramLexer).
+            if not isinstance(error, LexerError):
+                error = EOFScanning()
+
+            actions.append((DIAGNOSTIC, Diagnostic.from_error(error)))
+            phase = RESYNC[phase]
+
+        return phase
+
+    def step(self, phase, token, actions):
+        """
+        Avanza el análisis un token desde el estado phase. Regresa el
+        nuevo estado y el error, si lo hubo.
+        """
+        token_type = token.type
+
+        if phase == HEADER:
+            if token_type == TokenType.NAME_FIELD:
+                return NAME, None
+
+            if token_type == TokenType.START:
+                # Falta la línea del nombre, pero iniciar sí está.
+                actions.append((DIAGNOSTIC, Diagnostic.from_error(InvalidSyntax(describe(token)))))
+                return SENTENCE, None
+        elif phase == NAME:
+            if token_type == TokenType.NAME:
+                return START, None
+        elif phase == START:
+            if token_type == TokenType.START:
+                return SENTENCE, None
+        elif phase == SENTENCE:
+            if token_type == TokenType.END:
+                return AFTER_END, None
+            elif token_type == TokenType.READ:
+                return READ, None
+            elif token_type == TokenType.PRINT:
+                return PRINT, None
+            elif token_type == TokenType.ID:
+                actions.append((DEFINE, token.value))
+                return ASSIGN, None
+        elif phase == READ or phase == PRINT:
+            if token_type == TokenType.ID:
+                actions.append((DEFINE if phase == READ else USE, token.value))
+                return SENTENCE, None
+        elif phase == ASSIGN:
+            if token_type == TokenType.EQUALS:
+                return EXPR, None
+        elif phase == EXPR:
+            if token_type == TokenType.EXPR:
+                actions.extend(self.expressions.actions(token.value))
+                return SENTENCE, None
+        elif phase == DONE:
+            return DONE, None
+
+        return phase, InvalidSyntax(describe(token))
+
+    def render(self, record):
+        """
+        Diagnósticos de la línea como (severidad, mensaje, inicio,
+        fin); el inicio y el fin son (línea, columna) contando desde
+        la primera línea del documento que ocupa record.
+        """
+        found = []
+        whole = (position(record.text, 0), position(record.text, len(record.text.rstrip("\n"))))
+
+        for kind, value in self.outputs(record):
+            if kind == DIAGNOSTIC:
+                found.append((SEVERITIES[value.severity], value.message.rstrip("\n")) + whole)
+            else:
+                match = re.search(rf"(?<![a-z0-9]){re.escape(value)}(?![a-z0-9])", record.text)
+                span = whole if match is None else (position(record.text, match.start()),
+                                                    position(record.text, match.end()))
+                found.append((WARNING, uninitialized_warning(value).rstrip("\n")) + span)
+
+        return tuple(found)
+
+    def diagnostics(self):
+        """
+        Diagnósticos de todo el documento en el formato del protocolo.
+        """
+        records = self.records
+        document = self.document
+        lines = range(len(records))
+
+        # Si split_lines unió líneas, las siguientes se recorren.
+        if len(records) != len(document) - (document[-1] == ""):
+            lines = list(accumulate((record.text.count("\n") for record in records), initial=0))
+
+        found = []
+
+        for index in compress(range(len(self.rendered)), self.rendered):
+            line = lines[index]
+
+            for severity, message, start, end in self.rendered[index]:
+                found.append(diagnostic(line + start[0], start[1], line + end[0], end[1], severity, message))
+
+        if (records[-1].phase_out if records else HEADER) not in (AFTER_END, DONE):
+            end = utf16_length(document[-1])
+            found.append(diagnostic(len(document) - 1, end, len(document) - 1, end, ERROR,
+                                    EOFScanning().message.rstrip("\n")))
+
+        return found
+
+
+def position(text, index):
+    """
+    Línea (desde 0) y columna en UTF-16 del índice index de text.
+    """
+    line = text.count("\n", 0, index)
+
+    return line, utf16_length(text[text.rfind("\n", 0, index) + 1:index])
+
+
+def diagnostic(start_line, start, end_line, end, severity, message):
+    return {
+        "range": {"start": {"line": start_line, "character": start},
+                  "end": {"line": end_line, "character": end}},
+        "severity": severity,
+        "source": SOURCE,
+        "message": message,
+    }
+
+
+def read_message(stream):
+    """
+    Lee un mensaje de JSON-RPC con sus encabezados, o regresa None
+    al acabarse la entrada.
+    """
+    length = None
+
+    while True:
+        header = stream.readline()
+
+        if not header:
+            return None
+
+        header = header.strip()
+
+        if not header:
+            break
+
+        name, _, value = header.decode("ascii").partition(":")
+
+        if name.lower() == "content-length":
+            length = int(value)
+
+    if length is None:
+        return {}
+
+    return json.loads(stream.read(length))
+
+
+def write_message(stream, message):
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    stream.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    stream.flush()
+
+
+class LanguageServer:
+    """
+    Atiende los mensajes del editor. Cada documento abierto tiene su
+    DocumentAnalysis; tras cada cambio se publican sus diagnósticos.
+    """
+    def __init__(self, input_stream, output_stream):
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.documents = {}
+        self.shutdown_requested = False
+
+    def run(self):
+        """
+        Atiende mensajes hasta recibir 'exit'. Regresa el código de
+        salida que pide el protocolo.
+        """
+        while True:
+            message = read_message(self.input_stream)
+
+            if message is None:
+                return 1
+
+            if message.get("method") == "exit":
+                return 0 if self.shutdown_requested else 1
+
+            self.handle(message)
+
+    def handle(self, message):
+        method = message.get("method")
+        params = message.get("params") or {}
+        handler = getattr(self, "on_" + method.replace("/", "_").replace("$", "_"), None) if method else None
+        request = "id" in message
+
+        if handler is None:
+            if request:
+                error = {"code": METHOD_NOT_FOUND if method else INVALID_REQUEST,
+                         "message": f"Método no soportado: {method}"}
+                self.send({"jsonrpc": "2.0", "id": message["id"], "error": error})
+            return
+
+        try:
+            result = handler(params)
+        except Exception as e:
+            # Un mensaje mal formado no debe terminar el servidor: a
+            # una petición se le responde con el error y una
+            # notificación se descarta.
+            if request:
+                error = {"code": INTERNAL_ERROR, "message": f"Error interno: {type(e).__name__}: {e}"}
+                self.send({"jsonrpc": "2.0", "id": message["id"], "error": error})
+            else:
+                print(f"Error interno en {method}: {type(e).__name__}: {e}", file=sys.stderr)
+            return
+
+        if request:
+            self.send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+
+    def send(self, message):
+        write_message(self.output_stream, message)
+
+    def publish(self, uri, diagnostics, version=None):
+        params = {"uri": uri, "diagnostics": diagnostics}
+
+        if version is not None:
+            params["version"] = version
+
+        self.send({"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics", "params": params})
+
+    def on_initialize(self, params):
+        return {
+            "capabilities": {"textDocumentSync": {"openClose": True, "change": INCREMENTAL_SYNC}},
+            "serverInfo": {"name": SOURCE},
+        }
+
+    def on_initialized(self, params):
+        pass
+
+    def on_shutdown(self, params):
+        self.shutdown_requested = True
+
+    def on_textDocument_didOpen(self, params):
+        document = params["textDocument"]
+        analysis = self.documents[document["uri"]] = DocumentAnalysis(document["text"])
+        self.publish(document["uri"], analysis.diagnostics(), document.get("version"))
+
+    def on_textDocument_didChange(self, params):
+        document = params["textDocument"]
+        analysis = self.documents.get(document["uri"])
+
+        if analysis is None:
+            return
+
+        analysis.apply_changes(params["contentChanges"])
+
+        self.publish(document["uri"], analysis.diagnostics(), document.get("version"))
+
+    def on_textDocument_didClose(self, params):
+        uri = params["textDocument"]["uri"]
+        self.documents.pop(uri, None)
+        self.publish(uri, [])
+
+
+def main():
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer)
+
+    return server.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Optimizaciones sobre la representación intermedia (ver ir.py):
+plegado de constantes, eliminación de subexpresiones comunes y
+reducción de potencias enteras pequeñas a multiplicaciones.
+"""
+import math
+from fractions import Fraction
+
+from ir import Assign, BinaryOp, Negate, Number, Program, Read, Variable, postorder
+from tokens import TokenType
+
+# Exponente máximo que se reescribe como multiplicaciones.
+MAX_REDUCED_POWER = 4
+# Bits máximos de los valores exactos con los que se decide si un
+# divisor constante es cero; lo que los rebasa se da por desconocido.
+MAX_EXACT_BITS = 1 << 13
+
+
+def fold(operator, left, right):
+    """
+    Calcula una operación entre constantes con la misma aritmética
+    de punto flotante que el intérprete. Regresa None si el
+    resultado es excepcional (división entre cero, potencia que se
+    desborda o no es real) y la operación se deja sin plegar.
+    """
+    try:
+        if operator == TokenType.SUM:
+            return left + right
+        elif operator == TokenType.SUBSTRACTION:
+            return left - right
+        elif operator == TokenType.MULTIPLY:
+            return left * right
+        elif operator == TokenType.DIVIDE:
+            return left / right
+
+        return math.pow(left, right)
+    except (ZeroDivisionError, ValueError, OverflowError):
+        return None
+
+
+def bits(value):
+    if isinstance(value, int):
+        return value.bit_length()
+
+    return max(value.numerator.bit_length(), value.denominator.bit_length())
+
+
+def exact_number(value):
+    """
+    Entero o fracción exacta de un número (un float de Number o el
+    texto de un dato).
+    """
+    if isinstance(value, float):
+        # Por su texto más corto: 0.1 es 1/10 y no la fracción
+        # binaria que guarda el float.
+        value = repr(value)
+
+    value = Fraction(value)
+
+    return value.numerator if value.denominator == 1 else value
+
+
+def exact_power(base, exponent, max_bits):
+    """
+    base^exponent si es exacto y cabe en max_bits; si no, None. El
+    tamaño se estima sin calcular la potencia: un entero de b bits
+    elevado a n tiene a lo más b*n bits.
+    """
+    if not isinstance(exponent, int):
+        return None
+
+    if base == 0:
+        # 0^-n es infinito.
+        return None if exponent < 0 else int(exponent == 0)
+
+    if base == 1 or base == -1:
+        return base ** (exponent % 2)
+
+    if bits(base) * abs(exponent) > max_bits:
+        return None
+
+    if exponent < 0:
+        return exact_number(Fraction(1, 1) / Fraction(base) ** -exponent)
+
+    return base ** exponent
+
+
+def exact_operation(operator, left, right, max_bits):
+    """
+    La operación entre dos valores exactos, o None si su resultado
+    no es exacto o rebasa max_bits.
+    """
+    if operator == TokenType.SUM:
+        result = left + right
+    elif operator == TokenType.SUBSTRACTION:
+        result = left - right
+    elif operator == TokenType.MULTIPLY:
+        # Lo más que puede crecer es a la suma de los bits; el
+        # producto de dos valores dentro del límite es barato.
+        result = left * right
+    elif operator == TokenType.DIVIDE:
+        if right == 0:
+            return None
+
+        result = exact_number(Fraction(left) / right)
+    else:
+        return exact_power(left, right, max_bits)
+
+    if isinstance(result, Fraction) and result.denominator == 1:
+        result = result.numerator
+
+    return result if bits(result) <= max_bits else None
+
+
+class Optimizer:
+    """
+    Optimiza las expresiones de un programa en el orden de sus
+    sentencias. Cada nodo se construye una sola vez por contenido
+    (hash-consing), así que dos subexpresiones iguales, en la misma
+    sentencia o en otra, son el mismo objeto y el intérprete las
+    evalúa una sola vez. Las variables llevan el número de su última
+    asignación para que una subexpresión sólo se comparta mientras
+    sus variables no cambien.
+
+    x^2 se reescribe como x*x, que da exactamente el mismo
+    resultado; con x^3 y x^4 puede cambiar el último bit.
+    """
+    def __init__(self):
+        self.nodes = {}
+        self.versions = {}
+        # Para cada división, en el orden en que se optimizan, si su
+        # divisor es exactamente cero. No se decide con los valores
+        # plegados: en punto flotante 10^-400 ya es 0 y 10^400-10^400
+        # no se pliega.
+        self.zero_divisors = []
+
+    def define(self, name):
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+    def number(self, value):
+        # hex() distingue 0.0 de -0.0, que se comparan como iguales.
+        return self.nodes.setdefault((Number, value.hex()), Number(value))
+
+    def variable(self, name):
+        version = self.versions.get(name, 0)
+
+        return self.nodes.setdefault((Variable, name, version), Variable(name, version))
+
+    def negate(self, operand):
+        if isinstance(operand, Number):
+            return self.number(-operand.value)
+
+        if isinstance(operand, Negate):
+            return operand.operand
+
+        return self.nodes.setdefault((Negate, id(operand)), Negate(operand))
+
+    def binary(self, operator, left, right):
+        constant_right = isinstance(right, Number)
+
+        if constant_right and isinstance(left, Number):
+            value = fold(operator, left.value, right.value)
+
+            if value is not None:
+                return self.number(value)
+
+        if (operator == TokenType.POWER and constant_right and right.value.is_integer()
+                and 0 <= right.value <= MAX_REDUCED_POWER):
+            return self.power(left, int(right.value))
+
+        key = (BinaryOp, operator, id(left), id(right))
+
+        return self.nodes.setdefault(key, BinaryOp(operator, left, right))
+
+    def power(self, base, exponent):
+        # Como en NumPy, x^0 es 1 incluso si x es NaN.
+        if exponent == 0:
+            return self.number(1.0)
+
+        if exponent == 1:
+            return base
+
+        square = self.binary(TokenType.MULTIPLY, base, base)
+
+        if exponent == 2:
+            return square
+
+        if exponent == 3:
+            return self.binary(TokenType.MULTIPLY, square, base)
+
+        return self.binary(TokenType.MULTIPLY, square, square)
+
+    def expression(self, expr):
+        values = []
+        # Valor exacto de cada operando de values, o None si no es
+        # constante o no se conoce exactamente.
+        exact = []
+
+        for node in postorder(expr):
+            if isinstance(node, Number):
+                values.append(self.number(node.value))
+                exact.append(exact_number(node.value) if math.isfinite(node.value) else None)
+            elif isinstance(node, Variable):
+                values.append(self.variable(node.name))
+                exact.append(None)
+            elif isinstance(node, Negate):
+                values[-1] = self.negate(values[-1])
+                exact[-1] = None if exact[-1] is None else -exact[-1]
+            else:
+                right = values.pop()
+                exact_right = exact.pop()
+
+                if node.operator == TokenType.DIVIDE:
+                    self.zero_divisors.append(exact_right == 0)
+
+                values[-1] = self.binary(node.operator, values[-1], right)
+
+                if exact[-1] is not None and exact_right is not None:
+                    exact[-1] = exact_operation(node.operator, exact[-1], exact_right, MAX_EXACT_BITS)
+                else:
+                    exact[-1] = None
+
+        return values[0]
+
+    def statement(self, statement):
+        if isinstance(statement, Assign):
+            expr = self.expression(statement.expr)
+            self.define(statement.name)
+
+            return Assign(statement.name, expr)
+
+        if isinstance(statement, Read):
+            self.define(statement.name)
+
+        return statement
+
+
+def optimize_program(program):
+    optimizer = Optimizer()
+
+    return Program(program.name, tuple(optimizer.statement(statement) for statement in program.statements))
@@ -0,0 +1,120 @@
+"""
+Validación de un solo programa muy grande con varios procesos. Las
+expresiones aritméticas de las asignaciones no dependen unas de
+otras: su análisis sólo necesita saber qué variables están
+inicializadas, y eso se resuelve después con las acciones de
+ExpressionCache. Así que primero se analiza léxicamente el programa,
+las expresiones distintas se reparten por bloques entre un grupo de
+procesos y al final una pasada secuencial de ProgramParser, con el
+caché ya lleno, recorre las sentencias en orden y genera los avisos.
+El resultado es idéntico al de validator.validate.
+
+Uso: python parallel.py [-j N] [--lexer L] [--expr-parser P] ARCHIVO
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from lexer import PROGRAM_LEXERS, collect, replay
+from parser_class import EXPR_PARSERS, ExpressionCache, ProgramParser, expression_actions
+from tokens import TokenType
+from validator import run_parser
+
+# Con menos expresiones distintas que esto no vale la pena arrancar
+# los procesos y se valida en uno solo.
+MIN_EXPRESSIONS = 2000
+# Bloques en los que se reparten las expresiones por cada proceso,
+# para que uno lento no deje a los demás esperando.
+CHUNKS_PER_WORKER = 4
+
+
+def expression_texts(tokens):
+    """
+    Expresiones distintas del programa, en el orden en que aparecen.
+    """
+    return list(dict.fromkeys(str(token.value) for token in tokens
+                              if token.type in (TokenType.EXPR, TokenType.EXPR_BEGIN)))
+
+
+def analyze_expressions(expressions, expr_parser):
+    # Corre en los procesos de trabajo; expr_parser es el nombre
+    # en EXPR_PARSERS para no tener que enviar la clase.
+    parser_class = EXPR_PARSERS[expr_parser]
+
+    return [expression_actions(expr, parser_class) for expr in expressions]
+
+
+def split(items, count):
+    size = max(-(-len(items) // count), 1)
+
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def parallel_cache(expressions, expr_parser, executor, jobs):
+    """
+    ExpressionCache con todas las expresiones ya analizadas, repartidas
+    entre los jobs procesos de executor.
+    """
+    chunks = split(expressions, jobs * CHUNKS_PER_WORKER)
+
+    # El caché tiene lugar para todas, así que ninguna se desaloja
+    # ni se vuelve a analizar en la pasada final.
+    expr_cache = ExpressionCache(EXPR_PARSERS[expr_parser], len(expressions))
+
+    for chunk, entries in zip(chunks, executor.map(analyze_expressions, chunks,
+                                                    [expr_parser] * len(chunks))):
+        expr_cache.entries.update(zip(chunk, entries))
+
+    return expr_cache
+
+
+def validate_parallel(text, lexer="table", expr_parser="iterative", jobs=None, executor=None,
+                      min_expressions=MIN_EXPRESSIONS):
+    """
+    Igual que validator.validate, pero las expresiones se analizan en
+    jobs procesos (por omisión, uno por núcleo): los de executor (un
+    concurrent.futures.Executor), si se da, o un grupo nuevo. Con
+    menos de min_expressions expresiones distintas todo se hace en
+    este proceso.
+    """
+    tokens, error = collect(PROGRAM_LEXERS[lexer](text).generate_tokens())
+    expressions = expression_texts(tokens)
+    expr_cache = None
+
+    if len(expressions) >= min_expressions:
+        jobs = jobs or os.cpu_count() or 1
+
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                expr_cache = parallel_cache(expressions, expr_parser, executor, jobs)
+        else:
+            expr_cache = parallel_cache(expressions, expr_parser, executor, jobs)
+
+    # Con pocas expresiones la pasada final las analiza sin caché,
+    # con los mismos tokens.
+    parser = ProgramParser(replay(tokens, error), EXPR_PARSERS[expr_parser], expr_cache)
+
+    return run_parser(parser)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Valida un programa grande con varios procesos.")
+    arg_parser.add_argument("path", metavar="ARCHIVO")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="procesos de trabajo (por defecto, uno por núcleo)")
+    arg_parser.add_argument("--lexer", choices=sorted(PROGRAM_LEXERS), default="table")
+    arg_parser.add_argument("--expr-parser", choices=sorted(EXPR_PARSERS), default="iterative")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, encoding="utf-8") as input_file:
+        text = input_file.read()
+
+    result = validate_parallel(text, args.lexer, args.expr_parser, args.jobs)
+    sys.stdout.write(result if result.endswith("\n") else result + "\n")
+
+    return 0 if result == "Programa correcto." else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,44 @@
+from collections import OrderedDict
+from copy import copy
+
 from execution_exceptions import *
+from diagnostics import (ERROR, INVALID_EXPRESSION, Diagnostic, DiagnosticLog, division_by_zero,
+                         empty_expression, uninitialized)
 from tokens import TokenType, Token
-from lexer import ArithmeticLexer
+from lexer import ArithmeticLexer, collect, replay
+from grammar import END_OF_INPUT, Grammar
+from ir import BinaryOp, inorder, parse_tokens, postorder
+from optimizer import Optimizer
+
+# Operadores binarios de las expresiones aritméticas.
+OPERATORS = {TokenType.SUM, TokenType.SUBSTRACTION, TokenType.MULTIPLY,
+             TokenType.DIVIDE, TokenType.POWER}
+
+
+# Texto con el que se reporta un token en los mensajes de error.
+def describe_token(token):
+    types = {TokenType.READ: "leer", TokenType.PRINT: "imprimir", TokenType.END: "terminar.",
+             TokenType.START: "iniciar", TokenType.NAME_FIELD: "programa"}
+
+    if token.type in types:
+        return types[token.type]
+
+    return token.value
+
+
+# Aviso que se agrega al consultar una variable que no está en
+# la tabla de símbolos.
+def uninitialized_warning(name):
+    return uninitialized(name).message
+
+
+class SymbolTable(set):
+    """
+    Variables inicializadas. Conserva la interfaz de lista con la
+    que se llena (append), pero cada consulta toma tiempo constante
+    sin importar cuántas variables tenga el programa.
+    """
+    append = set.add
 
 
 class Parser:
@@ -10,12 +48,21 @@ class Parser:
     Los método que todos los parsers comparten es el de pedir el próximo token,
     el de analizar el token identificador y el de hacer un log de fallos.
     """
+    # Crea el registro de avisos y errores; los analizadores
+    # instrumentados lo reemplazan por uno que cuenta excepciones.
+    make_log = DiagnosticLog
+
     def __init__(self, tokens):
-        self.output = ""
-        self.symbol_table = []
+        # Avisos y errores; output es su texto.
+        self.log = self.make_log()
+        self.symbol_table = SymbolTable()
         self.tokens = iter(tokens)
         self.next_token()
 
+    @property
+    def output(self):
+        return self.log.text()
+
     # Para checar que no haya errores en el lexer.
     def check_token(self):
         if self.current_token is None:
@@ -30,7 +77,7 @@ class Parser:
             self.current_token = None
         # Cualquier otro error en el lexer.
         except (EOFScanning, FileNameError, NewlineError, InvalidTokenError) as e:
-            self.output += e.message
+            self.log.add_error(e)
             self.current_token = None
 
     def parse_id(self):
@@ -42,19 +89,13 @@ class Parser:
         # Este en cambio, sí, pero no amerita detener la ejecución del
         # análisis.
         if self.current_token.value not in self.symbol_table:
-            self.output += f"Aviso: uso de variable sin inicializar: {self.current_token.value}.\n"
+            self.log.add(uninitialized(self.current_token.value))
 
         return True
 
     # Pequeña función para regresar en que símbolo falló el parser.
     def error_log(self):
-        types = {TokenType.READ: "leer", TokenType.PRINT: "imprimir", TokenType.END: "terminar.",
-                 TokenType.START: "iniciar", TokenType.NAME_FIELD: "programa"}
-
-        if self.current_token.type in types:
-            return types[self.current_token.type]
-
-        return self.current_token.value
+        return describe_token(self.current_token)
 
 
 # Inicio de la clase ProgramParser.
@@ -69,8 +110,13 @@ class ProgramParser(Parser):
     ordenada de tokens junto a la posición del token actual.
     """
 
-    def __init__(self, tokens):
+    def __init__(self, tokens, expr_parser=None, expr_cache=None):
         super().__init__(tokens)
+        # Clase con la que se analizan las expresiones aritméticas.
+        self.expr_parser = expr_parser or ArithmeticParser
+        # Con un ExpressionCache las expresiones se analizan con el
+        # analizador del caché y sólo la primera vez que aparecen.
+        self.expr_cache = expr_cache
 
     # Inicio del análisis sintáctico.
     def parse(self):
@@ -100,7 +146,7 @@ class ProgramParser(Parser):
                     if not self.parse_sentence():
                         return self.output
                 except (InvalidSyntax, EOFScanning) as e:
-                    self.output += e.message
+                    self.log.add_error(e)
                     return self.output
             else:
                 raise InvalidSyntax(self.error_log())
@@ -116,13 +162,26 @@ class ProgramParser(Parser):
 
                 return "Programa correcto."
 
-            return f"Sintaxis inválida: {self.error_log()}\n"
+            return self.invalid_program()
         else:
-            return f"Sintaxis inválida: {self.error_log()}\n"
+            return self.invalid_program()
+
+    # Un token de más al principio o al final del programa: la
+    # salida es sólo este error.
+    def invalid_program(self):
+        text = self.error_log()
+        self.log.clear()
+        self.log.add(Diagnostic(InvalidSyntax.kind, ERROR, f"Sintaxis inválida: {text}\n", text=text))
+
+        return self.output
 
     def parse_expr(self, expr):
+        if self.expr_cache is not None:
+            self.expr_cache.report(expr, self.symbol_table, self.log)
+            return
+
         if not expr:
-            self.output += "Error: expresión vacía.\n"
+            self.log.add(empty_expression())
             return False
 
         lexer = ArithmeticLexer(expr)
@@ -130,15 +189,61 @@ class ProgramParser(Parser):
         try:
             tokens = lexer.generate_tokens()
         except InvalidTokenError as e:
-            self.output += e.message
+            self.log.add_error(e)
             return False
 
-        expr_parser = ArithmeticParser(expr, self.symbol_table, tokens)
+        expr_parser = self.expr_parser(expr, self.symbol_table, tokens)
 
         try:
-            self.output += expr_parser.parse()
+            expr_parser.parse()
+            self.log.extend(expr_parser.log)
         except (InvalidSyntax) as e:
-            self.output += e.message
+            self.log.add_error(e)
+
+    # Expresión cuyos tokens vienen intercalados en el flujo
+    # principal (UnifiedProgramLexer).
+    def parse_inline_expr(self, expr):
+        tokens = self.inline_expr_tokens()
+
+        if self.expr_cache is not None:
+            # En un fallo el caché analiza estos mismos tokens; en
+            # un acierto nadie los pidió y el analizador léxico
+            # pasa directamente a EXPR_END.
+            self.expr_cache.report(expr, self.symbol_table, self.log, tokens)
+            expr.skip()
+        elif not expr:
+            self.log.add(empty_expression())
+        else:
+            expr_parser = self.expr_parser(expr, self.symbol_table, tokens)
+
+            try:
+                expr_parser.parse()
+                self.log.extend(expr_parser.log)
+            except (InvalidSyntax) as e:
+                self.log.add_error(e)
+
+        # Descartamos los tokens que el analizador de la
+        # expresión no llegó a consumir.
+        # Su error léxico no se cuenta como excepción: si el
+        # analizador llegó a él ya lo contó, y si no, con los otros
+        # analizadores léxicos ni siquiera se produce.
+        try:
+            for _ in tokens:
+                pass
+        except LexerError:
+            pass
+
+    def inline_expr_tokens(self):
+        for token in self.tokens:
+            if token.type == TokenType.EXPR_END:
+                return
+
+            if token.type == TokenType.ERROR:
+                # Después de un error sólo queda el EXPR_END.
+                next(self.tokens)
+                raise token.value
+
+            yield token
 
     def parse_sentence(self):
         while self.current_token is not None and self.current_token.type != TokenType.END:
@@ -176,11 +281,14 @@ class ProgramParser(Parser):
                     if not self.check_token():
                         return False
 
-                    if self.current_token.type != TokenType.EXPR:
-                        raise InvalidSyntax(self.current_token.value)
-                    else:
+                    if self.current_token.type == TokenType.EXPR:
                         self.parse_expr(self.current_token.value)
-                        self.next_token()
+                    elif self.current_token.type == TokenType.EXPR_BEGIN:
+                        self.parse_inline_expr(self.current_token.value)
+                    else:
+                        raise InvalidSyntax(self.current_token.value)
+
+                    self.next_token()
                 else:
                     raise InvalidSyntax(self.error_log())
             else:
@@ -192,6 +300,314 @@ class ProgramParser(Parser):
         return True
 
 
+# Gramática de las sentencias. Las acciones son métodos de
+# TableProgramParser que reciben el token antes de avanzar.
+STATEMENT_GRAMMAR = Grammar("""
+    programa   -> NAME_FIELD NAME START:begin sentencias END:end
+    sentencias -> sentencia sentencias
+                |
+    sentencia  -> READ ID:declare
+                | PRINT ID:use
+                | ID:declare EQUALS expresion
+    expresion  -> EXPR:expression
+                | EXPR_BEGIN:inline_expression
+""", TokenType.__members__)
+
+# Qué hacer cuando el token actual no le sirve al símbolo esperado:
+# con otro token, el error que se reporta (el token descrito, su
+# valor o sólo el de programa inválido); sin token, si el análisis
+# simplemente termina (el analizador léxico ya reportó su error) o
+# se reporta el fin del archivo.
+SYNTAX, VALUE, INVALID_PROGRAM = range(3)
+STOP, EOF = range(2)
+
+STATEMENT_ERRORS = {
+    "programa": (INVALID_PROGRAM, STOP),
+    "sentencias": (SYNTAX, EOF),
+    "expresion": (VALUE, STOP),
+    END_OF_INPUT: (INVALID_PROGRAM, STOP),
+}
+DEFAULT_ERROR = (SYNTAX, STOP)
+
+
+# Tablas de TableProgramParser ya resueltas para cada subclase.
+COMPILED_TABLES = {}
+
+
+def compile_table(grammar, parser_class):
+    """
+    Convierte la tabla de grammar en las entradas de la pila de
+    parser_class: (símbolo, acción, alternativas), donde la acción
+    es el método ya resuelto (o None) y las alternativas, para un
+    no terminal, el diccionario de terminal a las entradas que lo
+    reemplazan en la pila (None para un terminal).
+    """
+    expansions = grammar.expansions()
+
+    def entry(symbol, action):
+        return symbol, action and getattr(parser_class, action), expansions.get(symbol)
+
+    for alternatives in expansions.values():
+        for terminal, symbols in alternatives.items():
+            alternatives[terminal] = tuple(entry(symbol, action) for symbol, action in symbols)
+
+    return [entry(END_OF_INPUT, None), entry(grammar.start, None)]
+
+
+class TableProgramParser(ProgramParser):
+    """
+    ProgramParser guiado por la tabla LL(1) de STATEMENT_GRAMMAR:
+    un solo ciclo con una pila explícita de símbolos en lugar de una
+    rama por sentencia. Da exactamente los mismos resultados.
+    """
+    def parse(self):
+        parser_class = type(self)
+
+        if parser_class not in COMPILED_TABLES:
+            COMPILED_TABLES[parser_class] = compile_table(STATEMENT_GRAMMAR, parser_class)
+
+        stack = list(COMPILED_TABLES[parser_class])
+        pop = stack.pop
+        extend = stack.extend
+        # Los errores dentro de iniciar ... terminar. se agregan a
+        # la salida; los de antes cortan el análisis.
+        self.in_body = False
+
+        try:
+            while True:
+                symbol, action, alternatives = pop()
+                token = self.current_token
+                kind = None if token is None else token.type
+
+                if alternatives is not None:
+                    try:
+                        extend(alternatives[kind])
+                    except KeyError:
+                        return self.syntax_error(symbol)
+                elif kind is not symbol:
+                    return self.syntax_error(symbol)
+                elif token is None:
+                    # Todos los tokens consumidos.
+                    if self.output.strip('\n'):
+                        return self.output
+
+                    return "Programa correcto."
+                else:
+                    if action is not None:
+                        action(self, token)
+
+                    self.next_token()
+        except (InvalidSyntax, EOFScanning) as e:
+            if not self.in_body:
+                raise
+
+            self.log.add_error(e)
+            return self.output
+
+    def syntax_error(self, symbol):
+        on_token, on_end = STATEMENT_ERRORS.get(symbol, DEFAULT_ERROR)
+
+        if self.current_token is None:
+            if on_end == EOF:
+                raise EOFScanning()
+
+            return self.output
+
+        if on_token == INVALID_PROGRAM:
+            return self.invalid_program()
+
+        if on_token == VALUE:
+            raise InvalidSyntax(self.current_token.value)
+
+        raise InvalidSyntax(self.error_log())
+
+    def begin(self, token):
+        self.in_body = True
+
+    def end(self, token):
+        self.in_body = False
+
+    def declare(self, token):
+        self.symbol_table.append(token.value)
+
+    def use(self, token):
+        if token.value not in self.symbol_table:
+            self.log.add(uninitialized(token.value))
+
+    def expression(self, token):
+        self.parse_expr(token.value)
+
+    def inline_expression(self, token):
+        self.parse_inline_expr(token.value)
+
+
+class RecoveringProgramParser(ProgramParser):
+    """
+    ProgramParser que no se detiene en el primer error. Consume
+    los tokens de un RecoveringProgramLexer: los errores léxicos
+    llegan como tokens ERROR y los EOL marcan las líneas. Cada
+    error léxico o sintáctico se registra en diagnostics como un
+    Diagnostic con su línea y el análisis se retoma en la siguiente,
+    así que una sola pasada reporta todos los errores del programa.
+    """
+    def __init__(self, tokens, expr_parser=None, expr_cache=None):
+        self.line = 1
+        self.diagnostics = []
+        super().__init__(tokens, expr_parser, expr_cache)
+
+    # Los EOL sólo actualizan la línea; los errores léxicos se
+    # quedan como token actual hasta que alguien lo examina.
+    def next_token(self):
+        for token in self.tokens:
+            if token.type != TokenType.EOL:
+                self.current_token = token
+                return
+
+            self.line = token.value
+
+        self.current_token = None
+
+    def parse(self):
+        if self.current_token is not None and self.current_token.type == TokenType.START:
+            # Falta la línea del nombre; iniciar queda para después.
+            self.report(self.line, Diagnostic.from_error(InvalidSyntax(self.error_log())))
+        else:
+            self.recover(self.parse_header)
+
+        self.recover(self.parse_start)
+
+        while self.current_token is not None and self.current_token.type != TokenType.END:
+            self.recover(self.parse_statement)
+
+        if self.current_token is None:
+            error = EOFScanning()
+
+            # El analizador léxico pudo haberlo reportado ya.
+            if not self.diagnostics or self.diagnostics[-1].message != error.message:
+                self.report(self.line, Diagnostic.from_error(error))
+        else:
+            self.next_token()
+
+            if self.current_token is not None:
+                self.recover(self.parse_trailing)
+
+        return self.render()
+
+    def recover(self, parse):
+        """
+        Ejecuta un paso del análisis. Si falla, registra el error y
+        descarta el resto de la línea en la que empezó el paso.
+        """
+        line = self.line
+
+        try:
+            parse()
+            self.flush(line)
+            return
+        except LexerError as e:
+            self.report(getattr(e, "line", self.line), self.log.caught(e))
+
+            if self.current_token is not None and self.current_token.type == TokenType.ERROR:
+                self.next_token()
+        except InvalidSyntax as e:
+            self.report(line, self.log.caught(e))
+
+        # Los errores léxicos que se descartan también se reportan.
+        while self.current_token is not None and self.line == line:
+            if self.current_token.type == TokenType.ERROR:
+                error = self.current_token.value
+                self.report(error.line, self.log.caught(error))
+
+            self.next_token()
+
+        self.flush(line)
+
+    def report(self, line, diagnostic):
+        diagnostic.line = line
+        self.diagnostics.append(diagnostic)
+
+    # Pasa a diagnostics los avisos y errores que las expresiones
+    # dejaron en la salida, cada uno en su propia línea.
+    def flush(self, line):
+        for diagnostic in self.log:
+            if not diagnostic.message.endswith("\n"):
+                diagnostic.message += "\n"
+
+            self.report(line, diagnostic)
+
+        self.log.clear()
+
+    def expect(self, token_type):
+        token = self.current_token
+
+        if token is None:
+            raise EOFScanning()
+
+        if token.type == TokenType.ERROR:
+            raise token.value
+
+        if token.type != token_type:
+            raise InvalidSyntax(self.error_log())
+
+        self.next_token()
+
+        return token
+
+    def error_log(self):
+        # ':=' es el único token sin valor que no tiene descripción.
+        if self.current_token.type == TokenType.EQUALS:
+            return ":="
+
+        return describe_token(self.current_token)
+
+    def parse_header(self):
+        self.expect(TokenType.NAME_FIELD)
+        self.expect(TokenType.NAME)
+
+    def parse_start(self):
+        self.expect(TokenType.START)
+
+    # Nada puede seguir a 'terminar.'.
+    def parse_trailing(self):
+        if self.current_token.type == TokenType.ERROR:
+            raise self.current_token.value
+
+        raise InvalidSyntax(self.error_log())
+
+    def parse_statement(self):
+        token_type = self.current_token.type
+
+        if token_type == TokenType.READ:
+            self.next_token()
+            self.symbol_table.append(self.expect(TokenType.ID).value)
+        elif token_type == TokenType.PRINT:
+            self.next_token()
+            name = self.expect(TokenType.ID).value
+
+            if name not in self.symbol_table:
+                self.log.add(uninitialized(name))
+        elif token_type == TokenType.ID:
+            self.symbol_table.append(self.current_token.value)
+            self.next_token()
+            self.expect(TokenType.EQUALS)
+            self.parse_expr(self.expect(TokenType.EXPR).value)
+        else:
+            # Un token ERROR lanza su excepción.
+            self.expect(TokenType.ID)
+
+    def render(self):
+        if not self.diagnostics:
+            return "Programa correcto."
+
+        return "".join(f"Línea {diagnostic.line}: {diagnostic.message}"
+                       for diagnostic in self.sorted_diagnostics())
+
+    # Un error léxico se puede descubrir antes que los avisos
+    # de la línea anterior.
+    def sorted_diagnostics(self):
+        return sorted(self.diagnostics, key=lambda diagnostic: diagnostic.line)
+
+
 class ArithmeticParser(Parser):
     """
     Clase para el analizador sintáctico de expresiones
@@ -209,7 +625,13 @@ class ArithmeticParser(Parser):
     def __init__(self, expr, symbol_table, tokens):
         super().__init__(tokens)
         self.symbol_table = symbol_table
-        self.expr = expr
+        self.source_expr = expr
+
+    # La expresión puede llegar como Span; sólo la
+    # copiamos si hay que reportar un error.
+    @property
+    def expr(self):
+        return str(self.source_expr)
 
     def parse(self):
         if self.current_token is None:
@@ -218,12 +640,15 @@ class ArithmeticParser(Parser):
         try:
             self.parse_expr()
         except InvalidSyntax as e:
-            self.output += e.message
+            self.log.add_error(e)
 
-        # Si no se consumieron todos los tokens
-        # de la expresión hubo errores.
+        # Si no se consumieron todos los tokens de la expresión
+        # hubo errores; éste reemplaza a los demás avisos y, a
+        # diferencia de ellos, no termina en salto de línea.
         if self.current_token is not None:
-            return "Sintaxis inválida: " + self.expr
+            self.log.clear()
+            self.log.add(Diagnostic(INVALID_EXPRESSION, ERROR, "Sintaxis inválida: " + self.expr,
+                                    text=self.expr))
 
         return self.output
 
@@ -260,7 +685,7 @@ class ArithmeticParser(Parser):
                     return False
 
                 if is_division and self.current_token.value == '0':
-                    self.output += "Aviso: División entre cero.\n"
+                    self.log.add(division_by_zero())
                 if not self.parse_power():
                     return False
 
@@ -274,7 +699,7 @@ class ArithmeticParser(Parser):
             if not self.parse_factor():
                 return False
         except ParenthesisError as e:
-            self.output += e.message
+            self.log.add_error(e)
             return False
 
         if not self.parse_prime_power():
@@ -291,7 +716,7 @@ class ArithmeticParser(Parser):
                     if not self.parse_factor():
                         return False
                 except ParenthesisError as e:
-                    self.output += e.message
+                    self.log.add_error(e)
                     return False
 
                 if not self.parse_prime_power():
@@ -312,6 +737,7 @@ class ArithmeticParser(Parser):
             try:
                 self.parse_expr()
             except InvalidSyntax as e:
+                self.log.count_caught()
                 return False
 
             return True
@@ -321,6 +747,7 @@ class ArithmeticParser(Parser):
             try:
                 self.parse_expr()
             except InvalidSyntax as e:
+                self.log.count_caught()
                 return False
 
             # Si el token actual es nulo por fallo en el
@@ -329,6 +756,7 @@ class ArithmeticParser(Parser):
                 if self.current_token.type != TokenType.RIGHT_PARENS:
                     raise ParenthesisError(self.text)
             except AttributeError:
+                self.log.count_caught()
                 return False
 
             self.next_token()
@@ -345,3 +773,359 @@ class ArithmeticParser(Parser):
             return True
         else:
             raise InvalidSyntax(self.expr)
+
+
+class IterativeArithmeticParser(ArithmeticParser):
+    """
+    Analizador de expresiones aritméticas equivalente a
+    ArithmeticParser, pero sin recursión: acepta la misma
+    gramática y produce los mismos avisos usando una pila
+    explícita de paréntesis abiertos, por lo que la
+    profundidad de anidamiento no está limitada por la pila
+    de Python.
+
+    Para validar basta con saber si se espera un operando
+    o un operador: el menos unario de F --> -E no cambia
+    qué tokens son válidos, sólo la forma del árbol.
+    """
+    def __init__(self, expr, symbol_table, tokens):
+        super().__init__(expr, symbol_table, tokens)
+
+    def parse_expr(self):
+        if not self.parse_tokens():
+            raise InvalidSyntax(self.expr)
+
+        return True
+
+    def parse_tokens(self):
+        parens = []
+        expect_operand = True
+        # Referencias locales para el ciclo principal.
+        advance = self.next_token
+        ID, NUMBER = TokenType.ID, TokenType.NUMBER
+        SUBSTRACTION, DIVIDE = TokenType.SUBSTRACTION, TokenType.DIVIDE
+        LEF_PARENS, RIGHT_PARENS = TokenType.LEF_PARENS, TokenType.RIGHT_PARENS
+
+        while True:
+            token = self.current_token
+
+            if expect_operand:
+                # Se esperaba un factor, pero no hay nada.
+                if token is None:
+                    return False
+
+                token_type = token.type
+
+                if token_type == ID:
+                    self.parse_id()
+                    expect_operand = False
+                elif token_type == NUMBER:
+                    expect_operand = False
+                elif token_type == LEF_PARENS:
+                    parens.append(token)
+                elif token_type != SUBSTRACTION:
+                    return False
+
+                advance()
+            else:
+                # Fin de la expresión: sólo es correcta si
+                # no quedaron paréntesis abiertos.
+                if token is None:
+                    return not parens
+
+                token_type = token.type
+
+                if token_type in OPERATORS:
+                    advance()
+                    expect_operand = True
+
+                    if token_type == DIVIDE:
+                        if self.current_token is None:
+                            return False
+
+                        self.check_division()
+                elif token_type == RIGHT_PARENS and parens:
+                    parens.pop()
+                    advance()
+                else:
+                    # Sin paréntesis abiertos la expresión terminó y el
+                    # token sobrante se reporta en parse; dentro de
+                    # paréntesis falta el ')'.
+                    return not parens
+
+    # Aviso de división cuando el token que sigue a '/' es un
+    # cero literal.
+    def check_division(self):
+        if self.current_token.value == '0':
+            self.log.add(division_by_zero())
+
+
+class OptimizingArithmeticParser(IterativeArithmeticParser):
+    """
+    Además de validar, construye la representación intermedia de
+    la expresión y la optimiza (ver optimizer.Optimizer). Con el
+    árbol ya plegado también se avisa de divisores como (3-3) o -0,
+    no sólo de un '0' literal después de '/'; el aviso se da al
+    llegar a su '/', como el del cero literal. El árbol optimizado
+    queda en self.ir.
+    """
+    def __init__(self, expr, symbol_table, tokens):
+        super().__init__(expr, symbol_table, tokens)
+        self.ir = None
+        # Para cada '/', en el orden del texto, si su divisor se
+        # pliega a cero.
+        self.zero_divisors = iter(())
+
+    def parse_expr(self):
+        # Los tokens se guardan para construir el árbol y después
+        # validarlos, sin volver a analizar léxicamente el texto.
+        tokens, error = collect(self.tokens)
+        self.tokens = replay(tokens, error)
+
+        # Con un error léxico no hay árbol; el análisis lo reporta.
+        if error is not None:
+            return super().parse_expr()
+
+        try:
+            tree = parse_tokens([self.current_token, *tokens], self.source_expr)
+        except AnalysisError:
+            # Sólo una expresión correcta tiene árbol; el análisis
+            # reporta el error.
+            self.log.count_caught()
+            return super().parse_expr()
+
+        optimizer = Optimizer()
+        self.ir = optimizer.expression(tree)
+        divisions = [node for node in postorder(tree)
+                     if isinstance(node, BinaryOp) and node.operator == TokenType.DIVIDE]
+        zero = {id(node) for node, is_zero in zip(divisions, optimizer.zero_divisors) if is_zero}
+        self.zero_divisors = iter([id(node) in zero for node in inorder(tree)
+                                   if isinstance(node, BinaryOp) and node.operator == TokenType.DIVIDE])
+
+        return super().parse_expr()
+
+    def check_division(self):
+        if next(self.zero_divisors, False) or self.current_token.value == '0':
+            self.log.add(division_by_zero())
+
+
+# Partes de la salida de una expresión según expression_actions: un
+# diagnóstico que no depende de la tabla de símbolos o una variable
+# consultada en ella.
+DIAGNOSTIC, USE = range(2)
+
+# Expresiones distintas que guarda ExpressionCache por omisión.
+EXPR_CACHE_SIZE = 4096
+
+# Subclases de los analizadores de expresiones con RecordingLog.
+RECORDING_PARSERS = {}
+
+
+class RecordingSymbols:
+    """
+    Tabla de símbolos que da por inicializada cualquier variable,
+    pero anota cuántos diagnósticos había dado el analizador al
+    consultar cada una, para poder insertar después los avisos que
+    correspondan.
+    """
+    def __init__(self):
+        self.parser = None
+        self.uses = []
+
+    def __contains__(self, name):
+        self.uses.append((len(self.parser.log.records), name))
+        return True
+
+
+class RecordingLog(DiagnosticLog):
+    """
+    Registro que cuenta las excepciones atrapadas, para que
+    ExpressionCache también las cuente cada vez que reutiliza la
+    expresión.
+    """
+    __slots__ = ("exceptions",)
+
+    def __init__(self):
+        super().__init__()
+        self.exceptions = 0
+
+    def caught(self, error):
+        self.exceptions += 1
+        return super().caught(error)
+
+    def count_caught(self, count=1):
+        self.exceptions += count
+
+
+class RecordingProgramParser(ProgramParser):
+    make_log = RecordingLog
+
+
+def recording(parser_class):
+    if parser_class not in RECORDING_PARSERS:
+        RECORDING_PARSERS[parser_class] = type("Recording" + parser_class.__name__, (parser_class,),
+                                               {"make_log": RecordingLog})
+
+    return RECORDING_PARSERS[parser_class]
+
+
+def expression_actions(expr, expr_parser, tokens=None):
+    """
+    Analiza una expresión y regresa su salida como acciones: los
+    diagnósticos que no dependen de la tabla de símbolos y las
+    variables consultadas, en el orden en que se reportaron. Regresa
+    también cuántas excepciones atraparon los analizadores. Con
+    tokens, los de una expresión intercalada en el flujo principal
+    (ver ProgramParser.parse_inline_expr), no se vuelve a analizar
+    léxicamente el texto.
+    """
+    symbols = RecordingSymbols()
+    expr_parser = recording(expr_parser)
+
+    # Conectamos la tabla con el analizador de la expresión
+    # que construye ProgramParser.parse_expr.
+    def make_parser(expr, symbol_table, tokens):
+        symbols.parser = expr_parser(expr, symbol_table, tokens)
+        return symbols.parser
+
+    recorder = RecordingProgramParser(iter(()), make_parser)
+    recorder.symbol_table = symbols
+
+    if tokens is None:
+        recorder.parse_expr(expr)
+    else:
+        recorder.tokens = iter(tokens)
+        recorder.parse_inline_expr(expr)
+
+    records = recorder.log.records
+
+    # Si el resultado no son los diagnósticos del analizador de
+    # la expresión, sus avisos se descartaron.
+    if symbols.parser is None or symbols.parser.log.cleared or symbols.parser.log.records != records:
+        symbols.uses.clear()
+
+    actions = []
+    offset = 0
+
+    for position, name in symbols.uses:
+        actions.extend((DIAGNOSTIC, diagnostic) for diagnostic in records[offset:position])
+        actions.append((USE, name))
+        offset = position
+
+    actions.extend((DIAGNOSTIC, diagnostic) for diagnostic in records[offset:])
+    exceptions = recorder.log.exceptions
+
+    if symbols.parser is not None:
+        exceptions += symbols.parser.log.exceptions
+
+    return tuple(actions), exceptions
+
+
+class ExpressionCache:
+    """
+    Caché LRU del análisis de expresiones aritméticas, por texto.
+    Cada entrada guarda los diagnósticos del analizador como acciones
+    de expression_actions, así que el resultado de la sintaxis y los
+    identificadores consultados se reutilizan sin volver a crear el
+    analizador léxico ni el sintáctico; sólo los avisos de variables
+    sin inicializar se calculan con la tabla de símbolos de cada
+    programa. Guarda también las excepciones que se atraparon al
+    analizarla, que report vuelve a contar en cada uso. Lleva la
+    cuenta de aciertos, fallos y desalojos.
+    """
+    def __init__(self, expr_parser=None, maxsize=EXPR_CACHE_SIZE):
+        if maxsize < 0:
+            raise ValueError(f"Tamaño de caché inválido: {maxsize}")
+
+        self.expr_parser = expr_parser or ArithmeticParser
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def entry(self, expr, tokens=None):
+        """
+        Las acciones de la expresión y cuántas excepciones se
+        atraparon al analizarla. La llave es el texto de expr, que
+        puede ser el Span del texto fuente; en un fallo se analizan
+        tokens, si se dan, en lugar de volver a generarlos.
+        """
+        key = str(expr)
+
+        try:
+            entry = self.entries[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = self.entries[key] = expression_actions(expr, self.expr_parser, tokens)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+        return entry
+
+    def actions(self, expr):
+        return self.entry(expr)[0]
+
+    def identifiers(self, expr):
+        return {value for kind, value in self.actions(expr) if kind == USE}
+
+    def report(self, expr, symbol_table, log, tokens=None):
+        """
+        Agrega a log (un DiagnosticLog) los diagnósticos de la
+        expresión con la tabla de símbolos dada. Son copias, porque
+        quien los recibe les puede asignar su línea.
+        """
+        actions, exceptions = self.entry(expr, tokens)
+
+        if exceptions:
+            log.count_caught(exceptions)
+
+        for kind, value in actions:
+            if kind == DIAGNOSTIC:
+                log.add(copy(value))
+            elif value not in symbol_table:
+                log.add(uninitialized(value))
+
+    def render(self, expr, symbol_table):
+        """
+        Salida del analizador de la expresión con la tabla de
+        símbolos dada, igual que ProgramParser.parse_expr.
+        """
+        parts = []
+
+        for kind, value in self.actions(expr):
+            if kind == DIAGNOSTIC:
+                parts.append(value.message)
+            elif value not in symbol_table:
+                parts.append(uninitialized_warning(value))
+
+        return "".join(parts)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self.entries), "maxsize": self.maxsize}
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Analizadores de expresiones disponibles.
+EXPR_PARSERS = {
+    "recursive": ArithmeticParser,
+    "iterative": IterativeArithmeticParser,
+    "optimizing": OptimizingArithmeticParser,
+}
+
+# Analizadores de programas disponibles.
+PROGRAM_PARSERS = {
+    "recursive": ProgramParser,
+    "table": TableProgramParser,
+}
@@ -0,0 +1,177 @@
+"""
+Caché en disco de resultados de validación, direccionado por
+contenido: la clave es un hash del archivo junto con la versión
+del código de los analizadores, así que un archivo que no cambió
+se responde sin analizarlo.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+# Tamaño máximo del caché por omisión, en bytes.
+MAX_BYTES = 256 << 20
+# Al rebasar el máximo se desalojan entradas hasta quedar en
+# esta fracción, para no podar en cada escritura.
+PRUNE_TARGET = 0.9
+# Bytes que se leen a la vez al calcular el hash de un archivo.
+READ_SIZE = 1 << 20
+# Segundos tras los cuales un archivo temporal se considera
+# abandonado por un proceso que terminó a medio escribir.
+STALE_SECONDS = 3600
+
+# Módulos de los que depende el resultado de una validación: validator.py
+# y todos los que importa, directa o indirectamente (test_result_cache.py
+# lo comprueba). Cualquier cambio en ellos invalida el caché.
+VERSIONED_MODULES = ("tokens.py", "lexer.py", "source.py", "parser_class.py", "grammar.py",
+                     "ir.py", "optimizer.py", "diagnostics.py", "instrumentation.py",
+                     "validator.py", "execution_exceptions.py")
+
+
+def code_version(modules=VERSIONED_MODULES):
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for name in modules:
+        with open(os.path.join(directory, name), "rb") as module_file:
+            digest.update(name.encode() + b"\0" + module_file.read() + b"\0")
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Resultados guardados como un archivo por entrada dentro de
+    directory. Las escrituras van a un archivo temporal que luego
+    se renombra con os.replace, así que varios procesos pueden
+    escribir a la vez y un lector nunca ve una entrada a medias.
+    Al leer una entrada se actualiza su fecha de modificación, y
+    prune() desaloja las menos usadas recientemente cuando el
+    caché rebasa max_bytes.
+    """
+    # Las entradas son texto; una subclase puede guardar bytes.
+    binary = False
+
+    def __init__(self, directory, max_bytes=MAX_BYTES, version=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version or code_version()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path, lexer, expr_parser):
+        digest = hashlib.sha256(f"{self.version}\0{lexer}\0{expr_parser}\0".encode())
+
+        with open(path, "rb") as input_file:
+            while chunk := input_file.read(READ_SIZE):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        entry = self.entry_path(key)
+
+        try:
+            if self.binary:
+                with open(entry, "rb") as entry_file:
+                    result = entry_file.read()
+            else:
+                with open(entry, encoding="utf-8", newline="") as entry_file:
+                    result = entry_file.read()
+
+            os.utime(entry)
+        except FileNotFoundError:
+            # No existe o alguien más la acaba de desalojar.
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return result
+
+    def put(self, key, result):
+        entry = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(entry), prefix=".tmp-")
+
+        try:
+            if self.binary:
+                with os.fdopen(descriptor, "wb") as entry_file:
+                    entry_file.write(result)
+            else:
+                with os.fdopen(descriptor, "w", encoding="utf-8", newline="") as entry_file:
+                    entry_file.write(result)
+
+            os.replace(temporary, entry)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except FileNotFoundError:
+                pass
+
+            raise
+
+    def entries(self):
+        """
+        Regresa (fecha de modificación, tamaño, ruta) de cada
+        entrada. Los archivos temporales no cuentan; los
+        abandonados se borran.
+        """
+        found = []
+        stale = time.time() - STALE_SECONDS
+
+        try:
+            buckets = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return found
+
+        for bucket in buckets:
+            if not bucket.is_dir():
+                continue
+
+            for entry in os.scandir(bucket.path):
+                try:
+                    stat = entry.stat()
+
+                    if entry.name.startswith(".tmp-"):
+                        if stat.st_mtime < stale:
+                            os.remove(entry.path)
+
+                        continue
+                except FileNotFoundError:
+                    continue
+
+                found.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return found
+
+    def prune(self):
+        """
+        Si el caché rebasa max_bytes, borra las entradas usadas
+        hace más tiempo. Regresa el número de entradas borradas.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        if total <= self.max_bytes:
+            return 0
+
+        target = self.max_bytes * PRUNE_TARGET
+        removed = 0
+
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+            removed += 1
+
+        return removed
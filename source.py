@@ -0,0 +1,169 @@
+import io
+import os
+
+# Caracteres que se leen del archivo cada vez que hace falta más texto.
+CHUNK_SIZE = 1 << 16
+
+
+class StreamText:
+    """
+    Texto de un programa que se lee por bloques desde un
+    archivo (ruta o flujo binario) en lugar de cargarse
+    completo en memoria. Se comporta como una cadena para
+    los analizadores léxicos: acepta índices y rebanadas
+    hacia adelante y conserva en memoria sólo la línea
+    actual y el último bloque leído, así que un token nunca
+    se parte entre dos bloques. El flujo se cierra al llegar
+    al final del archivo.
+    """
+    def __init__(self, source, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+        if isinstance(source, (str, os.PathLike)):
+            source = open(source, "rb")
+
+        self.last = self.read_last_char(source, encoding)
+        # Igual que open() en modo texto: decodifica y traduce
+        # los saltos de línea, también entre bloques.
+        self.stream = io.TextIOWrapper(source, encoding=encoding, newline=None)
+        self.chunk_size = chunk_size
+        # Posición en el archivo del primer carácter del búfer.
+        self.base = 0
+        self.buffer = ""
+        self.eof = False
+
+    # El analizador de programas consulta text[-1] al inicio;
+    # sólo podemos conocer el último carácter si el flujo
+    # permite desplazarse. Si no, se toma como vacío.
+    @staticmethod
+    def read_last_char(stream, encoding):
+        try:
+            if not stream.seekable():
+                return ""
+
+            position = stream.tell()
+            end = stream.seek(0, io.SEEK_END)
+            stream.seek(max(position, end - 4))
+            tail = stream.read()
+            stream.seek(position)
+        except (AttributeError, OSError):
+            return ""
+
+        tail = tail.decode(encoding, errors="ignore")
+
+        if not tail:
+            return ""
+
+        return "\n" if tail[-1] == "\r" else tail[-1]
+
+    def fill(self, position, keep):
+        """
+        Lee bloques hasta que el búfer llegue a position o se
+        acabe el archivo. Antes descarta lo anterior a la línea
+        en la que está keep - 1, que los analizadores ya no
+        vuelven a leer.
+        """
+        if keep < self.base:
+            raise IndexError("Posición ya descartada del búfer: " + str(keep))
+
+        line_start = self.buffer.rfind("\n", 0, max(keep - 1 - self.base, 0)) + 1
+        chunks = [self.buffer[line_start:]]
+        self.base += line_start
+        end = self.base + len(chunks[0])
+
+        while end <= position and not self.eof:
+            chunk = self.stream.read(self.chunk_size)
+
+            if not chunk:
+                self.eof = True
+                self.close()
+                break
+
+            chunks.append(chunk)
+            end += len(chunk)
+
+        self.buffer = "".join(chunks)
+
+    def fill_line(self, position):
+        """
+        Asegura que el búfer contenga desde position hasta el
+        siguiente salto de línea o el fin del archivo.
+        """
+        if position < self.base:
+            raise IndexError("Posición ya descartada del búfer: " + str(position))
+
+        while not self.eof and self.buffer.find("\n", position - self.base) == -1:
+            self.fill(self.base + len(self.buffer), position)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = key.start or 0
+
+            if key.stop is None or key.step is not None:
+                raise ValueError("Rebanada no soportada en un archivo leído por bloques.")
+
+            if key.stop > self.base + len(self.buffer):
+                self.fill(key.stop - 1, start)
+
+            if start < self.base:
+                raise IndexError("Posición ya descartada del búfer: " + str(start))
+
+            return self.buffer[start - self.base:key.stop - self.base]
+
+        if key < 0:
+            if key == -1:
+                return self.last
+
+            raise IndexError(key)
+
+        if key >= self.base + len(self.buffer):
+            self.fill(key, key)
+
+        if key < self.base:
+            raise IndexError("Posición ya descartada del búfer: " + str(key))
+
+        return self.buffer[key - self.base]
+
+    def startswith(self, prefix, position):
+        return self[position:position + len(prefix)] == prefix
+
+    def match(self, pattern, position, endpos=None):
+        self.fill_line(position)
+        end = len(self.buffer) if endpos is None else endpos - self.base
+        match = pattern.match(self.buffer, position - self.base, end)
+
+        return None if match is None else StreamMatch(match, self.base)
+
+    def search(self, pattern, position):
+        self.fill_line(position)
+        match = pattern.search(self.buffer, position - self.base)
+
+        return None if match is None else StreamMatch(match, self.base)
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StreamMatch:
+    """
+    Resultado de una búsqueda en StreamText con las
+    posiciones relativas al archivo completo.
+    """
+    __slots__ = ("match", "base")
+
+    def __init__(self, match, base):
+        self.match = match
+        self.base = base
+
+    def group(self):
+        return self.match.group()
+
+    def start(self):
+        return self.match.start() + self.base
+
+    def end(self):
+        return self.match.end() + self.base
@@ -0,0 +1,86 @@
+import unittest
+from enum import Enum
+
+from grammar import EMPTY, END_OF_INPUT, Grammar
+from parser_class import STATEMENT_GRAMMAR
+from tokens import TokenType
+
+# Terminales de las gramáticas de prueba, como TokenType en
+# STATEMENT_GRAMMAR.
+Toy = Enum("Toy", "NUM MAS POR ABRE CIERRA A B")
+TERMINALS = Toy.__members__
+
+# Gramática de expresiones del libro del dragón, sin recursión
+# izquierda.
+EXPRESSIONS = """
+    e      -> t e_rest
+    e_rest -> MAS t e_rest
+            |
+    t      -> f t_rest
+    t_rest -> POR f t_rest
+            |
+    f      -> ABRE e CIERRA
+            | NUM
+"""
+
+
+class GrammarTest(unittest.TestCase):
+    def test_first_sets(self):
+        grammar = Grammar(EXPRESSIONS, TERMINALS)
+
+        self.assertEqual(grammar.first["e"], {Toy.ABRE, Toy.NUM})
+        self.assertEqual(grammar.first["t"], {Toy.ABRE, Toy.NUM})
+        self.assertEqual(grammar.first["e_rest"], {Toy.MAS, EMPTY})
+        self.assertEqual(grammar.first["t_rest"], {Toy.POR, EMPTY})
+
+    def test_follow_sets(self):
+        grammar = Grammar(EXPRESSIONS, TERMINALS)
+
+        self.assertEqual(grammar.follow["e"], {Toy.CIERRA, END_OF_INPUT})
+        self.assertEqual(grammar.follow["e_rest"], {Toy.CIERRA, END_OF_INPUT})
+        self.assertEqual(grammar.follow["t"], {Toy.MAS, Toy.CIERRA, END_OF_INPUT})
+        self.assertEqual(grammar.follow["f"], {Toy.POR, Toy.MAS, Toy.CIERRA, END_OF_INPUT})
+
+    def test_parse_table(self):
+        grammar = Grammar(EXPRESSIONS, TERMINALS)
+
+        self.assertEqual(grammar.table["f", Toy.NUM], ((Toy.NUM, None),))
+        self.assertEqual(grammar.table["e_rest", Toy.CIERRA], ())
+        self.assertNotIn(("e_rest", Toy.POR), grammar.table)
+        self.assertEqual(grammar.expansions()["t_rest"][Toy.POR], (("t_rest", None), ("f", None), (Toy.POR, None)))
+
+    def test_statement_grammar(self):
+        self.assertEqual(STATEMENT_GRAMMAR.start, "programa")
+        self.assertEqual(STATEMENT_GRAMMAR.first["sentencias"],
+                         {TokenType.READ, TokenType.PRINT, TokenType.ID, EMPTY})
+        self.assertEqual(STATEMENT_GRAMMAR.follow["sentencias"], {TokenType.END})
+        self.assertEqual(STATEMENT_GRAMMAR.follow["programa"], {END_OF_INPUT})
+        self.assertEqual(STATEMENT_GRAMMAR.table["sentencia", TokenType.ID],
+                         ((TokenType.ID, "declare"), (TokenType.EQUALS, None), ("expresion", None)))
+
+    def test_conflict(self):
+        # Dos alternativas que empiezan con el mismo terminal.
+        with self.assertRaises(ValueError):
+            Grammar("s -> A B\n  | A", TERMINALS)
+
+        # Recursión izquierda.
+        with self.assertRaises(ValueError):
+            Grammar("s -> s A\n  | B", TERMINALS)
+
+        # Una alternativa vacía cuyo FOLLOW choca con otra.
+        with self.assertRaises(ValueError):
+            Grammar("s -> r A\nr -> A\n  |", TERMINALS)
+
+    def test_invalid_spec(self):
+        with self.assertRaises(ValueError):
+            Grammar("s -> DESCONOCIDO", TERMINALS)
+
+        with self.assertRaises(ValueError):
+            Grammar("s -> r", TERMINALS)
+
+        with self.assertRaises(ValueError):
+            Grammar("s -> A\ns -> B", TERMINALS)
+
+
+if __name__ == "__main__":
+    unittest.main()
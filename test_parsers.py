@@ -0,0 +1,139 @@
+import random
+import unittest
+
+from generator import ProgramGenerator
+from instrumentation import ValidationStats
+from lexer import PROGRAM_LEXERS
+from parser_class import EXPR_PARSERS, PROGRAM_PARSERS, ExpressionCache
+from validator import validate
+
+# Aviso que OptimizingArithmeticParser da también para divisores
+# constantes que valen cero, como (3-3).
+FOLDED_DIVISION = "Aviso: División entre cero.\n"
+
+# Fragmentos que se insertan al mutar un programa.
+PIECES = ["", "\n", ";", ":=", "(", ")", "-", "/0", " ", "leer ", "imprimir ", "terminar.", "x", "0", "^"]
+
+
+def programs(count=60):
+    """
+    Programas de ProgramGenerator, con y sin errores inyectados, y
+    mutaciones al azar de cada uno.
+    """
+    rng = random.Random(0)
+
+    for seed in range(count):
+        generator = ProgramGenerator(seed, depth=rng.randint(1, 4), paren_depth=rng.randint(0, 3),
+                                     error_rate=rng.choice([0.0, 0.02, 0.1]))
+        text = generator.program(rng.randint(0, 30))
+        yield text
+
+        for _ in range(3):
+            start = rng.randrange(len(text) + 1)
+            end = min(len(text), start + rng.randint(0, 4))
+            yield text[:start] + rng.choice(PIECES) + text[end:]
+
+
+def result(text, **options):
+    # Algunas entradas inválidas terminan en una excepción; se
+    # comparan por su tipo.
+    try:
+        return validate(text, **options)
+    except Exception as e:
+        return type(e).__name__
+
+
+def without_folded(output):
+    # Sin los avisos de división entre cero, que con el optimizador
+    # también aparecen para divisores constantes que valen cero.
+    return output.replace(FOLDED_DIVISION, "") or "Programa correcto."
+
+
+class EquivalenceTest(unittest.TestCase):
+    def setUp(self):
+        self.programs = list(programs())
+
+    def test_program_lexers(self):
+        for text in self.programs:
+            expected = result(text, lexer="classic")
+
+            for lexer in PROGRAM_LEXERS:
+                self.assertEqual(result(text, lexer=lexer), expected, (lexer, text))
+
+    def test_expr_parsers(self):
+        caches = {name: ExpressionCache(parser_class, 16) for name, parser_class in EXPR_PARSERS.items()}
+
+        for text in self.programs:
+            expected = result(text, expr_parser="recursive")
+
+            for expr_parser in EXPR_PARSERS:
+                for expr_cache in (None, caches[expr_parser]):
+                    found = result(text, expr_parser=expr_parser, expr_cache=expr_cache)
+
+                    if expr_parser == "optimizing":
+                        self.assertEqual(without_folded(found), without_folded(expected), (expr_parser, text))
+                    else:
+                        self.assertEqual(found, expected, (expr_parser, text))
+
+    def test_exception_counts(self):
+        # Las excepciones de una expresión se cuentan igual si se toma
+        # de ExpressionCache, con cualquier analizador léxico.
+        expr_cache = ExpressionCache(EXPR_PARSERS["iterative"], 16)
+
+        for text in self.programs:
+            counts = set()
+
+            for lexer in PROGRAM_LEXERS:
+                for cache in (None, expr_cache):
+                    stats = ValidationStats()
+                    result(text, lexer=lexer, expr_parser="iterative", expr_cache=cache, stats=stats)
+                    counts.add(stats.exceptions)
+
+            self.assertEqual(len(counts), 1, text)
+
+    def test_cached_inline_expressions(self):
+        # Con UnifiedProgramLexer, en un acierto del caché no se
+        # generan los tokens de la expresión.
+        text = "programa p;\niniciar\nleer a;\n" + "b := (a+c)*2/0;\nb := a+B;\n" * 3 + "terminar.\n"
+
+        for expr_parser in EXPR_PARSERS:
+            expected = result(text, lexer="unified", expr_parser=expr_parser)
+            stats = {}
+
+            for cache in (None, ExpressionCache(EXPR_PARSERS[expr_parser])):
+                stats[cache] = ValidationStats()
+                found = result(text, lexer="unified", expr_parser=expr_parser, expr_cache=cache,
+                               stats=stats[cache])
+                self.assertEqual(found, expected, expr_parser)
+
+            uncached, cached = stats.values()
+            self.assertLess(cached.tokens, uncached.tokens, expr_parser)
+            self.assertEqual(cached.exceptions, uncached.exceptions, expr_parser)
+
+    def test_program_parsers(self):
+        for text in self.programs:
+            expected = result(text, program_parser="recursive")
+
+            for program_parser in PROGRAM_PARSERS:
+                self.assertEqual(result(text, program_parser=program_parser), expected, (program_parser, text))
+
+
+class ZeroDivisorTest(unittest.TestCase):
+    def check(self, divisor, warns):
+        text = f"programa p;\niniciar\nleer v;\nx := v/{divisor};\nimprimir x;\nterminar."
+        expected = FOLDED_DIVISION if warns else "Programa correcto."
+
+        self.assertEqual(validate(text, expr_parser="optimizing"), expected, divisor)
+
+    def test_exact_zero(self):
+        for divisor in ["0", "-0", "(3-3)", "(1/3*3-1)", "(10^400-10^400)"]:
+            self.check(divisor, True)
+
+    def test_underflow_is_not_zero(self):
+        # En punto flotante se redondean a cero, pero no lo son.
+        for divisor in ["(10^-400)", "(2^-1075)", "(687^(118-540))", "(0^-1)"]:
+            self.check(divisor, False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import ast
+import os
+import unittest
+
+from compiler import COMPILER_MODULES
+from result_cache import VERSIONED_MODULES
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def local_imports(name):
+    """
+    Módulos del proyecto que importa name, directa o
+    indirectamente, incluido él mismo.
+    """
+    found = set()
+    pending = [name]
+
+    while pending:
+        name = pending.pop()
+
+        if name in found:
+            continue
+
+        found.add(name)
+
+        with open(os.path.join(DIRECTORY, name), encoding="utf-8") as module_file:
+            tree = ast.parse(module_file.read())
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                modules = [node.module]
+            else:
+                continue
+
+            for module in modules:
+                path = module.split(".")[0] + ".py"
+
+                if os.path.exists(os.path.join(DIRECTORY, path)):
+                    pending.append(path)
+
+    return found
+
+
+class VersionedModulesTest(unittest.TestCase):
+    def test_validator_closure(self):
+        self.assertEqual(local_imports("validator.py") - set(VERSIONED_MODULES), set())
+
+    def test_compiler_closure(self):
+        self.assertEqual(local_imports("compiler.py") - set(COMPILER_MODULES), set())
+
+    def test_no_duplicates(self):
+        self.assertEqual(len(set(COMPILER_MODULES)), len(COMPILER_MODULES))
+
+
+if __name__ == "__main__":
+    unittest.main()
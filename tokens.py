@@ -1,3 +1,4 @@
+from array import array
 from enum import Enum
 from dataclasses import dataclass
 
@@ -20,6 +21,11 @@ class TokenType(Enum):
     POWER = 14
     LEF_PARENS = 15
     RIGHT_PARENS = 16
+    EXPR_BEGIN = 17
+    EXPR_END = 18
+    ERROR = 19
+    # Fin de línea; sólo lo produce RecoveringProgramLexer.
+    EOL = 20
 
 @dataclass
 class Token:
@@ -28,3 +34,129 @@ class Token:
 
     def __repr__(self):
         return self.type.name + (f":{self.value}" if self.value is not None else "")
+
+
+class Span:
+    """
+    Fragmento del texto fuente que sólo se copia
+    cuando se necesita como cadena. Quien lo produce puede
+    consultar skipped para no generar lo que nadie va a leer.
+    """
+    __slots__ = ("text", "start", "end", "skipped")
+
+    def __init__(self, text, start, end):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.skipped = False
+
+    def skip(self):
+        self.skipped = True
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __str__(self):
+        return self.text[self.start:self.end]
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+# Tipo de token por su código numérico.
+TOKEN_TYPES = {token_type.value: token_type for token_type in TokenType}
+
+
+class TokenBuffer:
+    """
+    Secuencia compacta de tokens: el código de cada tipo y el
+    inicio y fin de su valor en el texto se guardan en arreglos
+    paralelos, sin crear un objeto por token. El valor sólo se
+    copia del texto cuando alguien lo pide. error es la excepción
+    en la que se detuvo el análisis léxico, si la hubo.
+    """
+    __slots__ = ("text", "types", "starts", "ends", "error")
+
+    def __init__(self, text):
+        self.text = text
+        self.types = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.error = None
+
+    # Los tokens sin valor se guardan con inicio -1.
+    def append(self, token_type, start=-1, end=-1):
+        self.types.append(token_type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, index):
+        return TOKEN_TYPES[self.types[index]]
+
+    def value(self, index):
+        start = self.starts[index]
+
+        if start < 0:
+            return None
+
+        return self.text[start:self.ends[index]]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.types)
+
+        if not 0 <= index < len(self.types):
+            raise IndexError(index)
+
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.types)):
+            yield TokenView(self, index)
+
+    def stream(self):
+        """
+        Recorre los tokens como lo haría el generador del
+        analizador léxico: al final lanza el error, si hubo.
+        """
+        yield from self
+
+        if self.error is not None:
+            raise self.error
+
+
+class TokenView:
+    """
+    Un token de un TokenBuffer con la misma interfaz que Token.
+    """
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def type(self):
+        return TOKEN_TYPES[self.buffer.types[self.index]]
+
+    @property
+    def value(self):
+        return self.buffer.value(self.index)
+
+    def to_token(self):
+        return Token(self.type, self.value)
+
+    def __eq__(self, other):
+        if not isinstance(other, (Token, TokenView)):
+            return NotImplemented
+
+        return self.type == other.type and self.value == other.value
+
+    __hash__ = None
+
+    def __repr__(self):
+        value = self.value
+        return self.type.name + (f":{value}" if value is not None else "")
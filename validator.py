@@ -0,0 +1,194 @@
+import os
+from functools import partial
+
+from parser_class import RecoveringProgramParser, ExpressionCache, EXPR_PARSERS, PROGRAM_PARSERS
+from lexer import PROGRAM_LEXERS, RecoveringProgramLexer
+from source import StreamText
+from instrumentation import instrumented
+from diagnostics import Diagnostic, render_json_lines
+from execution_exceptions import *
+
+
+# Tokens entre cada reporte de avance.
+PROGRESS_INTERVAL = 1024
+
+# Formatos de validate_file y lo que agregan a la clave del caché
+# de resultados.
+FORMAT_SUFFIXES = {"text": "", "jsonl": "/jsonl"}
+
+# Cachés de expresiones de validate_file, uno por analizador y
+# tamaño. Cada proceso de un lote tiene los suyos.
+EXPR_CACHES = {}
+
+
+def validate(text, lexer="table", expr_parser="iterative", progress=None, expr_cache=None,
+             recover=False, stats=None, program_parser="recursive"):
+    """
+    Analiza el texto de un programa (una cadena o un
+    StreamText) y regresa el resultado tal como lo
+    muestra la interfaz. Los parámetros lexer, expr_parser y
+    program_parser eligen los analizadores de PROGRAM_LEXERS,
+    EXPR_PARSERS y PROGRAM_PARSERS.
+
+    Si se da progress, se llama periódicamente con los caracteres
+    analizados y el total (0 si no se conoce); puede lanzar
+    ValidationCancelled para detener el análisis. Con expr_cache
+    (un ExpressionCache) las expresiones repetidas no se vuelven a
+    analizar.
+
+    Con recover el análisis no se detiene en el primer error y
+    se reportan todos, cada uno con su número de línea; en ese
+    caso se usa siempre RecoveringProgramLexer.
+
+    Con stats (un instrumentation.ValidationStats) se acumulan en él
+    los tiempos de cada fase y los contadores del análisis.
+    """
+    if recover:
+        lexer = RecoveringProgramLexer(text)
+    else:
+        lexer = PROGRAM_LEXERS[lexer](text)
+
+    tokens = lexer.generate_tokens()
+
+    if progress is not None:
+        tokens = tracked_tokens(tokens, lexer, len(text) if isinstance(text, str) else 0, progress)
+
+    parser_class = RecoveringProgramParser if recover else PROGRAM_PARSERS[program_parser]
+
+    if stats is None:
+        return run_parser(parser_class(tokens, EXPR_PARSERS[expr_parser], expr_cache))
+
+    with stats.measure():
+        parser = instrumented(parser_class)(tokens, EXPR_PARSERS[expr_parser], expr_cache, stats)
+
+        return run_parser(parser)
+
+
+def run_parser(parser):
+    try:
+        return parser.parse()
+    except InvalidSyntax as e:
+        return e.message
+
+
+def diagnose(text, lexer="table", expr_parser="iterative", expr_cache=None, recover=False,
+             program_parser="recursive"):
+    """
+    Igual que validate, pero regresa los avisos y errores como una
+    lista de diagnostics.Diagnostic en lugar de texto; un programa
+    correcto no tiene ninguno. Sólo con recover llevan línea.
+    """
+    if recover:
+        parser = RecoveringProgramParser(RecoveringProgramLexer(text).generate_tokens(),
+                                         EXPR_PARSERS[expr_parser], expr_cache)
+        parser.parse()
+
+        return parser.sorted_diagnostics()
+
+    parser = PROGRAM_PARSERS[program_parser](PROGRAM_LEXERS[lexer](text).generate_tokens(),
+                                             EXPR_PARSERS[expr_parser], expr_cache)
+
+    try:
+        parser.parse()
+    except InvalidSyntax as e:
+        return [Diagnostic.from_error(e)]
+
+    return parser.log.records
+
+
+def tracked_tokens(tokens, lexer, total, progress):
+    for count, token in enumerate(tokens):
+        if count % PROGRESS_INTERVAL == 0:
+            progress(max(lexer.pointer, 0), total)
+
+        yield token
+
+
+def expression_cache(expr_parser, size):
+    """
+    Caché de expresiones compartido por las validaciones de este
+    proceso, o None si size es 0.
+    """
+    if not size:
+        return None
+
+    key = (expr_parser, size)
+
+    if key not in EXPR_CACHES:
+        EXPR_CACHES[key] = ExpressionCache(EXPR_PARSERS[expr_parser], size)
+
+    return EXPR_CACHES[key]
+
+
+def validate_file(path, lexer="table", expr_parser="iterative", stream=False, cache_size=0,
+                  result_cache=None, recover=False, stats=None, output_format="text",
+                  program_parser="recursive"):
+    """
+    Valida un archivo y regresa una tupla con la ruta,
+    el tamaño en bytes y el resultado del análisis.
+    Con stream el archivo se lee por bloques en lugar
+    de cargarse completo. Con cache_size las expresiones
+    se guardan en un caché compartido entre archivos. Con
+    result_cache (un ResultCache) un archivo que ya se
+    validó con el mismo contenido no se vuelve a analizar.
+    Con recover se reportan todos los errores y con stats se
+    acumulan las mediciones del análisis (ver validate); un
+    resultado tomado de result_cache no se mide. program_parser
+    es el de validate.
+
+    Con output_format "jsonl" el resultado son los diagnósticos
+    (ver diagnose) como JSON Lines, cada uno con la ruta en "path";
+    un programa correcto da una cadena vacía. En ese formato no se
+    usa stats.
+    """
+    # Un archivo ilegible o un programa que haga fallar al
+    # analizador no debe detener el resto del lote, así
+    # que reportamos el fallo como resultado.
+    size = 0
+    expr_cache = expression_cache(expr_parser, cache_size)
+
+    try:
+        size = os.path.getsize(path)
+
+        if result_cache is not None:
+            # Los dos analizadores de programas dan el mismo resultado.
+            key = result_cache.key(path, ("recover" if recover else lexer) + FORMAT_SUFFIXES[output_format],
+                                   expr_parser)
+            result = result_cache.get(key)
+
+            if result is not None:
+                return path, size, result
+
+        if output_format == "jsonl":
+            analyze = partial(structured_result, path=path, program_parser=program_parser)
+        else:
+            analyze = partial(validate, stats=stats, program_parser=program_parser)
+
+        if stream:
+            with StreamText(path) as text:
+                result = analyze(text, lexer, expr_parser, expr_cache=expr_cache, recover=recover)
+        else:
+            with open(path, encoding="utf-8") as input_file:
+                text = input_file.read()
+
+            result = analyze(text, lexer, expr_parser, expr_cache=expr_cache, recover=recover)
+
+        if result_cache is not None:
+            # Si no se puede guardar, el resultado sigue siendo válido.
+            try:
+                result_cache.put(key, result)
+            except OSError:
+                pass
+    except Exception as e:
+        result = f"Error interno: {type(e).__name__}: {e}\n"
+
+        if output_format == "jsonl":
+            result = render_json_lines([Diagnostic("internal_error", "error", result)], path=path)
+
+    return path, size, result
+
+
+def structured_result(text, lexer, expr_parser, expr_cache=None, recover=False, path=None,
+                      program_parser="recursive"):
+    return render_json_lines(diagnose(text, lexer, expr_parser, expr_cache, recover, program_parser),
+                             path=path)
@@ -0,0 +1,521 @@
+"""
+Modo vigilancia: observa uno o más directorios y vuelve a validar
+los programas conforme se guardan. En Linux los cambios llegan por
+inotify; en otros sistemas, o si inotify no está disponible, se
+recorren los directorios cada cierto tiempo comparando la fecha de
+modificación y el tamaño de cada archivo.
+
+Un archivo sólo se vuelve a validar si su contenido cambió: cuando
+la fecha o el tamaño difieren se calcula el hash del contenido y se
+compara con el de la última validación. Los cambios que llegan en
+ráfaga (un 'git checkout', un editor que guarda todo) se juntan y se
+validan cuando hay una pausa, en un grupo de procesos; cada resultado
+se imprime en cuanto está listo.
+
+Uso: python watch.py [-j N] [--pattern PATRON] [--poll] DIRECTORIO [DIRECTORIO ...]
+"""
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import hashlib
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from batch import CORRECT, non_negative_int
+from lexer import PROGRAM_LEXERS
+from parser_class import EXPR_CACHE_SIZE, EXPR_PARSERS
+from result_cache import READ_SIZE
+from validator import FORMAT_SUFFIXES, validate_file
+
+# Segundos sin cambios nuevos tras los cuales se valida lo pendiente.
+DEBOUNCE = 0.2
+# Segundos máximos que un cambio espera a que termine la ráfaga.
+MAX_DELAY = 2.0
+# Segundos entre recorridos de los directorios sin inotify.
+POLL_INTERVAL = 1.0
+
+# Constantes de <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+# No hace falta IN_MODIFY: un archivo está listo al cerrarse, y los
+# editores que guardan en un temporal y lo renombran producen
+# IN_MOVED_TO.
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT = struct.Struct("iIII")
+# Bytes que se leen a la vez del descriptor de inotify.
+EVENT_BUFFER = 1 << 16
+
+
+def signature(stat_result):
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as input_file:
+        while chunk := input_file.read(READ_SIZE):
+            digest.update(chunk)
+
+    return digest.digest()
+
+
+def hidden(name):
+    # Igual que glob con "**": los archivos y directorios ocultos
+    # (.git, los temporales de los editores) no cuentan.
+    return name.startswith(".")
+
+
+def scan(directory, pattern):
+    """
+    Regresa un diccionario con la firma (fecha de modificación en
+    nanosegundos, tamaño) de cada archivo bajo directory cuyo
+    nombre coincide con pattern.
+    """
+    found = {}
+    directories = [directory]
+
+    while directories:
+        try:
+            entries = list(os.scandir(directories.pop()))
+        except OSError:
+            # Se borró mientras lo recorríamos.
+            continue
+
+        for entry in entries:
+            if hidden(entry.name):
+                continue
+
+            try:
+                if entry.is_dir():
+                    directories.append(entry.path)
+                elif fnmatch.fnmatch(entry.name, pattern):
+                    found[entry.path] = signature(entry.stat())
+            except OSError:
+                continue
+
+    return found
+
+
+class PollingWatcher:
+    """
+    Sin notificaciones del sistema: cada interval segundos reporta
+    los directorios raíz para que se vuelvan a recorrer.
+    """
+    def __init__(self, roots, interval=POLL_INTERVAL):
+        self.roots = roots
+        self.interval = interval
+        self.next_scan = time.monotonic() + interval
+
+    def changes(self, timeout):
+        """
+        Espera hasta timeout segundos y regresa las rutas que
+        pudieron cambiar: archivos o directorios a recorrer.
+        """
+        wait = self.next_scan - time.monotonic()
+
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+
+        time.sleep(max(wait, 0))
+        self.next_scan = time.monotonic() + self.interval
+
+        return set(self.roots)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Notificaciones de inotify por medio de ctypes. Se vigila cada
+    directorio del árbol; los que se crean después se agregan al
+    llegar su evento. Lanza OSError si inotify no está disponible.
+    """
+    def __init__(self, roots):
+        self.roots = roots
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify no está disponible")
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        # Directorio de cada descriptor de vigilancia.
+        self.directories = {}
+
+        try:
+            for root in roots:
+                self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+
+        if wd < 0:
+            error = ctypes.get_errno()
+
+            # Se borró o dejó de ser directorio antes de agregarlo.
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+
+            raise OSError(error, os.strerror(error), directory)
+
+        self.directories[wd] = directory
+
+    def add_tree(self, directory):
+        for path, subdirectories, _ in os.walk(directory):
+            subdirectories[:] = [name for name in subdirectories if not hidden(name)]
+            self.add(path)
+
+    def remove_tree(self, directory):
+        prefix = directory + os.sep
+
+        for wd, path in list(self.directories.items()):
+            if path == directory or path.startswith(prefix):
+                # Si ya no existe, el kernel lo quitó y llegará IN_IGNORED.
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.directories[wd]
+
+    def read_events(self):
+        data = b""
+
+        while True:
+            try:
+                chunk = os.read(self.fd, EVENT_BUFFER)
+            except BlockingIOError:
+                break
+
+            if not chunk:
+                break
+
+            data += chunk
+
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def changes(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+
+        paths = set()
+
+        for wd, mask, name in self.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Se perdieron eventos: hay que recorrer todo.
+                paths.update(self.roots)
+                continue
+
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+
+            directory = self.directories.get(wd)
+
+            if directory is None or not name or hidden(name):
+                continue
+
+            path = os.path.join(directory, name)
+            paths.add(path)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_MOVED_FROM | IN_DELETE):
+                    self.remove_tree(path)
+                else:
+                    self.add_tree(path)
+
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(roots, interval=POLL_INTERVAL, poll=False):
+    """
+    Un InotifyWatcher si el sistema lo permite y poll es falso; si
+    no, un PollingWatcher.
+    """
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except OSError as e:
+            print(f"inotify no disponible ({e}); se revisarán los archivos cada {interval} s",
+                  file=sys.stderr)
+
+    return PollingWatcher(roots, interval)
+
+
+class DirectoryMonitor:
+    """
+    Lleva la firma y el hash de cada archivo vigilado, junta los
+    cambios y envía a validar los archivos cuyo contenido cambió.
+    report se llama con (ruta, resultado) desde otro hilo cuando
+    termina cada validación, o con (ruta, None) si el archivo se
+    borró. Si un archivo cambia mientras se valida, el resultado
+    anterior se descarta.
+    """
+    def __init__(self, roots, watcher, executor, report, pattern="*.txt", debounce=DEBOUNCE,
+                 max_delay=MAX_DELAY, **options):
+        self.roots = roots
+        self.watcher = watcher
+        self.executor = executor
+        self.report = report
+        self.pattern = pattern
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.options = options
+        # Última firma vista y hash de la última validación de cada archivo.
+        self.seen = {}
+        self.digests = {}
+        self.generations = {}
+        self.pending = set()
+        self.first_change = None
+        self.last_change = None
+
+    def start(self, initial=True):
+        """
+        Recorre los directorios. Con initial se validan todos los
+        archivos; si no, sólo se validarán los que cambien después.
+        """
+        for root in self.roots:
+            self.seen.update(scan(root, self.pattern))
+
+        if initial:
+            self.pending.update(self.seen)
+            self.flush()
+        else:
+            for path in self.seen:
+                try:
+                    self.digests[path] = file_digest(path)
+                except OSError:
+                    pass
+
+    def expand(self, path):
+        """
+        Firmas de los archivos afectados por un cambio en path, con
+        None para los que ya no existen.
+        """
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            stat_result = None
+
+        if stat_result is not None and not stat.S_ISDIR(stat_result.st_mode):
+            if fnmatch.fnmatch(os.path.basename(path), self.pattern):
+                return {path: signature(stat_result)}
+
+            return {}
+
+        # Un directorio nuevo, borrado o que hay que volver a recorrer.
+        prefix = path + os.sep
+        found = {known: None for known in self.seen if known == path or known.startswith(prefix)}
+
+        if stat_result is not None:
+            found.update(scan(path, self.pattern))
+
+        return found
+
+    def observe(self, paths):
+        changed = False
+
+        for path in paths:
+            # inotify nombra el archivo que se escribió: aunque la
+            # firma no cambie (un sistema de archivos con fechas
+            # gruesas) se compara el hash.
+            named = path not in self.roots
+
+            for found, found_signature in self.expand(path).items():
+                if found_signature is None:
+                    if self.seen.pop(found, None) is not None:
+                        self.pending.add(found)
+                        changed = True
+                elif (named and found == path) or self.seen.get(found) != found_signature:
+                    self.seen[found] = found_signature
+                    self.pending.add(found)
+                    changed = True
+
+        if changed:
+            now = time.monotonic()
+            self.last_change = now
+            self.first_change = self.first_change or now
+
+    def timeout(self, idle):
+        """
+        Segundos que se puede esperar por cambios antes de tener que
+        validar lo pendiente; idle si no hay nada pendiente.
+        """
+        if not self.pending:
+            return idle
+
+        now = time.monotonic()
+
+        return max(min(self.last_change + self.debounce, self.first_change + self.max_delay) - now, 0)
+
+    def flush(self):
+        for path in sorted(self.pending):
+            if path not in self.seen:
+                if self.digests.pop(path, None) is not None:
+                    self.generations[path] = self.generations.get(path, 0) + 1
+                    self.report(path, None)
+
+                continue
+
+            try:
+                digest = file_digest(path)
+            except OSError:
+                # Se borró o cambió de permisos; lo dirá el siguiente evento.
+                continue
+
+            if digest != self.digests.get(path):
+                self.digests[path] = digest
+                self.submit(path)
+
+        self.pending.clear()
+        self.first_change = self.last_change = None
+
+    def submit(self, path):
+        generation = self.generations[path] = self.generations.get(path, 0) + 1
+        future = self.executor.submit(validate_file, path, **self.options)
+        future.add_done_callback(partial(self.finished, path, generation))
+
+    def finished(self, path, generation, future):
+        if future.cancelled() or self.generations.get(path) != generation:
+            return
+
+        try:
+            _, _, result = future.result()
+        except Exception as e:
+            # Sólo si el proceso de trabajo murió: validate_file
+            # reporta sus propios errores como resultado.
+            result = f"Error interno: {type(e).__name__}: {e}\n"
+
+        self.report(path, result)
+
+    def step(self, idle=1.0):
+        """
+        Espera cambios una vez y valida lo pendiente si la ráfaga
+        terminó.
+        """
+        self.observe(self.watcher.changes(self.timeout(idle)))
+
+        if self.pending and self.timeout(idle) == 0:
+            self.flush()
+
+    def run(self):
+        while True:
+            self.step()
+
+
+class Printer:
+    """
+    Imprime los resultados en la salida estándar, uno a la vez,
+    en el formato de batch.py.
+    """
+    def __init__(self, output_format="text", quiet=False):
+        self.output_format = output_format
+        self.quiet = quiet
+        self.lock = threading.Lock()
+
+    def __call__(self, path, result):
+        with self.lock:
+            if result is None:
+                print(f"Eliminado: {path}", file=sys.stderr)
+            elif self.output_format == "jsonl":
+                sys.stdout.write(result)
+            elif not (self.quiet and result == CORRECT):
+                print(f"== {path}")
+                print(result.rstrip("\n"))
+
+            sys.stdout.flush()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Vuelve a validar los programas al guardarlos.")
+    arg_parser.add_argument("paths", nargs="+", metavar="DIRECTORIO", help="directorios a vigilar")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="número de procesos (por defecto, uno por núcleo)")
+    arg_parser.add_argument("--pattern", default="*.txt", help="patrón de los archivos a validar")
+    arg_parser.add_argument("--poll", action="store_true",
+                            help="revisar los archivos periódicamente en lugar de usar inotify")
+    arg_parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                            help="segundos entre revisiones con --poll")
+    arg_parser.add_argument("--debounce", type=float, default=DEBOUNCE,
+                            help="segundos sin cambios antes de validar una ráfaga")
+    arg_parser.add_argument("--no-initial", action="store_true",
+                            help="no validar los archivos existentes al empezar")
+    arg_parser.add_argument("--lexer", choices=sorted(PROGRAM_LEXERS), default="table",
+                            help="analizador léxico a utilizar")
+    arg_parser.add_argument("--expr-parser", choices=sorted(EXPR_PARSERS), default="iterative",
+                            help="analizador de expresiones aritméticas a utilizar")
+    arg_parser.add_argument("--cache-size", type=non_negative_int, default=EXPR_CACHE_SIZE,
+                            help="expresiones distintas que recuerda cada proceso (0 lo desactiva)")
+    arg_parser.add_argument("--recover", action="store_true",
+                            help="reportar todos los errores de cada archivo, no sólo el primero")
+    arg_parser.add_argument("--format", choices=sorted(FORMAT_SUFFIXES), default="text",
+                            help="texto o una línea de JSON por diagnóstico (jsonl)")
+    arg_parser.add_argument("-q", "--quiet", action="store_true",
+                            help="sólo mostrar los archivos con errores")
+    args = arg_parser.parse_args(argv)
+
+    roots = [os.path.normpath(path) for path in args.paths]
+
+    for root in roots:
+        if not os.path.isdir(root):
+            print(f"No es un directorio: {root}", file=sys.stderr)
+            return 2
+
+    # El vigilante se crea antes del recorrido inicial para no
+    # perder lo que se guarde mientras tanto.
+    watcher = create_watcher(roots, args.interval, args.poll)
+    executor = ProcessPoolExecutor(max_workers=args.jobs)
+    monitor = DirectoryMonitor(roots, watcher, executor, Printer(args.format, args.quiet),
+                               args.pattern, args.debounce, lexer=args.lexer,
+                               expr_parser=args.expr_parser, cache_size=args.cache_size,
+                               recover=args.recover, output_format=args.format)
+
+    try:
+        monitor.start(initial=not args.no_initial)
+        monitor.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        watcher.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())